@@ -0,0 +1,86 @@
+# benchmarks/bench_dispatch.py
+#
+# Per-message cost of delivering update_drone messages to N drones:
+# broadcasting a Qt signal to every widget (the old wiring) vs. the routed DroneDispatcher.
+#
+# To run: python -m benchmarks.bench_dispatch
+
+import os
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PySide6.QtCore import QCoreApplication, QObject, Signal, Slot
+
+from drone_dispatcher import DroneDispatcher
+
+FLEET_SIZES = [1, 8, 32, 128, 512]
+MESSAGES = 20000
+
+
+class Hub(QObject):
+    update_drone_received = Signal(str, dict)
+
+
+class Receiver(QObject):
+    # Stand-in for a DroneWidget: only the drone_id check and a counter
+    def __init__(self, drone_id):
+        super().__init__()
+        self.drone_id = drone_id
+        self.updates = 0
+
+    @Slot(str, dict)
+    def handle_update_drone(self, drone_id, update):
+        if drone_id != self.drone_id:
+            return
+        self.updates += 1
+
+
+def make_messages(drone_ids):
+    return [(drone_ids[i % len(drone_ids)], {'uavid': drone_ids[i % len(drone_ids)]}) for i in range(MESSAGES)]
+
+
+def bench_broadcast(drone_ids):
+    hub = Hub()
+    receivers = [Receiver(drone_id) for drone_id in drone_ids]
+    for receiver in receivers:
+        hub.update_drone_received.connect(receiver.handle_update_drone)
+    messages = make_messages(drone_ids)
+
+    start = time.perf_counter()
+    for drone_id, update in messages:
+        hub.update_drone_received.emit(drone_id, update)
+    elapsed = time.perf_counter() - start
+    assert sum(receiver.updates for receiver in receivers) == MESSAGES
+    return elapsed / MESSAGES
+
+
+def bench_routed(drone_ids):
+    dispatcher = DroneDispatcher()
+    receivers = [Receiver(drone_id) for drone_id in drone_ids]
+    for receiver in receivers:
+        dispatcher.register(receiver.drone_id, receiver)
+    messages = make_messages(drone_ids)
+
+    start = time.perf_counter()
+    for drone_id, update in messages:
+        dispatcher.dispatch_update(drone_id, update)
+    elapsed = time.perf_counter() - start
+    assert sum(receiver.updates for receiver in receivers) == MESSAGES
+    return elapsed / MESSAGES
+
+
+def main():
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+    print(f"{'drones':>8} {'broadcast us/msg':>18} {'routed us/msg':>15}")
+    for fleet_size in FLEET_SIZES:
+        drone_ids = [f"Drone{i}" for i in range(fleet_size)]
+        broadcast = bench_broadcast(drone_ids)
+        routed = bench_routed(drone_ids)
+        print(f"{fleet_size:>8} {broadcast * 1e6:>18.2f} {routed * 1e6:>15.2f}")
+        app.processEvents()  # Nothing from one fleet size is left pending while timing the next
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# benchmarks/fleet.py
+#
+# Synthetic fleet generator: mission specs, update_drone payloads and stand-in layouts.
+
+import json
+import math
+import random
+
+from graph_layout import mission_graph
+
+
+def make_mission_spec(num_states, seed=0):
+    # Chain of tasks with a few back edges and branches, with RunTasks like the real missions
+    rng = random.Random(seed)
+    names = ['Start', 'Takeoff', 'RunTasks'] + [f"Task{i}_px4" for i in range(max(0, num_states - 5))] + ['Rtl', 'Land']
+    names = names[:max(num_states, 2)]
+    states = []
+    for i, name in enumerate(names):
+        transitions = []
+        if i + 1 < len(names):
+            transitions.append({'target': names[i + 1], 'condition': 'done'})
+        if i > 2 and rng.random() < 0.2:
+            transitions.append({'target': names[rng.randrange(2, i)], 'condition': 'retry'})
+        if i > 0 and rng.random() < 0.1:
+            transitions.append({'target': names[-1], 'condition': 'abort'})
+        states.append({'name': name, 'transitions': transitions})
+    return {'states': states}
+
+
+def make_update(drone_id, i, mission_spec=None):
+    # One update_drone message; the onboard_pilot walks through the mission states
+    states = mission_spec['states'] if mission_spec else [{'name': 'RunTasks'}]
+    return {
+        'uavid': drone_id,
+        'timestamp': 1700000000.0 + i * 0.1,
+        'status': {
+            'status': 'Flying',
+            'mode': ['GUIDED', 'LOITER', 'RTL', 'LAND'][(i // 50) % 4],
+            'onboard_pilot': states[(i // 10) % len(states)]['name'],
+            'armed': True,
+            'geofence': 'ok',
+            'speed': 5.0 + math.sin(i / 10.0),
+            'drone_heading': (i / 20.0) % (2 * math.pi),
+            'location': {'latitude': 41.7 + i * 1e-5, 'longitude': -86.2 + i * 1e-5, 'altitude': 30.0 + (i % 7)},
+            'battery': {'level': max(0.0, 1.0 - i * 1e-4), 'voltage': 12.6 - i * 1e-4, 'current': 8.5},
+        },
+    }
+
+
+def make_payloads(drone_ids, count, mission_spec=None):
+    return [json.dumps(make_update(drone_ids[i % len(drone_ids)], i, mission_spec)).encode('utf-8')
+            for i in range(count)]
+
+
+def make_layout(mission_spec):
+    # Grid layout in the format of graph_layout.parse_dot_json, for timing the scene without Graphviz
+    nodes, edges = mission_graph(mission_spec)
+    columns = max(1, int(math.sqrt(len(nodes))))
+    layout = {'width': columns * 160.0, 'height': (len(nodes) // columns + 1) * 80.0, 'nodes': {}, 'edges': [],
+              'dynamic_state': nodes.get('DynamicState') == ''}
+    for i, (name, label) in enumerate(nodes.items()):
+        row, column = divmod(i, columns)
+        layout['nodes'][name] = {'x': column * 160.0 + 80, 'y': row * 80.0 + 40, 'width': 120.0, 'height': 36.0,
+                                 'label': label}
+    for tail, head, condition in edges:
+        a, b = layout['nodes'][tail], layout['nodes'][head]
+        points = [[a['x'] + (b['x'] - a['x']) * t, a['y'] + (b['y'] - a['y']) * t] for t in (0.1, 0.3, 0.6, 0.8)]
+        layout['edges'].append({'tail': tail, 'head': head, 'label': condition,
+                                'label_pos': [(a['x'] + b['x']) / 2, (a['y'] + b['y']) / 2],
+                                'points': points, 'start': None, 'end': [b['x'], b['y'] - 18]})
+    return layout
@@ -0,0 +1,75 @@
+# benchmarks/harness.py
+#
+# Timing and reporting helpers shared by the benchmarks.
+
+import json
+import resource
+import sys
+import time
+
+
+def measure(fn, inputs, warmup=10):
+    # Calls fn once per input and returns the latency of each call in seconds
+    for value in inputs[:warmup]:
+        fn(value)
+    latencies = []
+    for value in inputs:
+        start = time.perf_counter()
+        fn(value)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies):
+    values = sorted(latencies)
+    total = sum(values)
+    return {
+        'count': len(values),
+        'msgs_per_sec': len(values) / total if total > 0 else 0.0,
+        'p50_us': percentile(values, 0.50) * 1e6,
+        'p99_us': percentile(values, 0.99) * 1e6,
+        'max_us': (values[-1] if values else 0.0) * 1e6,
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def save_results(path, results):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def load_results(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(results, baseline, tolerance):
+    # Returns the cases whose p50 latency regressed by more than tolerance (0.25 = 25%)
+    regressions = []
+    for case, current in results['cases'].items():
+        previous = baseline.get('cases', {}).get(case)
+        if not previous or not previous.get('p50_us'):
+            continue
+        ratio = current['p50_us'] / previous['p50_us']
+        if ratio > 1 + tolerance:
+            regressions.append((case, previous['p50_us'], current['p50_us'], ratio))
+    return regressions
+
+
+def print_table(results):
+    print(f"{'case':<40} {'msgs/sec':>12} {'p50 us':>10} {'p99 us':>10}")
+    for case, summary in results['cases'].items():
+        print(f"{case:<40} {summary['msgs_per_sec']:>12.0f} {summary['p50_us']:>10.1f} {summary['p99_us']:>10.1f}")
+    print(f"peak RSS: {results['peak_rss_mb']:.1f} MB")
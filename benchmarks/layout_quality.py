@@ -0,0 +1,71 @@
+# benchmarks/layout_quality.py
+
+import math
+
+CELL = 50.0  # Grid cell size (points) used to find segments that may cross
+
+
+def edge_segments(edge):
+    # The control polygon of an edge, ending at the arrow tip; close enough to the drawn path
+    points = [tuple(point) for point in edge['points']]
+    if edge.get('end'):
+        points.append(tuple(edge['end']))
+    return list(zip(points, points[1:]))
+
+
+def orientation(a, b, c):
+    return (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+
+
+def segments_cross(first, second):
+    # Proper crossings only; edges meeting at a shared node do not count
+    a, b = first
+    c, d = second
+    return (orientation(a, b, c) * orientation(a, b, d) < 0
+            and orientation(c, d, a) * orientation(c, d, b) < 0)
+
+
+def count_edge_crossings(layout):
+    cells = {}
+    segments = []
+    for number, edge in enumerate(layout['edges']):
+        for segment in edge_segments(edge):
+            index = len(segments)
+            segments.append((number, segment))
+            (x1, y1), (x2, y2) = segment
+            for cx in range(int(min(x1, x2) // CELL), int(max(x1, x2) // CELL) + 1):
+                for cy in range(int(min(y1, y2) // CELL), int(max(y1, y2) // CELL) + 1):
+                    cells.setdefault((cx, cy), []).append(index)
+
+    crossing_pairs = set()
+    for members in cells.values():
+        for i, first in enumerate(members):
+            for second in members[i + 1:]:
+                edge_a, segment_a = segments[first]
+                edge_b, segment_b = segments[second]
+                if edge_a != edge_b and segments_cross(segment_a, segment_b):
+                    crossing_pairs.add((min(edge_a, edge_b), max(edge_a, edge_b), min(first, second), max(first, second)))
+    return len(crossing_pairs)
+
+
+def count_node_overlaps(layout):
+    boxes = [(node['x'] - node['width'] / 2, node['y'] - node['height'] / 2,
+              node['x'] + node['width'] / 2, node['y'] + node['height'] / 2) for node in layout['nodes'].values()]
+    overlaps = 0
+    for i, (left, top, right, bottom) in enumerate(boxes):
+        for other_left, other_top, other_right, other_bottom in boxes[i + 1:]:
+            if left < other_right and other_left < right and top < other_bottom and other_top < bottom:
+                overlaps += 1
+    return overlaps
+
+
+def layout_quality(layout):
+    # Readability figures of a layout: fewer crossings, shorter edges and a smaller area are better
+    edge_length = sum(math.dist(a, b) for edge in layout['edges'] for a, b in edge_segments(edge))
+    return {
+        'crossings': count_edge_crossings(layout),
+        'node_overlaps': count_node_overlaps(layout),
+        'edge_length': edge_length,
+        'area': layout['width'] * layout['height'],
+        'aspect': layout['width'] / layout['height'] if layout['height'] else 0.0,
+    }
@@ -0,0 +1,324 @@
+# benchmarks/run_benchmarks.py
+#
+# Headless benchmarks of the hot paths: on_message parsing, dispatch to N DroneWidgets,
+# status panel formatting, mission graph rendering for missions of 5 to 500 states and the
+# fleet analytics tick, MQTT ingestion through the in-process broker stand-in, the
+# latency and drawing quality of every available layout backend, and the delivery latency of
+# mode changes against routine telemetry.
+#
+# To run:            python -m benchmarks.run_benchmarks
+# Save a baseline:   python -m benchmarks.run_benchmarks --save-baseline baseline.json
+# Check regressions: python -m benchmarks.run_benchmarks --baseline baseline.json
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PySide6.QtWidgets import QApplication
+
+from benchmarks.fleet import make_layout, make_mission_spec, make_payloads, make_update
+from benchmarks.harness import compare, load_results, measure, peak_rss_mb, print_table, save_results, summarize
+from benchmarks.layout_quality import layout_quality
+from graph_layout import BACKENDS, LAYOUT_ERRORS, layout_mission
+from layout_cache import LayoutCache
+from layout_worker import LayoutWorker
+from main import MainWindow
+from mission_scene import MissionGraphScene
+from mission_visualizer import MissionVisualizer
+from mqtt_ingest import InProcessBroker, IngestRoute, MqttIngest
+from status_visualization import StatusVisualization
+from telemetry import TelemetryParser, TelemetrySample
+from telemetry_coalescer import CRITICAL, ROUTINE
+from telemetry_recorder import ReplayMessage
+
+try:
+    from fleet_analytics import FleetAnalytics
+except ImportError:
+    FleetAnalytics = None
+
+SUITES = ['parse', 'dispatch', 'format', 'graph', 'layout', 'analytics', 'ingest', 'priority']
+
+
+class BenchmarkWindow(MainWindow):
+    # MainWindow without a broker connection
+    def setup_mqtt(self):
+        pass
+
+    def dispose(self):
+        self.telemetry_coalescer.stop()
+        self.layout_worker.shutdown()
+        self.hide()
+        self.deleteLater()
+
+
+def run_parse(results, args):
+    drone_ids = [f"Drone{i}" for i in range(10)]
+    payloads = make_payloads(drone_ids, args.messages)
+
+    parser = TelemetryParser()
+    results['parse/parse_update'] = summarize(measure(parser.parse_update, payloads))
+
+    window = BenchmarkWindow()
+    messages = [ReplayMessage('update_drone', payload) for payload in payloads]
+    results['parse/on_message'] = summarize(measure(lambda message: window.on_message(None, None, message), messages))
+    window.dispose()
+
+
+def run_dispatch(results, args, app):
+    mission_spec = make_mission_spec(20)
+    for fleet_size in args.fleet_sizes:
+        window = BenchmarkWindow()
+        window.resize(1280, 900)
+        window.show()
+        drone_ids = [f"Drone{i}" for i in range(fleet_size)]
+        for drone_id in drone_ids:
+            window.handle_drone_data_received(drone_id)
+        app.processEvents()
+        window.update_panel_visibility()
+
+        samples = [(drone_ids[i % fleet_size], TelemetrySample.from_update(make_update(drone_ids[i % fleet_size], i, mission_spec)))
+                   for i in range(args.messages // 10)]
+        results[f'dispatch/{fleet_size} drones'] = summarize(
+            measure(lambda item: window.update_drone_received.emit(*item), samples))
+        window.dispose()
+
+
+def run_format(results, args):
+    status_widget = StatusVisualization('Red')
+    samples = [TelemetrySample.from_update(make_update('Red', i)) for i in range(args.messages // 4)]
+    results['format/formatData'] = summarize(measure(status_widget.formatData, samples))
+    status_widget.field_values.clear()
+    results['format/display_status'] = summarize(measure(status_widget.display_status, samples))
+
+
+def lay_out_missions(app, worker, specs):
+    # Wall time from requesting every layout at once until the last one is ready
+    done = set()
+    worker.layout_ready.connect(lambda drone_id, generation, layout: done.add(drone_id))
+    worker.layout_failed.connect(lambda drone_id, generation, error: done.add(drone_id))
+    start = time.perf_counter()
+    for i, mission_spec in enumerate(specs):
+        worker.request_layout(f"Drone{i}", mission_spec)
+    while len(done) < len(specs):
+        app.processEvents()
+        time.sleep(0.001)
+    return time.perf_counter() - start
+
+
+def run_graph(results, args, app):
+    graphviz_available = True
+    for num_states in args.mission_sizes:
+        mission_spec = make_mission_spec(num_states, seed=num_states)
+        repeats = max(3, 200 // num_states)
+
+        try:
+            layouts = measure(lambda spec: layout_mission(spec), [mission_spec] * repeats, warmup=1)
+            results[f'graph/layout {num_states} states'] = summarize(layouts)
+            layout = layout_mission(mission_spec)
+        except LAYOUT_ERRORS as e:
+            print(f"Skipping Graphviz layout for {num_states} states: {e}")
+            graphviz_available = False
+            layout = make_layout(mission_spec)
+
+        results[f'graph/scene {num_states} states'] = summarize(
+            measure(lambda layout: MissionGraphScene(layout, '#FF0000'), [layout] * repeats, warmup=1))
+
+        visualizer = MissionVisualizer('Red')
+        visualizer.mission_spec = mission_spec
+        visualizer.build_mission_scene(layout)
+        samples = [TelemetrySample.from_update(make_update('Red', i * 10, mission_spec)) for i in range(args.messages // 10)]
+        results[f'graph/state update {num_states} states'] = summarize(
+            measure(lambda sample: visualizer.handle_update_drone('Red', sample), samples))
+
+        # Re-published specs: unchanged, then with one condition edited (applied without a layout)
+        edited = json.loads(json.dumps(mission_spec))
+        edited['states'][0]['transitions'][0]['condition'] = 'ready'
+        specs = [json.loads(json.dumps(mission_spec)), edited] * repeats
+        results[f'graph/spec update {num_states} states'] = summarize(
+            measure(lambda spec: visualizer.handle_mission_spec('Red', spec), specs))
+
+    if not graphviz_available:
+        return
+    # Many drones loading different large missions at once: pool threads against worker processes
+    num_states = max(args.mission_sizes)
+    specs = [make_mission_spec(num_states, seed=seed) for seed in range(8)]
+    for processes in (0, os.cpu_count() or 1):
+        worker = LayoutWorker(LayoutCache(), processes=processes)
+        lay_out_missions(app, worker, [make_mission_spec(5)])  # Starts the worker processes
+        mode = f"processes={processes}" if processes else "threads"
+        results[f'graph/startup {len(specs)} x {num_states} states, {mode}'] = summarize(
+            [lay_out_missions(app, worker, specs)])
+        worker.shutdown()
+
+
+def run_layout(results, args):
+    # Each backend on its own (no fallback), so the cases compare like with like
+    for name, backend in BACKENDS.items():
+        if not backend.available():
+            print(f"Skipping the {name} layout backend: not available")
+            continue
+        for num_states in args.mission_sizes:
+            mission_spec = make_mission_spec(num_states, seed=num_states)
+            repeats = max(3, 200 // num_states)
+            try:
+                latencies = measure(lambda spec: layout_mission(spec, backends=(name,)), [mission_spec] * repeats, warmup=1)
+            except LAYOUT_ERRORS as e:
+                print(f"Skipping the {name} layout backend for {num_states} states: {e}")
+                continue
+            summary = summarize(latencies)
+            summary.update(layout_quality(layout_mission(mission_spec, backends=(name,))))
+            results[f'layout/{name} {num_states} states'] = summary
+
+
+def print_layout_quality(results):
+    cases = {case: summary for case, summary in results['cases'].items() if case.startswith('layout/')}
+    if not cases:
+        return
+    print(f"{'layout case':<40} {'crossings':>10} {'overlaps':>9} {'edge len':>10} {'area':>12} {'aspect':>7}")
+    for case, summary in cases.items():
+        print(f"{case:<40} {summary['crossings']:>10} {summary['node_overlaps']:>9} {summary['edge_length']:>10.0f} "
+              f"{summary['area']:>12.0f} {summary['aspect']:>7.2f}")
+
+
+def run_analytics(results, args):
+    if FleetAnalytics is None:
+        print("Skipping fleet analytics: NumPy is not installed")
+        return
+    for fleet_size in args.fleet_sizes + [200]:
+        analytics = FleetAnalytics()
+        for i in range(fleet_size * 10):
+            # Spread the drones out so positions differ, ten samples each
+            update = make_update(f"Drone{i % fleet_size}", i)
+            update['status']['location']['latitude'] += (i % fleet_size) * 1e-4
+            analytics.update(f"Drone{i % fleet_size}", TelemetrySample.from_update(update))
+        results[f'analytics/{fleet_size} drones'] = summarize(measure(lambda _: analytics.compute(), range(100), warmup=5))
+
+
+def run_ingest(results, args):
+    # Latency from InProcessBroker.publish() to the route handler on the ingest loop thread
+    broker = InProcessBroker()
+    published = {}
+    latencies = []
+
+    def handler(topic, payload):
+        latencies.append(time.perf_counter() - published[payload])
+
+    ingest = MqttIngest('localhost', 1883, [IngestRoute('update_drone', handler, maxsize=args.messages)],
+                        client_factory=broker.client_factory)
+    ingest.start()
+    while not ingest.connected:
+        time.sleep(0.01)
+
+    payloads = make_payloads([f"Drone{i}" for i in range(10)], args.messages)
+    for start in range(0, len(payloads), 100):
+        for payload in payloads[start:start + 100]:
+            published[payload] = time.perf_counter()
+            broker.publish('update_drone', payload)
+        time.sleep(0.002)  # Bursts of 100, so the results show the pipeline rather than a backlog
+    deadline = time.time() + 10
+    while len(latencies) < len(payloads) and time.time() < deadline:
+        time.sleep(0.01)
+    ingest.stop()
+    results['ingest/publish to handler'] = summarize(latencies)
+
+
+def run_priority(results, args, app, fleet_size=50, rounds=200):
+    # Receipt-to-widget latency of mode changes (critical) and of routine telemetry while every
+    # drone streams at 50 Hz; make_update changes the mode of every drone each 50 rounds
+    window = BenchmarkWindow()
+    window.resize(1280, 900)
+    window.show()
+    drone_ids = [f"Drone{i}" for i in range(fleet_size)]
+    for drone_id in drone_ids:
+        window.handle_drone_data_received(drone_id)
+    app.processEvents()
+    window.update_panel_visibility()
+
+    latencies = {CRITICAL: [], ROUTINE: []}
+    modes = {}
+
+    def delivered(drone_id, sample):
+        # Connected after the window's own slots, so the widgets are already updated
+        priority = CRITICAL if modes.get(drone_id, sample.mode) != sample.mode else ROUTINE
+        modes[drone_id] = sample.mode
+        latencies[priority].append(time.time() - sample.received_at)
+
+    window.telemetry_coalescer.drone_updated.connect(delivered)
+
+    def feed():
+        for i in range(rounds):
+            for drone_id in drone_ids:
+                window.telemetry_coalescer.push(drone_id, TelemetrySample.from_update(make_update(drone_id, i)))
+            time.sleep(0.02)
+
+    feeder = threading.Thread(target=feed, name='priority-feed', daemon=True)
+    feeder.start()
+    while feeder.is_alive():
+        app.processEvents()
+        time.sleep(0.001)
+    deadline = time.time() + 0.5
+    while time.time() < deadline:
+        app.processEvents()
+    results[f'priority/critical, {fleet_size} drones'] = summarize(latencies[CRITICAL])
+    results[f'priority/routine, {fleet_size} drones'] = summarize(latencies[ROUTINE])
+    window.dispose()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Headless benchmarks of the visualizer hot paths")
+    parser.add_argument('--suite', action='append', choices=SUITES, help="suite to run (default: all)")
+    parser.add_argument('--messages', type=int, default=20000, help="messages per parse case")
+    parser.add_argument('--fleet-sizes', type=int, nargs='+', default=[1, 10, 50, 100])
+    parser.add_argument('--mission-sizes', type=int, nargs='+', default=[5, 20, 100, 500])
+    parser.add_argument('--output', metavar='PATH', help="write the results as JSON")
+    parser.add_argument('--save-baseline', metavar='PATH', help="write the results as a new baseline")
+    parser.add_argument('--baseline', metavar='PATH', help="compare against a baseline and fail on regressions")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed p50 slowdown against the baseline")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    suites = args.suite or SUITES
+
+    cases = {}
+    if 'parse' in suites:
+        run_parse(cases, args)
+    if 'dispatch' in suites:
+        run_dispatch(cases, args, app)
+    if 'format' in suites:
+        run_format(cases, args)
+    if 'graph' in suites:
+        run_graph(cases, args, app)
+    if 'layout' in suites:
+        run_layout(cases, args)
+    if 'analytics' in suites:
+        run_analytics(cases, args)
+    if 'ingest' in suites:
+        run_ingest(cases, args)
+    if 'priority' in suites:
+        run_priority(cases, args, app)
+    results = {'cases': cases, 'peak_rss_mb': peak_rss_mb()}
+
+    print_table(results)
+    print_layout_quality(results)
+    if args.output:
+        save_results(args.output, results)
+    if args.save_baseline:
+        save_results(args.save_baseline, results)
+    if args.baseline:
+        regressions = compare(results, load_results(args.baseline), args.tolerance)
+        for case, previous, current, ratio in regressions:
+            print(f"REGRESSION {case}: p50 {previous:.1f} us -> {current:.1f} us ({ratio:.2f}x)")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
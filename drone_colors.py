@@ -0,0 +1,40 @@
+# drone_colors.py
+
+import zlib
+
+from PySide6.QtGui import QColor
+
+# Map drone IDs to colors
+UAV_COLOR_MAP = {
+    "Orange": "#FFA500",
+    "Blue": "#0000FF",
+    "Red": "#FF0000",
+    "Lime": "#00FF00",
+    "Aqua": "#00FFFF",
+    "Violet": "#EE82EE",
+    "Fuchsia": "#FF00FF",
+    "Gold": "#FFD700",
+    "DodgerBlue": "#1E90FF",
+    "Black": "#000000"
+}
+
+GOLDEN_RATIO = 0.618033988749895
+
+assigned_colors = {}  # Colors assigned to drone IDs that are not in UAV_COLOR_MAP
+
+
+def get_drone_color(drone_id):
+    color = UAV_COLOR_MAP.get(drone_id)
+    if color is not None:
+        return color
+    color = assigned_colors.get(drone_id)
+    if color is None:
+        if QColor.isValidColorName(drone_id):
+            # Drone IDs are usually color names
+            color = QColor(drone_id).name().upper()
+        else:
+            # Spread hues with the golden ratio; crc32 keeps the color stable across restarts
+            hue = (zlib.crc32(drone_id.encode('utf-8')) * GOLDEN_RATIO) % 1.0
+            color = QColor.fromHsvF(hue, 0.7, 0.95).name().upper()
+        assigned_colors[drone_id] = color
+    return color
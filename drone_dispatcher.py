@@ -0,0 +1,46 @@
+# drone_dispatcher.py
+
+
+class DroneDispatcher:
+    # Routes each message to the DroneWidget that owns the drone, so the cost per message
+    # does not grow with the number of drones (no broadcast to every widget).
+
+    def __init__(self):
+        self.drone_widgets = {}  # Map from drone_id to DroneWidget
+        self.pending_mission_specs = {}  # Latest mission spec of drones without a widget yet
+        self.delivered = 0
+        self.unrouted = 0
+
+    def register(self, drone_id, drone_widget):
+        self.drone_widgets[drone_id] = drone_widget
+        # A mission spec can arrive before the drone's first update_drone
+        mission_spec = self.pending_mission_specs.pop(drone_id, None)
+        if mission_spec is not None:
+            drone_widget.handle_mission_spec(drone_id, mission_spec)
+
+    def unregister(self, drone_id):
+        self.drone_widgets.pop(drone_id, None)
+
+    def dispatch_mission_spec(self, drone_id, mission_spec):
+        drone_widget = self.drone_widgets.get(drone_id)
+        if drone_widget is None:
+            self.pending_mission_specs[drone_id] = mission_spec
+            return
+        self.delivered += 1
+        drone_widget.handle_mission_spec(drone_id, mission_spec)
+
+    def dispatch_update(self, drone_id, sample):
+        drone_widget = self.drone_widgets.get(drone_id)
+        if drone_widget is None:
+            self.unrouted += 1
+            return
+        self.delivered += 1
+        drone_widget.handle_update_drone(drone_id, sample)
+
+    def stats(self):
+        return {
+            'drones': len(self.drone_widgets),
+            'delivered': self.delivered,
+            'unrouted': self.unrouted,
+            'pending_mission_specs': len(self.pending_mission_specs),
+        }
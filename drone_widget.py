@@ -1,17 +1,133 @@
 # drone_widget.py
 
-from PySide6.QtWidgets import QWidget
+import time
+
+from PySide6.QtCore import Qt, Slot
+from PySide6.QtWidgets import QWidget, QHBoxLayout, QLabel, QPushButton, QSlider
 from mission_visualizer import MissionVisualizer
-from status_visualization import StatusVisualization
+from status_visualization import StatusVisualization, format_age
+from telemetry_history import TelemetryHistory
+
+STALE_COLOR = '#B22222'  # Timeline label of a drone shown from the fleet snapshot
 
 class DroneWidget(QWidget):
-    def __init__(self, drone_id):
+    def __init__(self, drone_id, layout_worker=None, history_capacity=6000):
         super().__init__()
         self.drone_id = drone_id
 
         # Create the MissionVisualizer and StatusVisualization for this drone
-        self.mission_visualizer = MissionVisualizer(self.drone_id)
+        self.mission_visualizer = MissionVisualizer(self.drone_id, layout_worker)
         self.status_widget = StatusVisualization(self.drone_id)
+        self.panels_visible = True
+
+        # Every delivered sample is kept in a fixed-size ring buffer that the timeline scrubs through
+        self.history = TelemetryHistory(self.drone_id, history_capacity)
+        self.live = True  # False while a past sample is shown
+        self.replay_sequence = None  # Sequence number of the past sample shown
+        self.stale_since = None  # Receive time of a sample restored from the fleet snapshot, until live data arrives
+        self.initTimeline()
+
+    def initTimeline(self):
+        # Timeline below the status panel: drag to go back in time, "Live" to follow the drone again
+        self.timeline_widget = QWidget()
+        timeline_layout = QHBoxLayout(self.timeline_widget)
+        timeline_layout.setContentsMargins(0, 0, 0, 0)
+
+        self.timeline_slider = QSlider(Qt.Horizontal, self.timeline_widget)
+        self.timeline_slider.setRange(0, 0)
+        self.timeline_slider.setEnabled(False)
+        self.timeline_slider.valueChanged.connect(self.scrub)
+        timeline_layout.addWidget(self.timeline_slider, 1)
+
+        self.timeline_label = QLabel("now", self.timeline_widget)
+        self.timeline_label.setMinimumWidth(60)
+        self.timeline_label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
+        timeline_layout.addWidget(self.timeline_label)
+
+        self.live_button = QPushButton("Live", self.timeline_widget)
+        self.live_button.setCheckable(True)
+        self.live_button.setChecked(True)
+        self.live_button.clicked.connect(self.go_live)
+        timeline_layout.addWidget(self.live_button)
+
+    def handle_mission_spec(self, drone_id, mission_spec):
+        self.mission_visualizer.handle_mission_spec(drone_id, mission_spec)
+
+    def handle_update_drone(self, drone_id, sample):
+        if self.stale_since is not None:
+            self.stale_since = None
+            self.timeline_label.setStyleSheet("")
+        self.history.append(sample)
+        if self.live:
+            self.display_sample(sample)
+        if self.panels_visible:
+            self.sync_timeline()
+
+    def show_restored_sample(self, sample):
+        # Last sample of the previous session: shown like live data, with its age in the timeline label
+        self.handle_update_drone(self.drone_id, sample)
+        self.stale_since = sample.received_at or time.time()
+        self.timeline_label.setStyleSheet(f"color: {STALE_COLOR}")
+        self.update_timeline_label()
+
+    def display_sample(self, sample):
+        self.status_widget.update_status_received(self.drone_id, sample)
+        self.mission_visualizer.handle_update_drone(self.drone_id, sample)
+
+    def sync_timeline(self):
+        # Moves the slider range along with the ring buffer without triggering scrub()
+        if not self.history.total:
+            return
+        first, last = self.history.first_sequence(), self.history.last_sequence()
+        self.timeline_slider.blockSignals(True)
+        self.timeline_slider.setEnabled(True)
+        self.timeline_slider.setRange(first, last)
+        self.timeline_slider.setValue(last if self.live else max(self.replay_sequence, first))
+        self.timeline_slider.blockSignals(False)
+        self.update_timeline_label()
+
+    def update_timeline_label(self):
+        if self.live and self.stale_since is not None:
+            self.timeline_label.setText(f"{format_age(time.time() - self.stale_since)} old")
+            return
+        if self.live or not self.history.contains(self.replay_sequence):
+            self.timeline_label.setText("now" if self.live else "")
+            return
+        age = self.history.time_at(self.history.last_sequence()) - self.history.time_at(self.replay_sequence)
+        self.timeline_label.setText(f"-{age:.1f} s")
+
+    @Slot(int)
+    def scrub(self, sequence):
+        # Shows a past sample in both panels; live samples keep being recorded meanwhile
+        if sequence >= self.history.last_sequence():
+            self.go_live()
+            return
+        if not self.history.contains(sequence):
+            return
+        self.live = False
+        self.replay_sequence = sequence
+        self.live_button.setChecked(False)
+        self.display_sample(self.history.sample_at(sequence))
+        self.update_timeline_label()
+
+    @Slot()
+    def go_live(self):
+        self.live = True
+        self.replay_sequence = None
+        self.live_button.setChecked(True)
+        if self.history.total:
+            self.display_sample(self.history.sample_at(self.history.last_sequence()))
+        self.sync_timeline()
+
+    def set_panels_visible(self, visible):
+        # Offscreen or hidden panels only store the latest state and render it when they become visible
+        if visible == self.panels_visible:
+            return
+        self.panels_visible = visible
+        self.mission_visualizer.set_render_enabled(visible)
+        self.status_widget.set_render_enabled(visible)
+        if visible:
+            self.sync_timeline()
 
     def closeEvent(self, event):
         # Close resources if needed
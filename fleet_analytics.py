@@ -0,0 +1,159 @@
+# fleet_analytics.py
+
+import math
+
+import numpy as np
+
+EARTH_RADIUS = 6371000.0  # m
+
+# Per-drone columns, one row per drone (NaN until known)
+COLUMNS = (
+    'time', 'latitude', 'longitude', 'altitude', 'battery',  # Latest sample
+    'prev_time', 'prev_latitude', 'prev_longitude',  # Earlier position, for ground speed
+    'battery_ref_time', 'battery_ref',  # Start of the battery drain window
+    'drain_rate',  # Latest drain estimate, battery fraction per second
+)
+
+
+class FleetAnalytics:
+    # Fleet-wide derived values, computed in one batch of NumPy operations per UI tick:
+    # pairwise separation, closest approach, ground speed from position deltas and battery
+    # drain. update() only writes the latest sample into the per-drone columns.
+    def __init__(self, separation_warning=30.0, approach_horizon=30.0, speed_interval=1.0, drain_window=60.0):
+        self.separation_warning = separation_warning  # m; pairs closer than this are reported
+        self.approach_horizon = approach_horizon  # s; how far ahead closest approaches are predicted
+        self.speed_interval = speed_interval  # s; minimum spacing of the positions used for ground speed
+        self.drain_window = drain_window  # s; span of the battery drain estimate
+
+        self.drone_ids = []
+        self.drone_index = {}  # Map from drone_id to row
+        self.capacity = 16
+        self.data = {column: np.full(self.capacity, np.nan) for column in COLUMNS}
+        self.pairs_count = None  # Fleet size self.pairs was computed for
+        self.pairs = None  # Row indices of every pair of drones
+
+    def add_drone(self, drone_id):
+        index = self.drone_index.get(drone_id)
+        if index is not None:
+            return index
+        index = len(self.drone_ids)
+        if index == self.capacity:
+            # Grow by doubling so adding drones stays amortized O(1)
+            self.capacity *= 2
+            for column, values in self.data.items():
+                grown = np.full(self.capacity, np.nan)
+                grown[:index] = values
+                self.data[column] = grown
+        self.drone_ids.append(drone_id)
+        self.drone_index[drone_id] = index
+        return index
+
+    def update(self, drone_id, sample):
+        i = self.add_drone(drone_id)
+        data = self.data
+        now = sample.timestamp if sample.timestamp is not None else sample.received_at
+
+        # Keep a position at least speed_interval old, so ground speed is not computed over a few ms
+        if not now - data['prev_time'][i] < self.speed_interval:  # Also true while prev_time is NaN
+            data['prev_time'][i] = data['time'][i]
+            data['prev_latitude'][i] = data['latitude'][i]
+            data['prev_longitude'][i] = data['longitude'][i]
+
+        data['time'][i] = now
+        data['latitude'][i] = np.nan if sample.latitude is None else sample.latitude
+        data['longitude'][i] = np.nan if sample.longitude is None else sample.longitude
+        data['altitude'][i] = np.nan if sample.altitude is None else sample.altitude
+        battery = np.nan if sample.battery_level is None else sample.battery_level
+        data['battery'][i] = battery
+
+        # Restart the drain window when it is full, or when the battery went up (swap or charge)
+        if not now - data['battery_ref_time'][i] < self.drain_window or battery > data['battery_ref'][i]:
+            data['battery_ref_time'][i] = now
+            data['battery_ref'][i] = battery
+
+    def compute(self):
+        # Returns the fleet summary: per-drone values and the pairs that are or will be too close
+        count = len(self.drone_ids)
+        data = {column: values[:count] for column, values in self.data.items()}
+        lat = np.radians(data['latitude'])
+        lon = np.radians(data['longitude'])
+        alt = data['altitude']
+
+        # Ground speed and velocity (east, north) from the two stored positions
+        dt = data['time'] - data['prev_time']
+        prev_lat = np.radians(data['prev_latitude'])
+        east = EARTH_RADIUS * np.cos(lat) * (lon - np.radians(data['prev_longitude']))
+        north = EARTH_RADIUS * (lat - prev_lat)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            valid = dt > 0
+            velocity_east = np.where(valid, east / dt, np.nan)
+            velocity_north = np.where(valid, north / dt, np.nan)
+        ground_speed = np.hypot(velocity_east, velocity_north)
+
+        # Battery drain over the current window; the previous estimate is kept while the window is short
+        elapsed = data['time'] - data['battery_ref_time']
+        with np.errstate(invalid='ignore', divide='ignore'):
+            measured = elapsed >= self.drain_window / 4
+            rate = np.where(measured, (data['battery_ref'] - data['battery']) / elapsed, np.nan)
+            drain_rate = np.where(measured, rate, data['drain_rate'])
+            self.data['drain_rate'][:count] = drain_rate
+            time_remaining = np.where(drain_rate > 0, data['battery'] / drain_rate, np.inf)
+
+        # Each unordered pair once (i < j)
+        if count != self.pairs_count:
+            self.pairs = np.triu_indices(count, k=1)
+            self.pairs_count = count
+        first, second = self.pairs
+
+        # Pairwise separation: haversine ground distance combined with the altitude difference
+        lat_i, lat_j = lat[first], lat[second]
+        a = (np.sin((lat_j - lat_i) / 2) ** 2
+             + np.cos(lat_i) * np.cos(lat_j) * np.sin((lon[second] - lon[first]) / 2) ** 2)
+        climb = alt[second] - alt[first]
+        separation = np.hypot(2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0))), climb)
+        separation = np.where(np.isnan(separation), np.inf, separation)
+
+        # Nearest neighbour of each drone
+        matrix = np.full((count, count), np.inf)
+        matrix[first, second] = separation
+        matrix[second, first] = separation
+        nearest = np.argmin(matrix, axis=1) if count else np.zeros(0, dtype=int)
+        nearest_distance = matrix[np.arange(count), nearest] if count else np.zeros(0)
+
+        # Closest approach of each pair, assuming constant velocity, in a local east/north frame
+        # around the fleet (fine at the scale of a few km)
+        reference_lat = np.nanmean(lat) if count and not np.all(np.isnan(lat)) else 0.0
+        x = EARTH_RADIUS * math.cos(reference_lat) * lon
+        y = EARTH_RADIUS * lat
+        dx = x[second] - x[first]
+        dy = y[second] - y[first]
+        dvx = np.nan_to_num(velocity_east[second] - velocity_east[first])
+        dvy = np.nan_to_num(velocity_north[second] - velocity_north[first])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            relative_speed2 = dvx * dvx + dvy * dvy
+            time_to_closest = np.where(relative_speed2 > 0, -(dx * dvx + dy * dvy) / relative_speed2, 0.0)
+        time_to_closest = np.clip(time_to_closest, 0.0, self.approach_horizon)
+        closest = np.hypot(np.hypot(dx + dvx * time_to_closest, dy + dvy * time_to_closest), climb)
+
+        warnings = []
+        for pair in np.flatnonzero(closest < self.separation_warning):  # NaN compares False
+            warnings.append({
+                'drones': (self.drone_ids[first[pair]], self.drone_ids[second[pair]]),
+                'separation': float(separation[pair]),
+                'closest': float(closest[pair]),
+                'time_to_closest': float(time_to_closest[pair]),
+            })
+        warnings.sort(key=lambda warning: (warning['time_to_closest'], warning['closest']))
+
+        drones = {}
+        columns = zip(self.drone_ids, ground_speed.tolist(), nearest.tolist(), nearest_distance.tolist(),
+                      drain_rate.tolist(), time_remaining.tolist())
+        for drone_id, speed, neighbour, distance, drain, remaining in columns:
+            drones[drone_id] = {
+                'ground_speed': speed,
+                'nearest': self.drone_ids[neighbour] if math.isfinite(distance) else None,
+                'nearest_distance': distance,
+                'drain_rate': drain,
+                'time_remaining': remaining,
+            }
+        return {'drones': drones, 'warnings': warnings}
@@ -0,0 +1,74 @@
+# fleet_overview.py
+
+from PySide6.QtGui import QColor
+from PySide6.QtWidgets import QTableWidget, QTableWidgetItem, QAbstractItemView, QHeaderView
+
+from drone_colors import get_drone_color
+from status_visualization import format_text, format_number, format_speed, format_battery_level
+
+# Columns of the overview: (TelemetrySample field, header, formatter)
+OVERVIEW_COLUMNS = [
+    ('uavid', 'Drone', format_text),
+    ('status', 'Status', format_text),
+    ('mode', 'Mode', format_text),
+    ('onboard_pilot', 'Onboard Pilot', format_text),
+    ('armed', 'Armed', format_text),
+    ('altitude', 'ALT', lambda value: format_number(value, 1)),
+    ('speed', 'Speed', format_speed),
+    ('battery_level', 'Battery', format_battery_level),
+]
+
+
+class FleetOverview(QTableWidget):
+    # Compact view with one row per drone. Like the drone panels, it only stores the
+    # latest sample per drone while hidden and renders it once it is shown again.
+
+    def __init__(self, parent=None):
+        super().__init__(0, len(OVERVIEW_COLUMNS), parent)
+        self.setHorizontalHeaderLabels([header for _, header, _ in OVERVIEW_COLUMNS])
+        self.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.verticalHeader().hide()
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+
+        self.drone_rows = {}  # Map from drone_id to table row
+        self.cell_texts = {}  # Map from (row, column) to the text currently displayed
+        self.render_enabled = False
+        self.pending_samples = {}  # Latest sample per drone received while hidden
+
+    def add_drone(self, drone_id):
+        if drone_id in self.drone_rows:
+            return
+        row = self.rowCount()
+        self.insertRow(row)
+        self.drone_rows[drone_id] = row
+        for column in range(len(OVERVIEW_COLUMNS)):
+            self.setItem(row, column, QTableWidgetItem(""))
+        id_item = self.item(row, 0)
+        id_item.setText(drone_id)
+        id_item.setForeground(QColor(get_drone_color(drone_id)))
+        self.cell_texts[(row, 0)] = drone_id
+
+    def update_drone(self, drone_id, sample):
+        if not self.render_enabled:
+            self.pending_samples[drone_id] = sample
+            return
+        self.display_sample(drone_id, sample)
+
+    def set_render_enabled(self, enabled):
+        self.render_enabled = enabled
+        if enabled:
+            pending, self.pending_samples = self.pending_samples, {}
+            for drone_id, sample in pending.items():
+                self.display_sample(drone_id, sample)
+
+    def display_sample(self, drone_id, sample):
+        row = self.drone_rows.get(drone_id)
+        if row is None:
+            return
+        # Only cells whose text changed are touched
+        for column, (field, _, formatter) in enumerate(OVERVIEW_COLUMNS[1:], start=1):
+            text = formatter(getattr(sample, field))
+            if self.cell_texts.get((row, column)) != text:
+                self.cell_texts[(row, column)] = text
+                self.item(row, column).setText(text)
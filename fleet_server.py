@@ -0,0 +1,289 @@
+# fleet_server.py
+
+import asyncio
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from graph_layout import DEFAULT_BACKENDS, LAYOUT_ERRORS, layout_mission, preferred_backend
+from layout_cache import LayoutCache, mission_spec_key
+from telemetry import TelemetryParser, TelemetrySample, json_dumps, json_loads
+
+# Protocol: one JSON object per line, server to viewer only.
+#   {"type": "snapshot", "drones": {id: fields}, "missions": {id: {"spec", "key"}}, "layouts": {key: layout}}
+#       sent once when a viewer connects
+#   {"type": "update", "drone": id, "fields": {...}}
+#       only the TelemetrySample fields that changed since the previous update of that drone
+#   {"type": "mission", "drone": id, "spec": spec, "key": key, "layout": layout or null}
+#       sent once the mission is laid out, so viewers never run Graphviz for it
+
+MAX_CLIENT_BUFFER = 4 * 1024 * 1024  # Viewers this far behind are disconnected
+
+
+class FleetServer:
+    # Headless fan-out: ingests MQTT once, keeps the latest state of every drone and the mission
+    # layouts, and streams them to any number of viewers over TCP. Telemetry is coalesced per
+    # drone and broadcast as field deltas at flush_hz, encoded once for all viewers.
+    def __init__(self, host, port, flush_hz=20, layout_cache=None, layout_threads=2, layout_timeout=None,
+                 layout_backends=DEFAULT_BACKENDS):
+        self.host = host
+        self.port = port
+        self.flush_interval = 1.0 / flush_hz
+        self.layout_timeout = layout_timeout
+        self.layout_backends = tuple(layout_backends)
+        self.layout_backend = preferred_backend(self.layout_backends)
+        self.layout_cache = layout_cache if layout_cache is not None else LayoutCache()
+        self.layout_executor = ThreadPoolExecutor(max_workers=layout_threads, thread_name_prefix='layout')
+        self.parser = TelemetryParser()
+
+        # Written by the ingest and layout threads
+        self.lock = threading.Lock()
+        self.latest = {}  # Map from drone_id to its latest TelemetrySample not broadcast yet
+        self.missions = {}  # Map from drone_id to (spec, key) of its latest mission spec
+        self.ready_missions = {}  # Map from drone_id to (spec, key, layout) laid out but not announced
+        self.layout_failures = 0  # Missions announced without a layout
+
+        # Only used on the server's event loop
+        self.sent = {}  # Map from drone_id to the fields last broadcast
+        self.announced = {}  # Map from drone_id to (spec, key) announced to the viewers
+        self.layouts = {}  # Map from key to the layout of an announced mission
+        self.clients = set()  # StreamWriters of the connected viewers
+        self.broadcasts = 0
+        self.bytes_sent = 0
+        self.dropped_clients = 0
+
+    def handle_message(self, topic, payload):
+        # MqttIngest route handler, runs on the ingest thread
+        if topic == "update_drone":
+            sample = self.parser.parse_update(payload)
+            if sample is not None and sample.uavid is not None:
+                with self.lock:
+                    self.latest[str(sample.uavid)] = sample
+        elif topic.startswith("drone/") and topic.endswith("/mission-spec"):
+            drone_id = topic.split('/')[1]
+            mission_spec = self.parser.loads(payload)
+            if not isinstance(mission_spec, dict):
+                return
+            key = mission_spec_key(mission_spec, backend=self.layout_backend)
+            with self.lock:
+                if self.missions.get(drone_id, (None, None))[1] == key:
+                    return  # Re-published unchanged spec
+                self.missions[drone_id] = (mission_spec, key)
+            self.layout_executor.submit(self.lay_out, drone_id, mission_spec, key)
+
+    def lay_out(self, drone_id, mission_spec, key):
+        # Runs on a layout thread; missions flown by several drones are laid out once
+        layout = self.layout_cache.get(key)
+        if layout is None:
+            try:
+                layout = layout_mission(mission_spec, drone_id, self.layout_timeout, backends=self.layout_backends)
+                self.layout_cache.put(key, layout)
+            except LAYOUT_ERRORS as e:
+                print(f"Failed to lay out mission graph for {drone_id}: {e}")  # Viewers lay it out themselves
+            except Exception as e:
+                # Anything else (e.g. a malformed spec) would be lost in the executor's future
+                print(f"Failed to lay out mission graph for {drone_id}: {type(e).__name__}: {e}")
+        with self.lock:
+            if layout is None:
+                self.layout_failures += 1
+            if self.missions.get(drone_id, (None, None))[1] == key:
+                self.ready_missions[drone_id] = (mission_spec, key, layout)
+
+    def run(self, ingest):
+        # Blocks until interrupted
+        ingest.start()
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            ingest.stop()
+            self.layout_executor.shutdown(wait=False)
+            print(f"Fleet server: {self.stats()}")
+            print(f"MQTT ingest: {ingest.stats()}")
+
+    async def serve(self):
+        server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        print(f"Serving the fleet on {self.host}:{self.port}")
+        async with server:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                self.broadcast()
+
+    async def handle_client(self, reader, writer):
+        # The snapshot is the state as last broadcast, so the following deltas apply on top of it
+        snapshot = {
+            'type': 'snapshot',
+            'drones': self.sent,
+            'missions': {drone_id: {'spec': spec, 'key': key} for drone_id, (spec, key) in self.announced.items()},
+            'layouts': self.layouts,
+        }
+        writer.write(json_dumps(snapshot) + b'\n')
+        self.clients.add(writer)
+        try:
+            while await reader.read(4096):  # Viewers do not send anything; wait for them to disconnect
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+
+    def broadcast(self):
+        with self.lock:
+            latest, self.latest = self.latest, {}
+            ready, self.ready_missions = self.ready_missions, {}
+
+        lines = []
+        for drone_id, (mission_spec, key, layout) in ready.items():
+            self.announced[drone_id] = (mission_spec, key)
+            if layout is not None:
+                self.layouts[key] = layout
+            lines.append(json_dumps({'type': 'mission', 'drone': drone_id, 'spec': mission_spec, 'key': key, 'layout': layout}))
+        if ready:
+            # Forget layouts no drone flies any more
+            keys = {key for _, key in self.announced.values()}
+            self.layouts = {key: layout for key, layout in self.layouts.items() if key in keys}
+
+        for drone_id, sample in latest.items():
+            fields = sample.as_dict()
+            del fields['received_at']  # Viewers use their own receive time
+            previous = self.sent.get(drone_id)
+            if previous is None:
+                delta = fields
+            else:
+                delta = {name: value for name, value in fields.items() if previous.get(name) != value}
+            self.sent[drone_id] = fields
+            if delta:
+                lines.append(json_dumps({'type': 'update', 'drone': drone_id, 'fields': delta}))
+
+        if not lines or not self.clients:
+            return
+        data = b'\n'.join(lines) + b'\n'
+        self.broadcasts += 1
+        for writer in list(self.clients):
+            if writer.transport.get_write_buffer_size() > MAX_CLIENT_BUFFER:
+                # A stalled viewer must not make the server buffer without bound; it resyncs on reconnect
+                self.dropped_clients += 1
+                self.clients.discard(writer)
+                writer.close()
+                continue
+            writer.write(data)
+            self.bytes_sent += len(data)
+
+    def stats(self):
+        return {
+            'clients': len(self.clients),
+            'drones': len(self.sent),
+            'missions': len(self.announced),
+            'layouts': len(self.layouts),
+            'layout_failures': self.layout_failures,
+            'broadcasts': self.broadcasts,
+            'bytes_sent': self.bytes_sent,
+            'dropped_clients': self.dropped_clients,
+            'layout_cache': self.layout_cache.stats(),
+        }
+
+
+class FleetClient(threading.Thread):
+    # Viewer side of FleetServer. Rebuilds TelemetrySamples from the snapshot and deltas and
+    # hands them to on_sample(drone_id, sample); missions go to on_mission(drone_id, spec, key, layout).
+    # Reconnects with backoff and resyncs from a new snapshot, also after a malformed message.
+    # on_connection_change(connected, last_error) is called on the client thread after every connect,
+    # failed attempt and lost connection.
+    def __init__(self, host, port, on_sample, on_mission, backoff_min=1.0, backoff_max=30.0, on_connection_change=None):
+        super().__init__(name='fleet-client', daemon=True)
+        self.host = host
+        self.port = port
+        self.on_sample = on_sample
+        self.on_mission = on_mission
+        self.on_connection_change = on_connection_change
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.stop_event = threading.Event()
+        self.sock = None
+        self.fields = {}  # Map from drone_id to the current fields of its sample
+
+        self.connected = False
+        self.connects = 0
+        self.messages = 0
+        self.bytes_received = 0
+        self.last_error = None
+
+    def run(self):
+        delay = self.backoff_min
+        while not self.stop_event.is_set():
+            try:
+                self.sock = socket.create_connection((self.host, self.port), timeout=5)
+                self.sock.settimeout(None)
+                self.connected = True
+                self.connects += 1
+                delay = self.backoff_min
+                self.notify()
+                self.receive(self.sock.makefile('rb'))
+            except OSError as e:
+                self.last_error = str(e)
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                # Truncated or malformed line (or a field this version does not know): drop the
+                # connection and resync from a new snapshot
+                self.last_error = f"malformed message from the server: {e}"
+            finally:
+                self.connected = False
+                if self.sock is not None:
+                    self.sock.close()
+                    self.sock = None
+            if self.stop_event.is_set():
+                return
+            self.notify()
+            if self.stop_event.wait(delay):
+                return
+            delay = min(delay * 2, self.backoff_max)
+
+    def notify(self):
+        if self.on_connection_change is not None:
+            self.on_connection_change(self.connected, self.last_error)
+
+    def receive(self, stream):
+        for line in stream:
+            self.bytes_received += len(line)
+            self.messages += 1
+            self.handle(json_loads(line))
+        self.last_error = "connection closed by the server"
+
+    def handle(self, message):
+        kind = message.get('type')
+        if kind == 'update':
+            self.apply(message['drone'], message['fields'])
+        elif kind == 'mission':
+            self.on_mission(message['drone'], message['spec'], message['key'], message.get('layout'))
+        elif kind == 'snapshot':
+            self.fields = {}
+            layouts = message.get('layouts', {})
+            for drone_id, mission in message.get('missions', {}).items():
+                self.on_mission(drone_id, mission['spec'], mission['key'], layouts.get(mission['key']))
+            for drone_id, fields in message.get('drones', {}).items():
+                self.apply(drone_id, fields)
+
+    def apply(self, drone_id, delta):
+        fields = self.fields.setdefault(drone_id, {})
+        fields.update(delta)
+        self.on_sample(drone_id, TelemetrySample(received_at=time.time(), **fields))
+
+    def stop(self):
+        self.stop_event.set()
+        sock = self.sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def stats(self):
+        return {
+            'connected': self.connected,
+            'connects': self.connects,
+            'messages': self.messages,
+            'bytes_received': self.bytes_received,
+            'last_error': self.last_error,
+        }
@@ -0,0 +1,260 @@
+# fleet_snapshot.py
+
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+from telemetry import json_dumps, json_loads
+
+# File layout: HEADER (magic, active slot, slot capacity), then two slots of `slot capacity` bytes.
+# Each slot is SLOT_HEADER (sequence, length, CRC-32) followed by one JSON snapshot. A snapshot is
+# written to the inactive slot and only then made active, so a crash in the middle of a write
+# leaves the previous snapshot readable.
+MAGIC = b'DMVSNAP1'
+HEADER = struct.Struct('<8sII')
+SLOT_HEADER = struct.Struct('<QII')
+MIN_SLOT_CAPACITY = 64 * 1024
+
+# Snapshot contents:
+#   {"saved_at": time, "drones": {id: {"sample": TelemetrySample fields, "cell": [row, column], "mission": key}},
+#    "missions": {key: mission spec}, "layouts": {key: layout}}
+
+
+def read_snapshot(path):
+    # Returns the newest complete snapshot in path, or None
+    try:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < HEADER.size:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                magic, active, capacity = HEADER.unpack_from(view)
+                if magic != MAGIC or active > 1 or HEADER.size + 2 * capacity > size:
+                    return None
+                # The active slot first; the other one holds the previous snapshot
+                for slot in (active, 1 - active):
+                    offset = HEADER.size + slot * capacity
+                    sequence, length, crc = SLOT_HEADER.unpack_from(view, offset)
+                    if not 0 < length <= capacity - SLOT_HEADER.size:
+                        continue
+                    start = offset + SLOT_HEADER.size
+                    payload = view[start:start + length]
+                    if zlib.crc32(payload) == crc:
+                        return json_loads(payload)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class SnapshotFile:
+    # Writer side of the double-buffered snapshot file, mapped into memory. Only used by one thread.
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.map = None
+        self.active = 0
+        self.capacity = 0
+        self.sequence = 0
+
+    def write(self, payload):
+        if self.map is None:
+            self.open_existing()
+        if self.map is None or SLOT_HEADER.size + len(payload) > self.capacity:
+            self.create(payload)
+            return
+
+        slot = 1 - self.active
+        offset = HEADER.size + slot * self.capacity
+        start = offset + SLOT_HEADER.size
+        self.sequence += 1
+        self.map[start:start + len(payload)] = payload
+        self.map[offset:start] = SLOT_HEADER.pack(self.sequence, len(payload), zlib.crc32(payload))
+        self.map.flush()  # The slot is on disk before the header points to it
+        self.map[:HEADER.size] = HEADER.pack(MAGIC, slot, self.capacity)
+        self.map.flush()
+        self.active = slot
+
+    def open_existing(self):
+        # Keeps writing into the file of the previous session, so its snapshot stays in the other slot
+        try:
+            file = open(self.path, 'r+b')
+        except OSError:
+            return
+        try:
+            size = os.fstat(file.fileno()).st_size
+            if size >= HEADER.size:
+                mapped = mmap.mmap(file.fileno(), 0)
+                magic, active, capacity = HEADER.unpack_from(mapped)
+                if magic == MAGIC and active <= 1 and HEADER.size + 2 * capacity <= size:
+                    self.file, self.map, self.active, self.capacity = file, mapped, active, capacity
+                    self.sequence = SLOT_HEADER.unpack_from(mapped, HEADER.size + active * capacity)[0]
+                    return
+                mapped.close()
+        except (OSError, ValueError):
+            pass
+        file.close()
+
+    def create(self, payload):
+        # New file with room to grow, written next to the old one and swapped in atomically
+        self.close()
+        self.capacity = max(MIN_SLOT_CAPACITY, 2 * (SLOT_HEADER.size + len(payload)))
+        self.active = 0
+        self.sequence += 1
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = self.path + '.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, 0, self.capacity))
+            f.write(SLOT_HEADER.pack(self.sequence, len(payload), zlib.crc32(payload)))
+            f.write(payload)
+            f.truncate(HEADER.size + 2 * self.capacity)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+        self.file = open(self.path, 'r+b')
+        self.map = mmap.mmap(self.file.fileno(), 0)
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class FleetSnapshot:
+    # Latest state of every drone (last sample, mission spec and layout, grid cell), written to a
+    # SnapshotFile every `interval` seconds by a writer thread while something changed. The GUI
+    # thread only stores references under the lock; keys, layouts and encoding are resolved on the
+    # writer thread. layout_key(mission_spec) and layout_lookup(key) come from the LayoutWorker
+    # and the LayoutCache; a layout not computed yet is written by a later pass.
+    def __init__(self, path, layout_key, layout_lookup, interval=1.0):
+        self.path = path
+        self.interval = interval
+        self.layout_key = layout_key
+        self.layout_lookup = layout_lookup
+        self.file = SnapshotFile(path)
+
+        self.lock = threading.Lock()
+        self.samples = {}  # Map from drone_id to its latest TelemetrySample
+        self.missions = {}  # Map from drone_id to its latest mission spec
+        self.cells = {}  # Map from drone_id to its (row, column) in the grid
+        self.dirty = False
+
+        self.keys = {}  # Map from drone_id to (mission spec, key); writer thread only
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.writes = 0
+        self.bytes_written = 0
+        self.write_seconds = 0.0
+        self.errors = 0
+        self.last_error = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='fleet-snapshot', daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=2.0):
+        # Writes the last changes before returning
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.thread.join(timeout)
+        self.thread = None
+        self.file.close()
+
+    def update_sample(self, drone_id, sample):
+        with self.lock:
+            self.samples[drone_id] = sample
+            self.dirty = True
+
+    def update_mission(self, drone_id, mission_spec):
+        with self.lock:
+            self.missions[drone_id] = mission_spec
+            self.dirty = True
+
+    def update_cell(self, drone_id, cell):
+        with self.lock:
+            self.cells[drone_id] = cell
+            self.dirty = True
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.write_if_dirty()
+        self.write_if_dirty()
+
+    def write_if_dirty(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            self.dirty = False
+            samples = dict(self.samples)
+            missions = dict(self.missions)
+            cells = dict(self.cells)
+
+        start = time.perf_counter()
+        snapshot = {'saved_at': time.time(), 'drones': {}, 'missions': {}, 'layouts': {}}
+        layouts_pending = False
+        for drone_id, sample in samples.items():
+            drone = {'sample': sample.as_dict(), 'cell': cells.get(drone_id), 'mission': None}
+            mission_spec = missions.get(drone_id)
+            if mission_spec is not None:
+                try:
+                    key = self.mission_key(drone_id, mission_spec)
+                except (KeyError, TypeError, AttributeError) as e:
+                    # Malformed mission spec: the drone is saved without it
+                    self.drop_mission(drone_id, mission_spec, e)
+                    mission_spec = None
+            if mission_spec is not None:
+                drone['mission'] = key
+                if key not in snapshot['missions']:
+                    snapshot['missions'][key] = mission_spec
+                    layout = self.layout_lookup(key)
+                    if layout is not None:
+                        snapshot['layouts'][key] = layout
+                    else:
+                        layouts_pending = True
+            snapshot['drones'][drone_id] = drone
+
+        try:
+            payload = json_dumps(snapshot)
+            self.file.write(payload)
+            self.writes += 1
+            self.bytes_written += len(payload)
+        except (OSError, ValueError, TypeError) as e:
+            self.errors += 1
+            self.last_error = str(e)
+        self.write_seconds += time.perf_counter() - start
+        if layouts_pending:
+            with self.lock:
+                self.dirty = True  # Write again once the layout is ready
+
+    def drop_mission(self, drone_id, mission_spec, error):
+        self.errors += 1
+        self.last_error = f"mission spec of {drone_id}: {type(error).__name__}: {error}"
+        with self.lock:
+            if self.missions.get(drone_id) is mission_spec:  # Unless a newer spec arrived meanwhile
+                del self.missions[drone_id]
+
+    def mission_key(self, drone_id, mission_spec):
+        # Keys are only recomputed when the drone's mission spec changes
+        spec, key = self.keys.get(drone_id, (None, None))
+        if spec is not mission_spec:
+            key = self.layout_key(mission_spec)
+            self.keys[drone_id] = (mission_spec, key)
+        return key
+
+    def stats(self):
+        return {
+            'drones': len(self.samples),
+            'writes': self.writes,
+            'bytes_written': self.bytes_written,
+            'mean_write_ms': self.write_seconds / self.writes * 1e3 if self.writes else 0.0,
+            'errors': self.errors,
+            'last_error': self.last_error,
+        }
@@ -0,0 +1,91 @@
+# fleet_summary.py
+
+import math
+
+from PySide6.QtGui import QColor
+from PySide6.QtWidgets import (
+    QAbstractItemView, QHeaderView, QLabel, QTableWidget, QTableWidgetItem, QVBoxLayout, QWidget
+)
+
+from drone_colors import get_drone_color
+
+DRONE_HEADERS = ['Drone', 'Ground Speed', 'Nearest', 'Separation', 'Drain', 'Remaining']
+WARNING_HEADERS = ['Drones', 'Separation', 'Closest', 'In']
+
+
+def format_distance(meters):
+    return f"{meters:.0f} m" if math.isfinite(meters) else "N/A"
+
+
+def format_duration(seconds):
+    if not math.isfinite(seconds):
+        return "N/A"
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}:{seconds:02d}"
+
+
+def make_table(headers, parent):
+    table = QTableWidget(0, len(headers), parent)
+    table.setHorizontalHeaderLabels(headers)
+    table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+    table.verticalHeader().hide()
+    table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+    table.setSelectionMode(QAbstractItemView.NoSelection)
+    return table
+
+
+class FleetSummary(QWidget):
+    # Shows the results of FleetAnalytics.compute(): separation warnings on top, one row per drone below
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+
+        self.warning_label = QLabel("No separation warnings", self)
+        layout.addWidget(self.warning_label)
+        self.warning_table = make_table(WARNING_HEADERS, self)
+        self.warning_table.setMaximumHeight(140)
+        layout.addWidget(self.warning_table)
+
+        self.drone_table = make_table(DRONE_HEADERS, self)
+        layout.addWidget(self.drone_table)
+        self.drone_rows = {}  # Map from drone_id to table row
+
+    def display(self, summary):
+        warnings = summary['warnings']
+        self.warning_label.setText(f"{len(warnings)} separation warning(s)" if warnings else "No separation warnings")
+        self.warning_label.setStyleSheet("color: red; font-weight: bold;" if warnings else "")
+        self.warning_table.setRowCount(len(warnings))
+        for row, warning in enumerate(warnings):
+            self.set_row(self.warning_table, row, [
+                " / ".join(warning['drones']),
+                format_distance(warning['separation']),
+                format_distance(warning['closest']),
+                "now" if warning['time_to_closest'] == 0 else f"{warning['time_to_closest']:.0f} s",
+            ])
+
+        for drone_id, values in summary['drones'].items():
+            row = self.drone_rows.get(drone_id)
+            if row is None:
+                row = self.drone_rows[drone_id] = self.drone_table.rowCount()
+                self.drone_table.insertRow(row)
+                id_item = QTableWidgetItem(drone_id)
+                id_item.setForeground(QColor(get_drone_color(drone_id)))
+                self.drone_table.setItem(row, 0, id_item)
+            drain = values['drain_rate']
+            self.set_row(self.drone_table, row, [
+                f"{values['ground_speed']:.1f} m/s" if math.isfinite(values['ground_speed']) else "N/A",
+                values['nearest'] or "",
+                format_distance(values['nearest_distance']),
+                f"{drain * 6000:.1f} %/min" if math.isfinite(drain) else "N/A",
+                format_duration(values['time_remaining']),
+            ], start=1)
+
+    def set_row(self, table, row, texts, start=0):
+        # Only cells whose text changed are touched
+        for column, text in enumerate(texts, start=start):
+            item = table.item(row, column)
+            if item is None:
+                table.setItem(row, column, QTableWidgetItem(text))
+            elif item.text() != text:
+                item.setText(text)
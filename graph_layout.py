@@ -0,0 +1,252 @@
+# graph_layout.py
+
+import importlib.util
+import json
+import shutil
+import subprocess
+import time
+from subprocess import CalledProcessError
+
+from layered_layout import layered_layout
+from perf_monitor import perf
+
+# Placeholder node that stands in for an onboard_pilot state that is not part of the mission spec.
+# It is always laid out so that a state change never needs another Graphviz run.
+DYNAMIC_STATE = 'DynamicState'
+
+# Render attributes used for every mission graph
+GRAPH_ATTRS = {'ranksep': '0.3 equally', 'nodesep': '1 equally', 'splines': 'lines', 'rankdir': 'TB'}
+NODE_ATTRS = {'shape': 'rectangle', 'fontname': 'Times-Roman', 'fontsize': '14'}
+EDGE_ATTRS = {'fontname': 'Times-Roman', 'fontsize': '14'}
+
+POINTS_PER_INCH = 72.0
+
+
+class ExecutableNotFound(RuntimeError):
+    # The dot executable is not installed (graphviz.ExecutableNotFound without importing graphviz)
+    def __init__(self, command):
+        super().__init__(f"failed to execute {command[0]!r}, make sure the Graphviz executables are on your systems' PATH")
+        self.command = command
+
+    def __reduce__(self):
+        # Rebuilt from the command when it comes back from a layout worker process
+        return ExecutableNotFound, (self.command,)
+
+
+class LayoutBackendError(RuntimeError):
+    # A backend failed with an error of its own (e.g. pygraphviz), wrapped so it can be caught and pickled
+    pass
+
+
+# Raised by layout_mission when Graphviz is missing, fails, or runs past its timeout
+LAYOUT_ERRORS = (ExecutableNotFound, CalledProcessError, subprocess.TimeoutExpired, LayoutBackendError)
+
+# Layout backends tried in order; the first available one is preferred, the next ones are fallbacks
+DEFAULT_BACKENDS = ('pygraphviz', 'dot', 'layered')
+
+
+def mission_graph(mission_spec):
+    # Collect nodes (in first-seen order) and edges from the mission spec
+    nodes = {}
+    edges = []
+    for state in mission_spec.get('states', []):
+        state_name = state['name']
+        nodes.setdefault(state_name, state_name)
+        for transition in state.get('transitions', []):
+            target = transition['target']
+            edges.append((state_name, target, transition.get('condition', '')))
+            nodes.setdefault(target, target)
+
+    # Reserve a slot for the dynamic state, connected to 'RunTasks' when it exists
+    if DYNAMIC_STATE not in nodes:
+        nodes[DYNAMIC_STATE] = ''
+        if 'RunTasks' in nodes:
+            edges.append(('RunTasks', DYNAMIC_STATE, ''))
+            edges.append((DYNAMIC_STATE, 'RunTasks', ''))
+    return nodes, edges
+
+
+def build_digraph(nodes, edges):
+    # graphviz is imported with the first Graphviz layout, not at startup
+    from graphviz import Digraph
+
+    dot = Digraph('StateMachine')
+    dot.attr('graph', **GRAPH_ATTRS)
+    dot.attr('node', **NODE_ATTRS)
+    dot.attr('edge', **EDGE_ATTRS)
+    for node, label in nodes.items():
+        dot.node(node, label=label)
+    for tail, head, condition in edges:
+        dot.edge(tail, head, label=condition)
+    return dot
+
+
+def parse_point(text, height):
+    # Graphviz puts the origin in the bottom-left corner, Qt in the top-left
+    x, y = text.split(',')[:2]
+    return [float(x), height - float(y)]
+
+
+def parse_dot_json(data):
+    # Convert the output of `dot -Tjson` into a plain, JSON-serializable layout
+    bb = [float(value) for value in data['bb'].split(',')]
+    height = bb[3]
+    layout = {'width': bb[2], 'height': height, 'nodes': {}, 'edges': []}
+
+    names = {}
+    for obj in data.get('objects', []):
+        if 'pos' not in obj:
+            continue  # Subgraphs carry no position
+        names[obj['_gvid']] = obj['name']
+        x, y = parse_point(obj['pos'], height)
+        layout['nodes'][obj['name']] = {
+            'x': x,
+            'y': y,
+            'width': float(obj.get('width', 0.75)) * POINTS_PER_INCH,
+            'height': float(obj.get('height', 0.5)) * POINTS_PER_INCH,
+            'label': obj.get('label', obj['name']),
+        }
+
+    for edge in data.get('edges', []):
+        start = end = None
+        points = []
+        # Spline format: [s,x,y] [e,x,y] followed by 1 + 3n bezier control points
+        for token in edge.get('pos', '').split():
+            if token.startswith('s,'):
+                start = parse_point(token[2:], height)
+            elif token.startswith('e,'):
+                end = parse_point(token[2:], height)
+            else:
+                points.append(parse_point(token, height))
+        layout['edges'].append({
+            'tail': names.get(edge['tail']),
+            'head': names.get(edge['head']),
+            'label': edge.get('label', ''),
+            'label_pos': parse_point(edge['lp'], height) if 'lp' in edge else None,
+            'points': points,
+            'start': start,
+            'end': end,
+        })
+    return layout
+
+
+def run_dot(dot, timeout=None):
+    # Same command as dot.pipe(format='json'), which cannot time out; a stuck dot is killed
+    command = [dot.engine, '-Tjson']
+    try:
+        result = subprocess.run(command, input=dot.source.encode('utf-8'), capture_output=True, timeout=timeout)
+    except FileNotFoundError as e:
+        raise ExecutableNotFound(command) from e
+    if result.returncode:
+        raise CalledProcessError(result.returncode, command, output=result.stdout, stderr=result.stderr)
+    return result.stdout
+
+
+class DotBackend:
+    # The dot executable in a subprocess, killed after timeout seconds
+    name = 'dot'
+
+    def available(self):
+        return shutil.which('dot') is not None
+
+    def lay_out(self, nodes, edges, timeout, stages):
+        start = time.perf_counter()
+        dot = build_digraph(nodes, edges)
+        built = time.perf_counter()
+        stages['layout.build'] = built - start
+        data = run_dot(dot, timeout)
+        piped = time.perf_counter()
+        stages['layout.pipe'] = piped - built
+        layout = parse_dot_json(json.loads(data))
+        stages['layout.decode'] = time.perf_counter() - piped
+        return layout
+
+
+class PygraphvizBackend:
+    # Graphviz through libgvc/cgraph in the calling process: same layout as dot without a fork/exec.
+    # It cannot be interrupted, so the timeout is only enforced with LayoutWorker processes, by
+    # recycling the pool. Its errors (which differ between pygraphviz versions) become LayoutBackendError.
+    name = 'pygraphviz'
+
+    def available(self):
+        # Checked without importing it; libgvc is only loaded by the first layout
+        return importlib.util.find_spec('pygraphviz') is not None
+
+    def lay_out(self, nodes, edges, timeout, stages):
+        import pygraphviz
+
+        start = time.perf_counter()
+        try:
+            graph = pygraphviz.AGraph(string=build_digraph(nodes, edges).source)
+            built = time.perf_counter()
+            stages['layout.build'] = built - start
+            data = graph.draw(format='json', prog='dot')
+            piped = time.perf_counter()
+            stages['layout.pipe'] = piped - built
+            layout = parse_dot_json(json.loads(data))
+        except Exception as e:
+            raise LayoutBackendError(f"pygraphviz layout failed: {e}") from None
+        stages['layout.decode'] = time.perf_counter() - piped
+        return layout
+
+
+class LayeredBackend:
+    # layered_layout.py: pure Python, always available, fastest on small missions
+    name = 'layered'
+
+    def available(self):
+        return True
+
+    def lay_out(self, nodes, edges, timeout, stages):
+        start = time.perf_counter()
+        layout = layered_layout(nodes, edges)
+        stages['layout.layered'] = time.perf_counter() - start
+        return layout
+
+
+BACKENDS = {backend.name: backend for backend in (PygraphvizBackend(), DotBackend(), LayeredBackend())}
+
+
+def available_backends(backends=DEFAULT_BACKENDS):
+    # The configured backends that can run here, in order; the first one if none can (it raises the error)
+    return [name for name in backends if BACKENDS[name].available()] or list(backends[:1])
+
+
+def preferred_backend(backends=DEFAULT_BACKENDS):
+    return available_backends(backends)[0]
+
+
+def layout_mission(mission_spec, drone_id=None, timeout=None, timings=None, backends=DEFAULT_BACKENDS):
+    # Lay out the mission graph once and return node coordinates and edge splines. A backend that
+    # fails or times out falls back to the next one; the layout records the backend that made it.
+    # When timings is given (in a worker process), stage durations are stored in it instead of recorded.
+    nodes, edges = mission_graph(mission_spec)
+    candidates = available_backends(backends)
+    for position, name in enumerate(candidates):
+        stages = {}
+        try:
+            layout = BACKENDS[name].lay_out(nodes, edges, timeout, stages)
+            break
+        except LAYOUT_ERRORS as e:
+            if position + 1 == len(candidates):
+                raise
+            print(f"{name} layout failed, falling back to {candidates[position + 1]}: {e}")
+
+    # Only the reserved placeholder is hidden/relabelled, never a DynamicState from the spec itself
+    layout['dynamic_state'] = nodes[DYNAMIC_STATE] == ''
+    layout['backend'] = name
+    if name != candidates[0]:
+        layout['fallback'] = True  # Not persisted, the preferred backend gets another try after a restart
+    if timings is not None:
+        timings.update(stages)
+    elif perf.enabled:
+        for stage, seconds in stages.items():
+            perf.record(stage, drone_id, seconds)
+    return layout
+
+
+def layout_in_worker(mission_spec, timeout=None, backends=DEFAULT_BACKENDS):
+    # Entry point of the layout worker processes; returns (layout, stage timings)
+    timings = {}
+    layout = layout_mission(mission_spec, timeout=timeout, timings=timings, backends=backends)
+    return layout, timings
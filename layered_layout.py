@@ -0,0 +1,341 @@
+# layered_layout.py
+
+import bisect
+import math
+
+# Sizes in points, matching the Graphviz attributes in graph_layout (ranksep 0.3, nodesep 1,
+# Times-Roman 14, rectangles of at least 0.75 x 0.5 inch)
+RANK_SEP = 0.3 * 72
+NODE_SEP = 1.0 * 72
+MIN_NODE_WIDTH = 0.75 * 72
+NODE_HEIGHT = 0.5 * 72
+CHAR_WIDTH = 7.0  # Average Times-Roman 14 glyph width
+LABEL_HEIGHT = 17.0
+NODE_PADDING = 8.0
+DUMMY_EXTENT = 4.0  # Half width of the point a long edge passes through on an intermediate layer
+DUMMY_SEP = 12.0  # Gap next to dummies, between real nodes it is NODE_SEP
+LOOP_WIDTH = 30.0  # How far a self-transition loops out of its node
+ARROW_LENGTH = 10.0
+MARGIN = 4.0
+ORDER_SWEEPS = 12  # Barycenter passes of the crossing reduction
+ORDER_PATIENCE = 3  # Passes without fewer crossings before the reduction stops
+PLACE_SWEEPS = 8  # Passes of the coordinate assignment
+
+# How strongly an edge pulls its ends into line; long edges are kept straight, like dot does
+EDGE_WEIGHTS = {(False, False): 1.0, (False, True): 2.0, (True, False): 2.0, (True, True): 8.0}
+
+
+def text_width(text):
+    return len(text) * CHAR_WIDTH
+
+
+def layered_layout(nodes, edges):
+    # Sugiyama-style layered layout of the graph returned by graph_layout.mission_graph(), in the
+    # same format as graph_layout.parse_dot_json(). Mission state machines are small, so plain
+    # Python is fast enough (no process, no Graphviz):
+    #   1. break cycles by reversing DFS back edges, 2. rank by longest path,
+    #   3. split every edge into one point per layer (a layer between ranks holds the labels),
+    #   4. order the layers by barycenter sweeps, keeping the order with the fewest crossings,
+    #   5. place each layer as close to its neighbours as spacing allows (isotonic regression).
+    names = list(nodes)
+    index = {name: i for i, name in enumerate(names)}
+    count = len(names)
+
+    graph_edges = []  # (tail, head, label, edge number) between distinct nodes
+    loops = {}  # Map from node to the labels of its self-transitions
+    for number, (tail, head, label) in enumerate(edges):
+        if tail == head:
+            loops.setdefault(index[tail], []).append((number, label))
+        else:
+            graph_edges.append((index[tail], index[head], label, number))
+
+    reversed_edges = find_back_edges(count, graph_edges)
+    dag = [(head, tail) if number in reversed_edges else (tail, head) for tail, head, _, number in graph_edges]
+    rank = rank_nodes(count, dag)
+    lowest = min(rank, default=0)
+    rank = [r - lowest for r in rank]
+
+    # Items on the layers: real nodes first, then one dummy per edge and intermediate layer
+    layer_of = [2 * r for r in rank]
+    left = []
+    right = []
+    heights = []
+    for i, name in enumerate(names):
+        half = max(MIN_NODE_WIDTH, text_width(nodes[name]) + 2 * NODE_PADDING) / 2
+        loop_room = sum(LOOP_WIDTH + 6 * k + text_width(label) + 8 for k, (_, label) in enumerate(loops.get(i, [])))
+        left.append(half)
+        right.append(half + loop_room)
+        heights.append(NODE_HEIGHT)
+    is_dummy = [False] * count
+
+    chains = {}  # Map from edge number to its items from the real tail to the real head
+    label_items = {}  # Map from edge number to the dummy its label is next to
+    links = []  # (upper item, lower item) between adjacent layers
+    for (tail, head, label, number), (upper, lower) in zip(graph_edges, dag):
+        chain = [upper]
+        middle = (layer_of[upper] + layer_of[lower]) // 2
+        for layer in range(layer_of[upper] + 1, layer_of[lower]):
+            item = len(layer_of)
+            layer_of.append(layer)
+            is_dummy.append(True)
+            left.append(DUMMY_EXTENT)
+            heights.append(LABEL_HEIGHT if label and layer == middle else 0.0)
+            right.append(DUMMY_EXTENT + text_width(label) + 8 if label and layer == middle else DUMMY_EXTENT)
+            if label and layer == middle:
+                label_items[number] = item
+            chain.append(item)
+        chain.append(lower)
+        links.extend(zip(chain, chain[1:]))
+        chains[number] = chain if number not in reversed_edges else chain[::-1]
+
+    layers = [[] for _ in range(max(layer_of) + 1)] if layer_of else []
+    for item, layer in enumerate(layer_of):
+        layers[layer].append(item)
+    up = [[] for _ in layer_of]  # Neighbours on the layer above
+    down = [[] for _ in layer_of]
+    for upper, lower in links:
+        weight = EDGE_WEIGHTS[(is_dummy[upper], is_dummy[lower])]
+        down[upper].append((lower, weight))
+        up[lower].append((upper, weight))
+
+    layers = order_layers(layers, up, down)
+    x = place_layers(layers, up, down, left, right, is_dummy)
+
+    # Layer rows from the top; label layers are only as tall as their labels
+    y = [0.0] * len(layer_of)
+    top = MARGIN
+    for layer in layers:
+        height = max((heights[item] for item in layer), default=0.0)
+        for item in layer:
+            y[item] = top + height / 2
+        top += height + RANK_SEP
+    shift = MARGIN - min((x[item] - left[item] for item in range(len(x))), default=0.0)
+    x = [value + shift for value in x]
+
+    layout = {
+        'width': max((x[item] + right[item] for item in range(len(x))), default=0.0) + MARGIN,
+        'height': max(top - RANK_SEP + MARGIN, 2 * MARGIN),
+        'nodes': {},
+        'edges': [None] * len(edges),
+    }
+    for i, name in enumerate(names):
+        layout['nodes'][name] = {
+            'x': x[i], 'y': y[i], 'width': left[i] * 2, 'height': heights[i], 'label': nodes[name],
+        }
+
+    for tail, head, label, number in graph_edges:
+        chain = chains[number]
+        centers = [(x[item], y[item]) for item in chain]
+        start = clip_to_box(centers[0], centers[1], left[chain[0]], NODE_HEIGHT / 2)
+        tip = clip_to_box(centers[-1], centers[-2], left[chain[-1]], NODE_HEIGHT / 2)
+        label_pos = None
+        if number in label_items:
+            item = label_items[number]
+            label_pos = [x[item] + DUMMY_EXTENT + 4 + text_width(label) / 2, y[item]]
+        layout['edges'][number] = polyline_edge(names[tail], names[head], label, [start] + centers[1:-1] + [tip], label_pos)
+
+    for i, node_loops in loops.items():
+        for k, (number, label) in enumerate(node_loops):
+            layout['edges'][number] = loop_edge(names[i], label, x[i] + left[i], y[i], k)
+    return layout
+
+
+def find_back_edges(count, edges):
+    # Edge numbers closing a cycle in a depth-first search that visits nodes in mission order
+    successors = [[] for _ in range(count)]
+    for tail, head, _, number in edges:
+        successors[tail].append((head, number))
+    state = [0] * count  # 0 unvisited, 1 on the stack, 2 done
+    back = set()
+    for root in range(count):
+        if state[root]:
+            continue
+        state[root] = 1
+        stack = [(root, iter(successors[root]))]
+        while stack:
+            node, children = stack[-1]
+            for child, number in children:
+                if state[child] == 1:
+                    back.add(number)
+                elif state[child] == 0:
+                    state[child] = 1
+                    stack.append((child, iter(successors[child])))
+                    break
+            else:
+                state[node] = 2
+                stack.pop()
+    return back
+
+
+def rank_nodes(count, dag):
+    # Longest path from the sources, then sources are pulled down next to their successors
+    successors = [[] for _ in range(count)]
+    indegree = [0] * count
+    for tail, head in dag:
+        successors[tail].append(head)
+        indegree[head] += 1
+    rank = [0] * count
+    ready = [node for node in range(count) if indegree[node] == 0]
+    order = []
+    while ready:
+        node = ready.pop(0)
+        order.append(node)
+        for head in successors[node]:
+            rank[head] = max(rank[head], rank[node] + 1)
+            indegree[head] -= 1
+            if indegree[head] == 0:
+                ready.append(head)
+    has_predecessor = {head for _, head in dag}
+    for node in order:
+        if node not in has_predecessor and successors[node]:
+            rank[node] = min(rank[head] for head in successors[node]) - 1
+    return rank
+
+
+def count_crossings(upper_layer, down, position):
+    # Crossings between a layer and the next one: pairs of links whose ends are in opposite order
+    crossings = 0
+    seen = []  # Sorted positions of the lower ends of the links of the items to the left
+    for item in upper_layer:
+        lowers = [position[lower] for lower, _ in down[item]]
+        for lower in lowers:
+            crossings += len(seen) - bisect.bisect_right(seen, lower)
+        for lower in lowers:
+            bisect.insort(seen, lower)
+    return crossings
+
+
+def total_crossings(layers, down):
+    position = [0] * len(down)
+    for layer in layers:
+        for i, item in enumerate(layer):
+            position[item] = i
+    return sum(count_crossings(layer, down, position) for layer in layers[:-1])
+
+
+def order_layers(layers, up, down):
+    # Alternating down and up barycenter sweeps; ties keep the current order
+    best = [list(layer) for layer in layers]
+    best_crossings = total_crossings(best, down)
+    current = [list(layer) for layer in layers]
+    stale = 0
+    for sweep in range(ORDER_SWEEPS):
+        if best_crossings == 0 or stale == ORDER_PATIENCE:
+            break
+        downward = sweep % 2 == 0
+        span = range(1, len(current)) if downward else range(len(current) - 2, -1, -1)
+        for layer_index in span:
+            fixed = current[layer_index - 1] if downward else current[layer_index + 1]
+            fixed_position = {item: i for i, item in enumerate(fixed)}
+            neighbours = up if downward else down
+            keys = {}
+            for i, item in enumerate(current[layer_index]):
+                linked = [fixed_position[other] for other, _ in neighbours[item]]
+                keys[item] = (sum(linked) / len(linked) if linked else i, i)
+            current[layer_index].sort(key=keys.get)
+        crossings = total_crossings(current, down)
+        if crossings < best_crossings:
+            best_crossings = crossings
+            best = [list(layer) for layer in current]
+            stale = 0
+        else:
+            stale += 1
+    return best
+
+
+def isotonic_place(desired, gaps):
+    # Positions closest (least squares) to desired that keep the order and x[i+1] - x[i] >= gaps[i]
+    offsets = [0.0]
+    for gap in gaps:
+        offsets.append(offsets[-1] + gap)
+    # Pool adjacent violators on desired - offset, which must be non-decreasing
+    blocks = []  # [mean, size]
+    for value in (d - o for d, o in zip(desired, offsets)):
+        blocks.append([value, 1])
+        while len(blocks) > 1 and blocks[-2][0] > blocks[-1][0]:
+            mean, size = blocks.pop()
+            blocks[-1][0] = (blocks[-1][0] * blocks[-1][1] + mean * size) / (blocks[-1][1] + size)
+            blocks[-1][1] += size
+    result = []
+    for mean, size in blocks:
+        result.extend([mean] * size)
+    return [value + offset for value, offset in zip(result, offsets)]
+
+
+def place_layers(layers, up, down, left, right, is_dummy):
+    x = [0.0] * len(left)
+    gaps = []
+    for layer in layers:
+        layer_gaps = []
+        for a, b in zip(layer, layer[1:]):
+            gap = DUMMY_SEP if is_dummy[a] or is_dummy[b] else NODE_SEP
+            layer_gaps.append(right[a] + left[b] + gap)
+        gaps.append(layer_gaps)
+        position = 0.0
+        for i, item in enumerate(layer):
+            x[item] = position
+            if i < len(layer_gaps):
+                position += layer_gaps[i]
+
+    def pull(layer_index, neighbours):
+        layer = layers[layer_index]
+        desired = []
+        for item in layer:
+            total = weighted = 0.0
+            for other, weight in neighbours[item]:
+                total += weight
+                weighted += x[other] * weight
+            desired.append(weighted / total if total else x[item])
+        for item, value in zip(layer, isotonic_place(desired, gaps[layer_index])):
+            x[item] = value
+
+    for sweep in range(PLACE_SWEEPS):
+        if sweep % 2 == 0:
+            for layer_index in range(1, len(layers)):
+                pull(layer_index, up)
+        else:
+            for layer_index in range(len(layers) - 2, -1, -1):
+                pull(layer_index, down)
+    both = [above + below for above, below in zip(up, down)]
+    for layer_index in range(len(layers)):
+        pull(layer_index, both)
+    return x
+
+
+def clip_to_box(center, toward, half_width, half_height):
+    # Point where the segment from a node's center toward another point leaves the node's box
+    dx = toward[0] - center[0]
+    dy = toward[1] - center[1]
+    if dx == 0 and dy == 0:
+        return list(center)
+    scale = min(half_width / abs(dx) if dx else math.inf, half_height / abs(dy) if dy else math.inf)
+    return [center[0] + dx * scale, center[1] + dy * scale]
+
+
+def polyline_edge(tail, head, label, points, label_pos):
+    # Straight segments (splines=lines) as cubic Bezier control points, like dot's pos attribute;
+    # the path stops ARROW_LENGTH before the tip, where the arrowhead starts
+    tip = points[-1]
+    base = points[-2]
+    length = math.hypot(tip[0] - base[0], tip[1] - base[1])
+    shorten = min(ARROW_LENGTH, length / 2) / length if length else 0.0
+    points = points[:-1] + [[tip[0] + (base[0] - tip[0]) * shorten, tip[1] + (base[1] - tip[1]) * shorten]]
+    control = [list(points[0])]
+    for (ax, ay), (bx, by) in zip(points, points[1:]):
+        control.append([ax + (bx - ax) / 3, ay + (by - ay) / 3])
+        control.append([ax + 2 * (bx - ax) / 3, ay + 2 * (by - ay) / 3])
+        control.append([bx, by])
+    return {'tail': tail, 'head': head, 'label': label, 'label_pos': label_pos,
+            'points': control, 'start': None, 'end': list(tip)}
+
+
+def loop_edge(name, label, side, y, k):
+    # Self-transition: a loop out of the right side of the node, the k-th one further out
+    reach = LOOP_WIDTH + 6 * k
+    rise = NODE_HEIGHT / 4
+    start = [side, y - rise]
+    tip = [side, y + rise]
+    points = [start, [side + reach, y - rise - 10], [side + reach, y + rise + 10], [side + ARROW_LENGTH, y + rise]]
+    label_pos = [side + reach + 4 + text_width(label) / 2, y] if label else None
+    return {'tail': name, 'head': name, 'label': label, 'label_pos': label_pos,
+            'points': points, 'start': None, 'end': tip}
@@ -0,0 +1,124 @@
+# layout_cache.py
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from graph_layout import GRAPH_ATTRS, NODE_ATTRS, EDGE_ATTRS
+
+# Bump when the layout format changes so persisted layouts are not reused
+LAYOUT_VERSION = 2
+
+
+def mission_spec_key(mission_spec, render_attrs=None, backend='dot'):
+    # Canonical hash of the parts of a mission spec that affect the layout, plus the render attributes
+    # and the layout backend. State and transition order is kept since it changes the layout.
+    states = []
+    for state in mission_spec.get('states', []):
+        transitions = [[transition['target'], transition.get('condition', '')]
+                       for transition in state.get('transitions', [])]
+        states.append([state['name'], transitions])
+    if render_attrs is None:
+        render_attrs = {'graph': GRAPH_ATTRS, 'node': NODE_ATTRS, 'edge': EDGE_ATTRS}
+    canonical = json.dumps([LAYOUT_VERSION, backend, render_attrs, states], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class LayoutCache:
+    # Bounded LRU of mission layouts shared by all drones, with an optional on-disk tier
+
+    def __init__(self, max_entries=128, cache_dir=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.entries = OrderedDict()  # Map from key to layout, least recently used first
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_hits = 0
+        self.disk_writes = 0
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get(self, key, load_from_disk=True):
+        with self.lock:
+            layout = self.entries.get(key)
+            if layout is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return layout
+        if not load_from_disk:
+            # Memory-only lookup (e.g. on the GUI thread); the miss is counted by the full lookup
+            return None
+
+        layout = self.load_from_disk(key)
+        with self.lock:
+            if layout is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self.insert(key, layout)
+        return layout
+
+    def peek(self, key):
+        # Memory-only lookup that leaves the counters and the LRU order alone (e.g. for the fleet snapshot)
+        with self.lock:
+            return self.entries.get(key)
+
+    def put(self, key, layout):
+        with self.lock:
+            self.insert(key, layout)
+        self.save_to_disk(key, layout)
+
+    def insert(self, key, layout):
+        # Must be called with the lock held
+        self.entries[key] = layout
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def load_from_disk(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self.disk_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_to_disk(self, key, layout):
+        if not self.cache_dir or layout.get('fallback'):
+            return
+        path = self.disk_path(key)
+        if os.path.exists(path):
+            return
+        # Write to a temporary file first so a crash never leaves a truncated layout behind
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(layout, f, separators=(',', ':'))
+            os.replace(tmp_path, path)
+            with self.lock:
+                self.disk_writes += 1
+        except OSError as e:
+            print(f"Failed to write layout cache entry {path}: {e}")
+
+    def stats(self):
+        with self.lock:
+            return {
+                'size': len(self.entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'disk_hits': self.disk_hits,
+                'disk_writes': self.disk_writes,
+            }
@@ -0,0 +1,242 @@
+# layout_worker.py
+
+import multiprocessing
+import threading
+import subprocess
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal, Slot
+
+from graph_layout import DEFAULT_BACKENDS, LAYOUT_ERRORS, layout_in_worker, layout_mission, preferred_backend
+from layout_cache import LayoutCache, mission_spec_key
+from perf_monitor import perf
+
+POOL_TIMEOUT_GRACE = 1.0  # Seconds a worker process gets past the timeout to time out or fall back itself
+
+
+class LayoutTask(QRunnable):
+    def __init__(self, worker, drone_id, generation, key, mission_spec):
+        super().__init__()
+        self.worker = worker
+        self.drone_id = drone_id
+        self.generation = generation
+        self.key = key
+        self.mission_spec = mission_spec
+
+    def run(self):
+        try:
+            self.lay_out()
+        finally:
+            self.worker.task_done()
+
+    def lay_out(self):
+        # Drop requests that were superseded while waiting in the queue
+        if not self.worker.is_current(self.drone_id, self.generation):
+            self.worker.count_superseded()
+            return
+
+        # Another drone may have laid out the same mission in the meantime
+        layout = self.worker.layout_cache.get(self.key) if self.key is not None else None
+        if layout is None:
+            try:
+                layout = self.worker.compute(self.key, self.mission_spec, self.drone_id)
+            except LAYOUT_ERRORS + (BrokenProcessPool,) as e:
+                self.worker.layout_failed.emit(self.drone_id, self.generation, str(e))
+                return
+            except Exception as e:
+                # E.g. a malformed mission spec or a worker process that could not be started; the
+                # panel must not keep waiting (compute() has already dropped the in-flight entry)
+                self.worker.layout_failed.emit(self.drone_id, self.generation, f"{type(e).__name__}: {e}")
+                return
+
+        if self.worker.is_current(self.drone_id, self.generation):
+            self.worker.layout_ready.emit(self.drone_id, self.generation, layout)
+        else:
+            self.worker.count_superseded()
+
+
+class LayoutWorker(QObject):
+    # Runs Graphviz layouts on a thread pool; results come back on the GUI thread through signals.
+    # Only the latest request per drone is delivered, older ones are dropped before they run.
+    #
+    # With processes > 0 the layouts themselves (graph construction, dot and JSON decoding) run in
+    # a pool of worker processes, so large missions of several drones are laid out in parallel
+    # instead of taking turns on the GIL; the pool threads only wait for them. A mission requested
+    # by several drones at once is laid out once. timeout (s) kills a dot run that takes longer;
+    # with processes, a worker that is still busy POOL_TIMEOUT_GRACE later (e.g. in pygraphviz,
+    # which cannot be interrupted) is killed with the rest of the pool.
+    #
+    # backends: layout backends in order of preference (graph_layout.BACKENDS). The first one
+    # available at startup is part of the cache key; the others are only used when it fails.
+    #
+    # Results are routed to the receiver registered for the drone (register()), so each result
+    # costs one queued call whatever the number of drones.
+    layout_ready = Signal(str, int, object)  # (drone_id, generation, layout)
+    layout_failed = Signal(str, int, str)  # (drone_id, generation, error)
+
+    def __init__(self, layout_cache=None, max_threads=None, processes=0, timeout=None, backends=DEFAULT_BACKENDS,
+                 parent=None):
+        super().__init__(parent)
+        self.layout_cache = layout_cache if layout_cache is not None else LayoutCache()
+        self.processes = processes
+        self.timeout = timeout
+        self.backends = tuple(backends)
+        self.backend = preferred_backend(self.backends)
+        self.executor = None  # Started with the first layout that is not cached
+        self.pool = QThreadPool(self)
+        if max_threads:
+            self.pool.setMaxThreadCount(max_threads)
+        # Enough waiting threads to keep every process busy
+        self.pool.setMaxThreadCount(max(self.pool.maxThreadCount(), processes))
+
+        self.lock = threading.Lock()
+        self.latest = {}  # Map from drone_id to the generation of its latest request
+        self.in_flight = {}  # Map from key to the Future of the layout being computed
+        self.next_generation = 0
+        self.superseded = 0
+        self.shared = 0  # Requests that waited for the same mission laid out for another drone
+        self.pending = 0  # Tasks queued or running
+
+        self.receivers = {}  # Map from drone_id to the object its results are delivered to (GUI thread only)
+        # Emitted on the pool threads, so the routing slots run on the GUI thread
+        self.layout_ready.connect(self.deliver_ready)
+        self.layout_failed.connect(self.deliver_failed)
+
+    def register(self, drone_id, receiver):
+        # receiver.handle_layout_ready(drone_id, generation, layout) and
+        # receiver.handle_layout_failed(drone_id, generation, error) get the drone's results
+        self.receivers[drone_id] = receiver
+
+    def unregister(self, drone_id, receiver):
+        if self.receivers.get(drone_id) is receiver:
+            del self.receivers[drone_id]
+
+    @Slot(str, int, object)
+    def deliver_ready(self, drone_id, generation, layout):
+        receiver = self.receivers.get(drone_id)
+        if receiver is not None:
+            receiver.handle_layout_ready(drone_id, generation, layout)
+
+    @Slot(str, int, str)
+    def deliver_failed(self, drone_id, generation, error):
+        receiver = self.receivers.get(drone_id)
+        if receiver is not None:
+            receiver.handle_layout_failed(drone_id, generation, error)
+
+    def request_layout(self, drone_id, mission_spec):
+        # Returns (generation, layout). layout is None when it will arrive later through layout_ready.
+        try:
+            key = self.layout_key(mission_spec)
+        except (KeyError, TypeError, AttributeError):
+            key = None  # Malformed mission spec: its task fails and reports it through layout_failed
+        with self.lock:
+            self.next_generation += 1
+            generation = self.next_generation
+            self.latest[drone_id] = generation
+
+        layout = self.layout_cache.get(key, load_from_disk=False) if key is not None else None
+        if layout is not None:
+            return generation, layout
+
+        with self.lock:
+            self.pending += 1
+        self.pool.start(LayoutTask(self, drone_id, generation, key, mission_spec))
+        return generation, None
+
+    def layout_key(self, mission_spec):
+        return mission_spec_key(mission_spec, backend=self.backend)
+
+    def compute(self, key, mission_spec, drone_id):
+        # Runs on a pool thread; blocks until the layout is computed and cached
+        if key is None:
+            return self.lay_out(mission_spec, drone_id)  # Raises for the malformed spec
+        with self.lock:
+            future = self.in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self.in_flight[key] = Future()
+            else:
+                self.shared += 1
+        if not owner:
+            return future.result()
+
+        try:
+            layout = self.lay_out(mission_spec, drone_id)
+            self.layout_cache.put(key, layout)
+            future.set_result(layout)
+        except BaseException as e:
+            future.set_exception(e)  # The waiting drones fail the same way
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+        return layout
+
+    def lay_out(self, mission_spec, drone_id):
+        executor = self.get_executor()
+        if executor is None:
+            return layout_mission(mission_spec, drone_id, self.timeout, backends=self.backends)
+        wait = self.timeout + POOL_TIMEOUT_GRACE if self.timeout is not None else None
+        try:
+            layout, timings = executor.submit(layout_in_worker, mission_spec, self.timeout, self.backends).result(wait)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed); start a new pool for the next layouts
+            self.recycle_executor(executor)
+            raise
+        except FutureTimeoutError:
+            # The backend ignored the timeout; only killing its process frees the worker
+            self.recycle_executor(executor, terminate=True)
+            raise subprocess.TimeoutExpired('layout worker', self.timeout) from None
+        if perf.enabled:
+            for stage, seconds in timings.items():
+                perf.record(stage, drone_id, seconds)
+        return layout
+
+    def recycle_executor(self, executor, terminate=False):
+        # The next layout starts a new pool; layouts still running in this one fail
+        with self.lock:
+            if self.executor is executor:
+                self.executor = None
+        processes = list(executor._processes.values()) if terminate and executor._processes else []
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None and self.processes > 0:
+                try:
+                    # spawn: forking a process that runs Qt threads is not safe
+                    self.executor = ProcessPoolExecutor(self.processes, multiprocessing.get_context('spawn'))
+                except (OSError, NotImplementedError) as e:
+                    print(f"Layout worker processes unavailable, laying out in threads: {e}")
+                    self.processes = 0
+            return self.executor
+
+    def is_current(self, drone_id, generation):
+        with self.lock:
+            return self.latest.get(drone_id) == generation
+
+    def task_done(self):
+        with self.lock:
+            self.pending -= 1
+
+    def count_superseded(self):
+        with self.lock:
+            self.superseded += 1
+
+    def stats(self):
+        with self.lock:
+            superseded = self.superseded
+            pending = self.pending
+            shared = self.shared
+        return {'backend': self.backend, 'active_threads': self.pool.activeThreadCount(), 'processes': self.processes,
+                'pending': pending, 'superseded': superseded, 'shared': shared}
+
+    def shutdown(self):
+        # Drop queued layouts and wait for the running ones
+        self.pool.clear()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        self.pool.waitForDone(2000)
@@ -1,11 +1,34 @@
 # main.py
 
-from PySide6.QtWidgets import QApplication, QMainWindow, QWidget, QGridLayout
-from PySide6.QtCore import Signal, Slot
+import time
+
+STARTED = time.perf_counter()  # Start of the --startup-profile timeline
+
+from PySide6.QtWidgets import QApplication, QMainWindow, QWidget, QGridLayout, QScrollArea, QStackedWidget, QLabel, QDockWidget
+from PySide6.QtCore import Qt, QEvent, QRect, QTimer, Signal, Slot
+from PySide6.QtGui import QAction
+import importlib.util
+import os
 import sys
-import paho.mqtt.client as mqtt
-import json
-from drone_widget import DroneWidget
+import argparse
+from drone_dispatcher import DroneDispatcher
+from fleet_overview import FleetOverview
+from fleet_snapshot import FleetSnapshot, read_snapshot
+from fleet_summary import FleetSummary
+from layout_cache import LayoutCache
+from layout_worker import LayoutWorker
+from perf_monitor import StartupProfile, perf
+from telemetry_coalescer import CRITICAL, TelemetryCoalescer
+from telemetry import TelemetryParser, TelemetrySample
+from telemetry_recorder import TelemetryRecorder, TelemetryReplayer
+
+# Imported on first use rather than here, so the window is painted sooner: the drone panels and
+# mission rendering stack and NumPy with the first drone, paho when connecting, Graphviz with the
+# first layout. Fleet analytics need NumPy; without it the fleet summary is not available.
+FLEET_ANALYTICS_AVAILABLE = importlib.util.find_spec('numpy') is not None
+
+# Colors of the connection indicator in the status bar
+CONNECTION_COLORS = {'connecting': '#B8860B', 'connected': '#228B22', 'disconnected': '#B22222', 'replay': '#1E5AA8'}
 
 def get_mqtt_config():
     settings = {'mqtt_broker_address': "localhost", 'mqtt_port': 1883}
@@ -13,127 +36,679 @@ def get_mqtt_config():
     port = settings['mqtt_port']
     return {"broker": broker, "port": port}
 
+def get_ingest_config():
+    # Bounded queues between the MQTT connection and the handlers, and the reconnect backoff (seconds)
+    settings = {'telemetry_queue_size': 1000, 'mission_spec_queue_size': 256,
+                'reconnect_backoff_min': 1.0, 'reconnect_backoff_max': 30.0}
+    return {"telemetry_queue_size": settings['telemetry_queue_size'],
+            "mission_spec_queue_size": settings['mission_spec_queue_size'],
+            "backoff_min": settings['reconnect_backoff_min'], "backoff_max": settings['reconnect_backoff_max']}
+
+def get_server_config():
+    # Address of the headless fleet server (--server) and the address viewers connect to (--connect)
+    settings = {'server_host': "localhost", 'server_port': 8765}
+    return {"host": settings['server_host'], "port": settings['server_port']}
+
+def get_layout_cache_config():
+    # Set 'layout_cache_dir' to a directory to keep mission layouts across restarts
+    settings = {'layout_cache_size': 128, 'layout_cache_dir': None}
+    return {"max_entries": settings['layout_cache_size'], "cache_dir": settings['layout_cache_dir']}
+
+def get_layout_worker_config():
+    # Graphviz runs in this many worker processes (0 lays out in threads of the GUI process);
+    # a layout taking longer than the timeout (seconds) is abandoned. Layout backends are tried in
+    # order: 'pygraphviz' (Graphviz in-process), 'dot' (Graphviz subprocess), 'layered' (pure Python)
+    settings = {'layout_processes': os.cpu_count() or 1, 'layout_timeout': 60.0,
+                'layout_backends': ['pygraphviz', 'dot', 'layered']}
+    return {"processes": settings['layout_processes'], "timeout": settings['layout_timeout'],
+            "backends": settings['layout_backends']}
+
+def get_grid_config():
+    # Drone panels are placed left to right in this many columns; rows are added as drones appear
+    settings = {'grid_columns': 3, 'panel_min_width': 320, 'panel_min_height': 300}
+    return {"columns": settings['grid_columns'], "panel_min_width": settings['panel_min_width'],
+            "panel_min_height": settings['panel_min_height']}
+
+def get_telemetry_config():
+    # Rate at which coalesced update_drone messages are delivered to the widgets (10-30 Hz), and the
+    # latency budget of mission specs and mode/armed/onboard_pilot changes, which are delivered at once
+    settings = {'telemetry_flush_hz': 20, 'critical_budget_ms': 100}
+    return {"flush_hz": settings['telemetry_flush_hz'], "budget_ms": settings['critical_budget_ms']}
+
+def get_history_config():
+    # Samples kept per drone for the timeline (5 minutes at the default 20 Hz flush rate)
+    settings = {'history_capacity': 6000}
+    return {"history_capacity": settings['history_capacity']}
+
+def get_analytics_config():
+    # Fleet summary refresh interval, and the distance/time thresholds of the separation warnings
+    settings = {'analytics_interval_ms': 500, 'separation_warning_m': 30.0, 'approach_horizon_s': 30.0}
+    return {"interval_ms": settings['analytics_interval_ms'], "separation_warning": settings['separation_warning_m'],
+            "approach_horizon": settings['approach_horizon_s']}
+
+def get_snapshot_config():
+    # Latest state of every drone, written every interval (seconds) and restored on launch, except with
+    # --replay; drones not heard from for max_age seconds are not restored. A 'snapshot_path' of None disables it.
+    settings = {'snapshot_path': os.path.join(os.path.expanduser('~'), '.drone_visualizer', 'fleet_snapshot.bin'),
+                'snapshot_interval_s': 1.0, 'snapshot_max_age_s': 24 * 3600, 'stale_refresh_ms': 5000}
+    return {"path": settings['snapshot_path'], "interval": settings['snapshot_interval_s'],
+            "max_age": settings['snapshot_max_age_s'], "stale_refresh_ms": settings['stale_refresh_ms']}
+
+def get_startup_config():
+    # The connection starts once the window is painted, or after this delay when it is not (e.g. started minimized)
+    settings = {'connect_fallback_ms': 1000}
+    return {"connect_fallback_ms": settings['connect_fallback_ms']}
+
+def get_perf_config():
+    # Refresh interval of the performance overlay in the status bar
+    settings = {'perf_overlay_interval_ms': 1000}
+    return {"overlay_interval_ms": settings['perf_overlay_interval_ms']}
+
+def create_ingest(handler, on_connection_change=None, recorder=None):
+    # Subscribes to the drone topics and hands their messages to handler(topic, payload)
+    from mqtt_ingest import COALESCE, DROP_OLDEST, IngestRoute, MqttIngest
+
+    mqtt_config = get_mqtt_config()
+    ingest_config = get_ingest_config()
+    routes = [
+        # Older telemetry is worthless once newer telemetry is queued
+        IngestRoute("update_drone", handler, ingest_config['telemetry_queue_size'], DROP_OLDEST),
+        # Only the latest mission spec of each drone matters
+        IngestRoute("drone/+/mission-spec", handler, ingest_config['mission_spec_queue_size'], COALESCE),
+    ]
+    return MqttIngest(mqtt_config["broker"], mqtt_config["port"], routes,
+                      backoff_min=ingest_config['backoff_min'], backoff_max=ingest_config['backoff_max'],
+                      on_connection_change=on_connection_change, recorder=recorder)
+
+def create_fleet_analytics(analytics_config):
+    from fleet_analytics import FleetAnalytics
+
+    return FleetAnalytics(analytics_config['separation_warning'], analytics_config['approach_horizon'])
+
 class MainWindow(QMainWindow):
     drone_data_received = Signal(str)
     mission_spec_received = Signal(str, dict)  # Signal for mission-spec (drone_id, data)
-    update_drone_received = Signal(str, dict)  # Signal for update_drone (drone_id, data)
+    update_drone_received = Signal(str, object)  # Signal for update_drone (drone_id, TelemetrySample)
+    connection_changed = Signal(bool, object)  # Broker or fleet server connection (connected, last error)
 
-    def __init__(self):
+    def __init__(self, record_path=None, replay_path=None, replay_speed=1.0, perf_enabled=False, perf_export_path=None,
+                 server_address=None, startup_profile=None, snapshot_path=None):
         super().__init__()
         self.setWindowTitle("Drone Application")
-        # List of all possible drone IDs/colors
-        self.all_drone_ids = ["Red", "Lime", "Aqua", "Gold", "DodgerBlue", "Orange", "Violet", "Fuchsia"]
         self.drone_widgets = {}  # Map from drone_id to DroneWidget
+        # Delivers each message only to the DroneWidget that owns the drone
+        self.dispatcher = DroneDispatcher()
+        # Mission layouts shared by all drones, computed off the GUI thread
+        self.layout_cache = LayoutCache(**get_layout_cache_config())
+        self.layout_worker = LayoutWorker(self.layout_cache, **get_layout_worker_config(), parent=self)
+        # Only the latest routine update_drone per drone is delivered, at a fixed rate; mission specs
+        # and mode/armed/onboard_pilot changes skip the queue
+        self.telemetry_coalescer = TelemetryCoalescer(**get_telemetry_config(), parent=self)
+        # Separation, closest approach, ground speed and battery drain of the whole fleet (created with the first drone)
+        self.analytics_config = get_analytics_config()
+        self.fleet_analytics = None
+        # Payloads are decoded on the MQTT ingest thread
+        self.telemetry_parser = TelemetryParser()
+        # Optional capture of the raw message stream, and replay of a capture instead of the broker
+        self.recorder = TelemetryRecorder(record_path) if record_path else None
+        self.replayer = None
+        self.fleet_client = None
+        # Map from drone_id to its last raw mission-spec payload; written on the ingest thread, entries
+        # are popped on the GUI thread when the spec's layout fails
+        self.mission_payloads = {}
+        self.duplicate_mission_specs = 0
+        self.ingest = None
+        # Latest state of the fleet, written off the GUI thread and restored on the next launch
+        self.snapshot_config = get_snapshot_config()
+        self.fleet_snapshot = FleetSnapshot(snapshot_path, self.layout_worker.layout_key, self.layout_cache.peek,
+                                            self.snapshot_config['interval']) if snapshot_path else None
+        self.stale_drones = set()  # Drones shown from the snapshot that have not sent live telemetry yet
+        # Hot-path timings, written to perf_export_path on close
+        perf.enabled = perf_enabled
+        self.perf_export_path = perf_export_path
+        # Time to first frame and first telemetry (--startup-profile)
+        self.startup_profile = startup_profile
+        self.first_frame_painted = False
         self.initUI()
-        self.setup_mqtt()
+
+        # The broker (or replay, or fleet server) connection starts after the first frame, so a slow
+        # or unreachable broker never delays the window; connecting itself runs off the GUI thread
+        self.replay_path = replay_path
+        self.replay_speed = replay_speed
+        self.server_address = server_address
+        self.connection_target = None
+        self.connection_started = False
+        self.connect_timer = QTimer(self)
+        self.connect_timer.setSingleShot(True)
+        self.connect_timer.setInterval(get_startup_config()['connect_fallback_ms'])
+        self.connect_timer.timeout.connect(self.start_connection)
+        self.connect_timer.start()
+        # Refreshes the age shown on restored drones
+        self.stale_timer = QTimer(self)
+        self.stale_timer.setInterval(self.snapshot_config['stale_refresh_ms'])
+        self.stale_timer.timeout.connect(self.update_stale_ages)
 
         self.drone_data_received.connect(self.handle_drone_data_received)
+        self.mission_spec_received.connect(self.handle_mission_spec_received)
+        self.update_drone_received.connect(self.handle_update_drone_received)
+        self.connection_changed.connect(self.update_connection_status)
+        # Create the drone's widget first, then deliver the update
+        self.telemetry_coalescer.drone_updated.connect(self.drone_data_received)
+        self.telemetry_coalescer.drone_updated.connect(self.update_drone_received)
+        self.telemetry_coalescer.mission_spec_updated.connect(self.mission_spec_received)
+        self.layout_worker.layout_failed.connect(self.forget_mission_payload)
+        self.mark_startup('window')
 
     def initUI(self):
-        # Create the central widget and set it as the main window's central widget
+        # The fleet is shown either as the grid of drone panels or as the compact overview
+        self.stacked_widget = QStackedWidget()
+        self.setCentralWidget(self.stacked_widget)
+
+        # Create the central widget; it scrolls once the fleet no longer fits in the window
+        self.scroll_area = QScrollArea()
+        self.scroll_area.setWidgetResizable(True)
+        self.stacked_widget.addWidget(self.scroll_area)
         self.central_widget = QWidget()
-        self.setCentralWidget(self.central_widget)
+        self.scroll_area.setWidget(self.central_widget)
+
+        # Compact overview, one row per drone
+        self.fleet_overview = FleetOverview()
+        self.stacked_widget.addWidget(self.fleet_overview)
+
+        view_menu = self.menuBar().addMenu("View")
+        self.compact_action = QAction("Compact overview", self)
+        self.compact_action.setCheckable(True)
+        self.compact_action.toggled.connect(self.set_compact_mode)
+        view_menu.addAction(self.compact_action)
+
+        # Performance overlay: message rate, queue depth and end-to-end latency in the status bar
+        self.perf_action = QAction("Performance overlay", self)
+        self.perf_action.setCheckable(True)
+        self.perf_action.toggled.connect(self.set_perf_overlay)
+        view_menu.addAction(self.perf_action)
+        self.perf_label = QLabel()
+        self.statusBar().addPermanentWidget(self.perf_label)
+        self.perf_label.hide()
+        # Connection indicator: connecting, connected, or the last error while retrying
+        self.connection_label = QLabel()
+        self.statusBar().addWidget(self.connection_label)
+        self.perf_timer = QTimer(self)
+        self.perf_timer.setInterval(get_perf_config()['overlay_interval_ms'])
+        self.perf_timer.timeout.connect(self.update_perf_overlay)
+        self.perf_messages = 0  # Message count at the previous overlay refresh
+        self.perf_refreshed_at = time.perf_counter()
+        self.perf_action.setChecked(perf.enabled)
+
+        # Fleet summary dock, refreshed from FleetAnalytics on a timer while it is shown
+        if FLEET_ANALYTICS_AVAILABLE:
+            self.fleet_summary = FleetSummary()
+            self.summary_dock = QDockWidget("Fleet summary", self)
+            self.summary_dock.setWidget(self.fleet_summary)
+            self.addDockWidget(Qt.RightDockWidgetArea, self.summary_dock)
+            self.summary_dock.hide()
+            summary_action = self.summary_dock.toggleViewAction()
+            view_menu.addAction(summary_action)
+            self.analytics_timer = QTimer(self)
+            self.analytics_timer.setInterval(self.analytics_config['interval_ms'])
+            self.analytics_timer.timeout.connect(self.update_fleet_summary)
+            summary_action.toggled.connect(self.set_fleet_summary_visible)
+
+        # Only panels inside the viewport render; recomputed after scrolling, resizing or minimizing
+        self.visibility_timer = QTimer(self)
+        self.visibility_timer.setSingleShot(True)
+        self.visibility_timer.setInterval(50)
+        self.visibility_timer.timeout.connect(self.update_panel_visibility)
+        self.scroll_area.verticalScrollBar().valueChanged.connect(self.schedule_visibility_update)
+        self.scroll_area.horizontalScrollBar().valueChanged.connect(self.schedule_visibility_update)
 
         # Create the grid layout
         self.grid_layout = QGridLayout()
         self.central_widget.setLayout(self.grid_layout)
 
-        # Initialize empty grid cells (2 rows x 3 columns)
-        self.rows = 2
-        self.columns = 3
-        self.cell_positions = {}  # Map from drone_id to column
+        # Each drone takes one column of a 3-row block (mission on top, status, then the timeline)
+        grid_config = get_grid_config()
+        self.columns = grid_config['columns']
+        self.panel_min_width = grid_config['panel_min_width']
+        self.panel_min_height = grid_config['panel_min_height']
+        self.history_capacity = get_history_config()['history_capacity']
+        self.rows = 0  # Number of drone blocks currently in use
+        self.cell_positions = {}  # Map from drone_id to (block row, column)
+        self.occupied_cells = set()  # Values of cell_positions
+        self.next_cell = 0  # row * columns + column of the first cell that may be free
+
+    @Slot()
+    def start_connection(self):
+        # Runs once, right after the first frame or when connect_timer fires
+        if self.connection_started:
+            return
+        self.connection_started = True
+        self.connect_timer.stop()
+        if self.fleet_snapshot is not None:
+            self.restore_fleet_snapshot()
+            self.fleet_snapshot.start()
+        if self.replay_path:
+            self.setup_replay(self.replay_path, self.replay_speed)
+        elif self.server_address:
+            self.setup_fleet_client(*self.server_address)
+        else:
+            self.setup_mqtt()
+
+    def restore_fleet_snapshot(self):
+        # Shows the fleet as the previous session left it, in the same grid cells. Restored drones are
+        # marked with the age of their data until live telemetry replaces it; they are not fed to the
+        # fleet analytics, so stale positions raise no separation warnings.
+        start = time.perf_counter()
+        snapshot = read_snapshot(self.fleet_snapshot.path)
+        if snapshot is None:
+            return
+        now = time.time()
+        missions = snapshot.get('missions', {})
+        layouts = snapshot.get('layouts', {})
+        # Drones with a usable stored cell are placed first, so the others cannot take their cells
+        drones = [(self.stored_cell(drone), drone_id, drone) for drone_id, drone in snapshot.get('drones', {}).items()]
+        drones.sort(key=lambda item: (item[0] is None, item[0] or ()))
+        for cell, drone_id, drone in drones:
+            try:
+                sample = TelemetrySample(**drone['sample'])
+            except (KeyError, TypeError):
+                continue  # Written by an incompatible version
+            if now - (sample.received_at or 0) > self.snapshot_config['max_age']:
+                continue
+            key = drone.get('mission')
+            if key in layouts:
+                self.layout_cache.put(key, layouts[key])  # The mission graph is drawn without a layout run
+            self.add_drone_widget(drone_id, cell)
+            if key in missions:
+                self.handle_mission_spec_received(drone_id, missions[key])
+            self.drone_widgets[drone_id].show_restored_sample(sample)
+            self.fleet_overview.update_drone(drone_id, sample)
+            self.fleet_snapshot.update_sample(drone_id, sample)
+            self.stale_drones.add(drone_id)
+        if self.stale_drones:
+            self.stale_timer.start()
+        self.mark_startup('restored')
+        print(f"Restored {len(self.stale_drones)} drones from {self.fleet_snapshot.path} "
+              f"in {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    def stored_cell(self, drone):
+        # The snapshot's (row, column) of a drone, or None when it does not fit the current grid
+        cell = drone.get('cell')
+        if not (isinstance(cell, list) and len(cell) == 2 and all(isinstance(value, int) for value in cell)):
+            return None
+        row, column = cell
+        if row < 0 or not 0 <= column < self.columns:
+            return None
+        return row, column
+
+    @Slot()
+    def update_stale_ages(self):
+        if not self.stale_drones:
+            self.stale_timer.stop()
+            return
+        for drone_id in self.stale_drones:
+            self.drone_widgets[drone_id].update_timeline_label()
 
     def setup_mqtt(self):
-        # Create MQTT client and set up callbacks
-        self.client = mqtt.Client()
-        self.client.on_connect = self.on_connect
-        self.client.on_message = self.on_message
+        # MQTT is ingested on its own asyncio loop thread; each topic has a bounded queue, so a
+        # busy GUI drops old telemetry instead of piling up messages
         mqtt_config = get_mqtt_config()
-        self.client.connect(mqtt_config["broker"], mqtt_config["port"])
-        # Start the loop in a separate thread
-        self.client.loop_start()
-
-    def on_connect(self, client, userdata, flags, rc):
-        if rc == 0:
-            # Subscribe to update_drone topic to detect active drones
-            self.client.subscribe("update_drone")
-            for drone_id in self.all_drone_ids:
-                self.client.subscribe(f"drone/{drone_id}/mission-spec")
+        self.connection_target = f"{mqtt_config['broker']}:{mqtt_config['port']}"
+        self.set_connection_status(f"Connecting to {self.connection_target}…", 'connecting')
+        # Messages are recorded as they arrive, including those the queues drop or coalesce later
+        self.ingest = create_ingest(self.handle_message, self.connection_changed.emit, self.recorder)
+        self.ingest.start()
+
+    def setup_fleet_client(self, host, port):
+        # Viewer of a --server instance: telemetry and pre-computed mission layouts come from the server
+        from fleet_server import FleetClient
+
+        self.connection_target = f"{host}:{port}"
+        self.set_connection_status(f"Connecting to {self.connection_target}…", 'connecting')
+        self.fleet_client = FleetClient(host, port, self.telemetry_coalescer.push, self.handle_served_mission,
+                                        on_connection_change=self.connection_changed.emit)
+        self.fleet_client.start()
+
+    def handle_served_mission(self, drone_id, mission_spec, key, layout):
+        # Runs on the fleet client thread; with the layout cached, the LayoutWorker never runs Graphviz.
+        # Stored under this viewer's key, which depends on its own preferred backend; a layout made by
+        # another backend is marked as a fallback, so it is kept in memory only and never persisted.
+        if layout is not None:
+            if layout.get('backend') != self.layout_worker.backend:
+                layout = dict(layout, fallback=True)
+            self.layout_cache.put(self.layout_worker.layout_key(mission_spec), layout)
+        self.telemetry_coalescer.push_mission_spec(drone_id, mission_spec)
+
+    def setup_replay(self, replay_path, replay_speed):
+        # Feed a recorded log into on_message from a separate thread, like the MQTT loop does
+        self.replayer = TelemetryReplayer(replay_path, self.on_message, replay_speed,
+                                          on_finished=lambda count: print(f"Replay finished: {count} messages"))
+        self.set_connection_status(f"Replaying {replay_path}", 'replay')
+        self.mark_startup('connected')
+        self.replayer.start()
+
+    @Slot(bool, object)
+    def update_connection_status(self, connected, error):
+        if connected:
+            self.set_connection_status(f"Connected to {self.connection_target}", 'connected')
+            self.mark_startup('connected')
         else:
-            pass  # Handle connection failure if needed
+            reason = f": {error}" if error else ""
+            self.set_connection_status(f"Not connected to {self.connection_target}{reason} (retrying)", 'disconnected')
+
+    def set_connection_status(self, text, state):
+        self.connection_label.setText(text)
+        self.connection_label.setStyleSheet(f"color: {CONNECTION_COLORS[state]}")
+
+    def mark_startup(self, milestone):
+        if self.startup_profile is None:
+            return
+        elapsed = self.startup_profile.mark(milestone)
+        if elapsed is None:
+            return
+        print(f"Startup: {milestone} after {elapsed * 1e3:.1f} ms")
+        if milestone == 'first_telemetry':
+            print(f"Startup profile (ms): {self.startup_profile.report()}")
 
     def on_message(self, client, userdata, message):
-        topic = message.topic
-        payload = message.payload.decode('utf-8')
+        # paho-style callback, used by the replayer
+        if self.recorder is not None:
+            self.recorder.record(message.topic, message.payload)
+        self.handle_message(message.topic, message.payload)
+
+    def handle_message(self, topic, payload):
+        # Runs on the ingest or replay thread: decode here so the GUI thread only gets typed samples
+        timed = perf.enabled
+        start = time.perf_counter() if timed else 0.0
+        drone_id = None
 
         if topic == "update_drone":
             # Parse the update_drone message
-            try:
-                update = json.loads(payload)
-                drone_id = update.get('uavid')
-                if drone_id and drone_id in self.all_drone_ids:
-                    # Emit signal to handle drone data received
-                    self.drone_data_received.emit(drone_id)
-                    self.update_drone_received.emit(drone_id, update)
-            except json.JSONDecodeError:
-                pass
+            sample = self.telemetry_parser.parse_update(payload)
+            if sample is not None:
+                drone_id = str(sample.uavid) if sample.uavid is not None else None
+                if drone_id:
+                    # Coalesce with pending updates; delivered on the next flush
+                    self.telemetry_coalescer.push(drone_id, sample)
         elif topic.startswith("drone/") and topic.endswith("/mission-spec"):
             drone_id = topic.split('/')[1]
-            try:
-                mission_spec = json.loads(payload)
-                print(f"Received mission spec: {mission_spec}")
-                self.mission_spec_received.emit(drone_id, mission_spec)
-            except json.JSONDecodeError:
-                pass
+            if self.mission_payloads.get(drone_id) == payload:
+                # Re-published byte for byte (e.g. retained message on reconnect): nothing to parse or redraw
+                self.duplicate_mission_specs += 1
+            else:
+                self.mission_payloads[drone_id] = payload
+                mission_spec = self.telemetry_parser.loads(payload)
+                if isinstance(mission_spec, dict):
+                    print(f"Received mission spec: {mission_spec}")
+                    self.telemetry_coalescer.push_mission_spec(drone_id, mission_spec)
+
+        if timed:
+            perf.record('on_message', drone_id, time.perf_counter() - start)
+            perf.count_message()
 
     @Slot(str)
     def handle_drone_data_received(self, drone_id):
         # Check if we already have a DroneWidget for this drone
         if drone_id in self.drone_widgets:
             return
+        self.add_drone_widget(drone_id)
 
-        # Determine the column based on the color/drone_id
-        colors_in_order = self.all_drone_ids
-        color_index = colors_in_order.index(drone_id)
-        column = color_index % self.columns
-
-        # Check if the column is already occupied
-        occupied_columns = [pos for pos in self.cell_positions.values()]
-        if column in occupied_columns:
-            # Find the next available column
-            for col in range(self.columns):
-                if col not in occupied_columns:
-                    column = col
-                    break
-            else:
-                # No available columns
-                return
+    def free_cell(self):
+        # The first cell no drone occupies, growing the grid by one block row when needed
+        while divmod(self.next_cell, self.columns) in self.occupied_cells:
+            self.next_cell += 1
+        return divmod(self.next_cell, self.columns)
+
+    def add_drone_widget(self, drone_id, cell=None):
+        # Places the drone in cell (its cell of the previous session) if it is still free, else in the next free one
+        if cell is None or cell in self.occupied_cells:
+            cell = self.free_cell()
+        row, column = cell
+        self.cell_positions[drone_id] = cell
+        self.occupied_cells.add(cell)
+        self.rows = max(self.rows, row + 1)
+        if self.fleet_snapshot is not None:
+            self.fleet_snapshot.update_cell(drone_id, cell)
 
-        self.cell_positions[drone_id] = column
+        # The drone panels and the mission rendering stack are imported with the first drone, not at startup
+        from drone_widget import DroneWidget
+        if self.fleet_analytics is None and FLEET_ANALYTICS_AVAILABLE:
+            self.fleet_analytics = create_fleet_analytics(self.analytics_config)
 
         # Create the DroneWidget for this drone
-        drone_widget = DroneWidget(drone_id)
+        drone_widget = DroneWidget(drone_id, self.layout_worker, self.history_capacity)
         self.drone_widgets[drone_id] = drone_widget
 
-        # Connect MainWindow signals to DroneWidget
-        self.mission_spec_received.connect(drone_widget.mission_visualizer.handle_mission_spec)
-        self.update_drone_received.connect(drone_widget.status_widget.update_status_received)
-        self.update_drone_received.connect(drone_widget.mission_visualizer.handle_update_drone)
+        # Route this drone's mission specs and updates to the DroneWidget
+        self.dispatcher.register(drone_id, drone_widget)
+        self.fleet_overview.add_drone(drone_id)
 
         # Add the MissionVisualizer and StatusVisualization to the grid
-        self.grid_layout.addWidget(drone_widget.mission_visualizer, 0, column)  # Top row
-        self.grid_layout.addWidget(drone_widget.status_widget, 1, column)       # Bottom row
+        drone_widget.mission_visualizer.setMinimumSize(self.panel_min_width, self.panel_min_height)
+        drone_widget.status_widget.setMinimumWidth(self.panel_min_width)
+        drone_widget.timeline_widget.setMinimumWidth(self.panel_min_width)
+        self.grid_layout.addWidget(drone_widget.mission_visualizer, 3 * row, column)  # Top row of the block
+        self.grid_layout.addWidget(drone_widget.status_widget, 3 * row + 1, column)
+        self.grid_layout.addWidget(drone_widget.timeline_widget, 3 * row + 2, column)  # Bottom row of the block
+        self.schedule_visibility_update()
+
+    @Slot(str, dict)
+    def handle_mission_spec_received(self, drone_id, mission_spec):
+        self.dispatcher.dispatch_mission_spec(drone_id, mission_spec)
+        if self.fleet_snapshot is not None:
+            self.fleet_snapshot.update_mission(drone_id, mission_spec)
+
+    @Slot(str, int, str)
+    def forget_mission_payload(self, drone_id, generation, error):
+        # A spec that could not be laid out is not a duplicate when it is published again, so it is retried
+        self.mission_payloads.pop(drone_id, None)
+
+    @Slot(str, object)
+    def handle_update_drone_received(self, drone_id, sample):
+        if self.startup_profile is not None:
+            self.mark_startup('first_telemetry')
+        if perf.enabled:
+            now = time.time()
+            perf.record('handoff', drone_id, now - sample.received_at)
+            if sample.timestamp is not None:
+                perf.record('end_to_end', drone_id, now - sample.timestamp)
+        self.dispatcher.dispatch_update(drone_id, sample)
+        self.fleet_overview.update_drone(drone_id, sample)
+        if self.fleet_analytics is not None:
+            self.fleet_analytics.update(drone_id, sample)
+        if self.fleet_snapshot is not None:
+            self.fleet_snapshot.update_sample(drone_id, sample)
+        if self.stale_drones:
+            self.stale_drones.discard(drone_id)  # The DroneWidget drops its stale marker itself
+
+    @Slot(bool)
+    def set_compact_mode(self, enabled):
+        self.stacked_widget.setCurrentWidget(self.fleet_overview if enabled else self.scroll_area)
+        self.update_panel_visibility()
+
+    @Slot(bool)
+    def set_fleet_summary_visible(self, visible):
+        if visible:
+            self.update_fleet_summary()
+            self.analytics_timer.start()
+        else:
+            self.analytics_timer.stop()
+
+    @Slot()
+    def update_fleet_summary(self):
+        # One batch computation over the latest sample of every drone
+        if self.fleet_analytics is not None:
+            self.fleet_summary.display(self.fleet_analytics.compute())
+
+    @Slot(bool)
+    def set_perf_overlay(self, enabled):
+        # Showing the overlay also turns the timing hooks on; hiding it leaves --perf collection running
+        if enabled:
+            perf.enabled = True
+            self.perf_messages = perf.messages
+            self.perf_refreshed_at = time.perf_counter()
+            self.update_perf_overlay()
+            self.perf_timer.start()
+            self.perf_label.show()
+        else:
+            self.perf_timer.stop()
+            self.perf_label.hide()
+
+    @Slot()
+    def update_perf_overlay(self):
+        now = time.perf_counter()
+        messages = perf.messages
+        rate = (messages - self.perf_messages) / max(now - self.perf_refreshed_at, 1e-6)
+        self.perf_messages = messages
+        self.perf_refreshed_at = now
+
+        # Messages in the ingest queues, samples waiting for the next flush and mission layouts queued or running
+        queue_depth = self.telemetry_coalescer.stats()['pending'] + self.layout_worker.stats()['pending']
+        if self.ingest is not None:
+            queue_depth += self.ingest.depth()
+        end_to_end = perf.stage('end_to_end')
+        if end_to_end.count:
+            latency = f"e2e p50 {end_to_end.percentile(0.50) * 1e3:.1f} ms, p99 {end_to_end.percentile(0.99) * 1e3:.1f} ms"
+        else:
+            latency = "e2e n/a"
+        critical = self.telemetry_coalescer.latency[CRITICAL]
+        if critical.count:
+            latency += f" | critical p99 {critical.percentile(0.99) * 1e3:.1f} ms"
+        self.perf_label.setText(f"{rate:.0f} msgs/s | queue {queue_depth} | {latency}")
+
+    @Slot()
+    def schedule_visibility_update(self):
+        # Coalesces bursts of scroll/resize events into one visibility pass
+        self.visibility_timer.start()
+
+    @Slot()
+    def update_panel_visibility(self):
+        # Panels scrolled out of view, in a minimized window or behind the compact overview stop rendering
+        shown = self.isVisible() and not self.isMinimized()
+        compact = self.compact_action.isChecked()
+        self.fleet_overview.set_render_enabled(shown and compact)
+
+        grid_shown = shown and not compact
+        viewport_size = self.scroll_area.viewport().size()
+        viewport = QRect(-self.central_widget.pos(), viewport_size)  # In central_widget coordinates
+        for drone_widget in self.drone_widgets.values():
+            visible = grid_shown and (drone_widget.mission_visualizer.geometry().intersects(viewport)
+                                      or drone_widget.status_widget.geometry().intersects(viewport))
+            drone_widget.set_panels_visible(visible)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.schedule_visibility_update()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.first_frame_painted:
+            self.first_frame_painted = True
+            self.mark_startup('first_frame')
+            # Connect once this frame is on screen
+            QTimer.singleShot(0, self.start_connection)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.schedule_visibility_update()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.WindowStateChange:
+            self.schedule_visibility_update()
 
     def closeEvent(self, event):
         # Close the application and clean up resources
-        self.client.loop_stop()
-        self.client.disconnect()
+        if self.ingest is not None:
+            self.ingest.stop()
+        if self.replayer is not None:
+            self.replayer.stop()
+        if self.fleet_client is not None:
+            self.fleet_client.stop()
+        if self.recorder is not None:
+            self.recorder.close()
+        self.connect_timer.stop()
+        self.stale_timer.stop()
+        self.telemetry_coalescer.stop()
+        if self.fleet_snapshot is not None:
+            self.fleet_snapshot.stop()
         for drone_widget in self.drone_widgets.values():
             drone_widget.closeEvent(event)
+        self.layout_worker.shutdown()
+        if perf.enabled:
+            self.print_stats()
+        if self.startup_profile is not None:
+            print(f"Startup profile (ms): {self.startup_profile.report()}")
+        if self.perf_export_path:
+            perf.export(self.perf_export_path)
+            print(f"Performance timings written to {self.perf_export_path}")
         event.accept()
 
+    def print_stats(self):
+        # Counters of every stage, printed on close with --perf (or the performance overlay)
+        if self.fleet_client is not None:
+            print(f"Fleet client: {self.fleet_client.stats()}")
+        if self.fleet_snapshot is not None:
+            print(f"Fleet snapshot: {self.fleet_snapshot.stats()}")
+        print(f"Layout cache: {self.layout_cache.stats()}")
+        print(f"Telemetry: {self.telemetry_coalescer.stats()}")
+        print(f"Delivery latency: {self.telemetry_coalescer.latency_stats()}")
+        print(f"Parsing: {self.telemetry_parser.stats()}")
+        spec_updates = {'duplicate_payloads': self.duplicate_mission_specs}
+        for drone_widget in self.drone_widgets.values():
+            for kind, count in drone_widget.mission_visualizer.spec_updates.items():
+                spec_updates[kind] = spec_updates.get(kind, 0) + count
+        print(f"Mission specs: {spec_updates}")
+        if self.ingest is not None:
+            print(f"MQTT ingest: {self.ingest.stats()}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Drone Mission and Status Visualizer")
+    parser.add_argument('--record', metavar='PATH', help="append every received MQTT message to a log (.gz to compress)")
+    parser.add_argument('--replay', metavar='PATH', help="replay a recorded log instead of connecting to the broker")
+    parser.add_argument('--replay-speed', type=float, default=1.0, metavar='N',
+                        help="replay at N times real time; 0 replays as fast as possible")
+    parser.add_argument('--server', nargs='?', const='', metavar='[HOST:]PORT',
+                        help="run headless: ingest MQTT once and serve telemetry and mission layouts to viewers")
+    parser.add_argument('--connect', nargs='?', const='', metavar='[HOST:]PORT',
+                        help="view the fleet of a --server instance instead of connecting to the broker")
+    parser.add_argument('--perf', action='store_true', help="time the hot paths and show the performance overlay")
+    parser.add_argument('--perf-export', metavar='PATH', help="write the per-drone timing histograms to PATH (JSON) on exit")
+    parser.add_argument('--startup-profile', action='store_true',
+                        help="print the time to first frame, broker connection and first telemetry")
+    # Remaining arguments are left to Qt
+    args, qt_args = parser.parse_known_args()
+    return args, [sys.argv[0]] + qt_args
+
+def parse_address(text):
+    # "HOST:PORT", "PORT" or "" -> (host, port), defaults from get_server_config()
+    server_config = get_server_config()
+    host, _, port = text.rpartition(':')
+    return host or server_config['host'], int(port) if port else server_config['port']
+
+def run_server(address):
+    # Headless fan-out: no window, one broker subscription and one layout per mission for all viewers
+    from fleet_server import FleetServer
+
+    host, port = address
+    layout_config = get_layout_worker_config()
+    server = FleetServer(host, port, get_telemetry_config()['flush_hz'], LayoutCache(**get_layout_cache_config()),
+                         layout_threads=max(layout_config['processes'], 1), layout_timeout=layout_config['timeout'],
+                         layout_backends=layout_config['backends'])
+    server.run(create_ingest(server.handle_message))
+
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    window = MainWindow()
+    args, qt_args = parse_args()
+    if args.server is not None:
+        run_server(parse_address(args.server))
+        sys.exit(0)
+    startup_profile = StartupProfile(STARTED) if args.startup_profile else None
+    if startup_profile is not None:
+        startup_profile.mark('imports')
+    app = QApplication(qt_args)
+    window = MainWindow(record_path=args.record, replay_path=args.replay, replay_speed=args.replay_speed,
+                        perf_enabled=args.perf or bool(args.perf_export), perf_export_path=args.perf_export,
+                        server_address=parse_address(args.connect) if args.connect is not None else None,
+                        startup_profile=startup_profile,
+                        snapshot_path=None if args.replay else get_snapshot_config()['path'])
     window.show()
     sys.exit(app.exec())
\ No newline at end of file
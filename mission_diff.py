@@ -0,0 +1,49 @@
+# mission_diff.py
+
+from graph_layout import mission_graph
+
+
+def edge_conditions(edges):
+    # Map from edge id (tail, head, n) to condition; n tells apart parallel transitions
+    conditions = {}
+    seen = {}
+    for tail, head, condition in edges:
+        n = seen.get((tail, head), 0)
+        seen[(tail, head)] = n + 1
+        conditions[(tail, head, n)] = condition
+    return conditions
+
+
+class MissionDiff:
+    # Differences between two mission specs, as drawn: states, transitions and their conditions.
+    # Fields the graph does not show and the order of states and transitions are ignored.
+    def __init__(self, old_spec, new_spec):
+        old_nodes, old_edges = mission_graph(old_spec)
+        new_nodes, new_edges = mission_graph(new_spec)
+        old_conditions = edge_conditions(old_edges)
+        new_conditions = edge_conditions(new_edges)
+
+        self.added_states = [name for name in new_nodes if name not in old_nodes]
+        self.removed_states = [name for name in old_nodes if name not in new_nodes]
+        self.added_edges = [edge for edge in new_conditions if edge not in old_conditions]
+        self.removed_edges = [edge for edge in old_conditions if edge not in new_conditions]
+        # Map from edge id to (old condition, new condition)
+        self.relabeled_edges = {
+            edge: (old_conditions[edge], condition) for edge, condition in new_conditions.items()
+            if edge in old_conditions and old_conditions[edge] != condition
+        }
+
+    def is_identical(self):
+        return not (self.is_structural() or self.relabeled_edges)
+
+    def is_structural(self):
+        return bool(self.added_states or self.removed_states or self.added_edges or self.removed_edges)
+
+    def states_changed(self):
+        return bool(self.added_states or self.removed_states)
+
+    def labels_only(self):
+        # Only conditions changed, and every changed edge keeps a label. Graphviz reserves no
+        # label position for an unlabelled edge, so adding or removing a label needs a new layout.
+        return (not self.is_structural() and bool(self.relabeled_edges)
+                and all(old and new for old, new in self.relabeled_edges.values()))
@@ -0,0 +1,172 @@
+# mission_scene.py
+
+import math
+
+from PySide6.QtCore import Qt, QPointF, QRectF
+from PySide6.QtGui import QBrush, QColor, QFont, QPainterPath, QPen, QPolygonF
+from PySide6.QtWidgets import QGraphicsScene
+
+from graph_layout import DYNAMIC_STATE
+
+ARROW_SIZE = 8.0
+NODE_PADDING = 8.0
+
+
+def node_rect(node):
+    return QRectF(node['x'] - node['width'] / 2, node['y'] - node['height'] / 2, node['width'], node['height'])
+
+
+class MissionGraphScene(QGraphicsScene):
+    # Native scene built once from a Graphviz layout; state changes only restyle nodes.
+    # A new layout of a changed mission is applied in place by apply_layout().
+
+    def __init__(self, layout, highlight_color, parent=None):
+        super().__init__(parent)
+        self.highlight_brush = QBrush(QColor(highlight_color))
+        self.node_items = {}  # Map from node name to (rect item, text item)
+        self.edge_items = {}  # Map from edge id (tail, head, n) to its path, arrowhead and label items
+        self.edge_labels = {}  # Map from edge id to (label item, label center)
+        self.dynamic_items = []  # Items that are only shown while DynamicState is active
+        self.dynamic_visible = False
+        self.active_node = None
+        self.has_dynamic_state = False
+
+        self.font = QFont('Times')
+        self.font.setPixelSize(14)
+        self.pen = QPen(QColor('black'))
+        self.pen.setWidthF(1.0)
+
+        self.apply_layout(layout)
+
+    def apply_layout(self, layout):
+        # Nodes that are still in the layout keep their items (and highlight) and are only moved;
+        # removed nodes are deleted and added ones created. Edges are redrawn since their splines move.
+        self.has_dynamic_state = layout.get('dynamic_state', False)
+        for items in self.edge_items.values():
+            for item in items:
+                self.removeItem(item)
+        self.edge_items = {}
+        self.edge_labels = {}
+        self.dynamic_items = []
+
+        for name in [name for name in self.node_items if name not in layout['nodes']]:
+            self.removeItem(self.node_items.pop(name)[0])
+            if name == self.active_node:
+                self.active_node = None
+        for name, node in layout['nodes'].items():
+            if name in self.node_items:
+                self.move_node(name, node)
+            else:
+                self.add_node(name, node)
+
+        seen = {}
+        for edge in layout['edges']:
+            # Numbered like MissionDiff edge ids, so a changed condition can be found again
+            n = seen.get((edge['tail'], edge['head']), 0)
+            seen[(edge['tail'], edge['head'])] = n + 1
+            self.add_edge((edge['tail'], edge['head'], n), edge)
+
+        self.set_dynamic_visible(self.dynamic_visible)
+        self.setSceneRect(QRectF(0, 0, layout['width'], layout['height']))
+
+    def add_node(self, name, node):
+        rect_item = self.addRect(node_rect(node), self.pen, Qt.NoBrush)
+        text_item = self.addSimpleText(node['label'], self.font)
+        text_item.setParentItem(rect_item)
+        self.node_items[name] = (rect_item, text_item)
+        self.center_text(rect_item, text_item)
+        if name == DYNAMIC_STATE and self.has_dynamic_state:
+            self.dynamic_items.append(rect_item)
+
+    def move_node(self, name, node):
+        rect_item, text_item = self.node_items[name]
+        rect_item.setRect(node_rect(node))
+        if name == DYNAMIC_STATE and self.has_dynamic_state:
+            self.dynamic_items.append(rect_item)  # Keeps the label of the current dynamic state
+        else:
+            rect_item.setVisible(True)  # May have been the hidden placeholder
+            if text_item.text() != node['label']:
+                text_item.setText(node['label'])
+        self.center_text(rect_item, text_item)
+
+    def add_edge(self, edge_id, edge):
+        points = [QPointF(x, y) for x, y in edge['points']]
+        if not points:
+            return
+
+        path = QPainterPath(points[0])
+        for i in range(1, len(points) - 2, 3):
+            path.cubicTo(points[i], points[i + 1], points[i + 2])
+        if edge['end']:
+            tip = QPointF(*edge['end'])
+            path.lineTo(tip)
+        else:
+            tip = points[-1]
+        items = [self.addPath(path, self.pen)]
+
+        # Arrowhead pointing from the last control point to the tip
+        base = points[-1] if edge['end'] else points[-2] if len(points) > 1 else points[-1]
+        angle = math.atan2(tip.y() - base.y(), tip.x() - base.x())
+        left = QPointF(tip.x() - ARROW_SIZE * math.cos(angle - math.pi / 6),
+                       tip.y() - ARROW_SIZE * math.sin(angle - math.pi / 6))
+        right = QPointF(tip.x() - ARROW_SIZE * math.cos(angle + math.pi / 6),
+                        tip.y() - ARROW_SIZE * math.sin(angle + math.pi / 6))
+        items.append(self.addPolygon(QPolygonF([tip, left, right]), self.pen, QBrush(QColor('black'))))
+
+        if edge['label'] and edge['label_pos']:
+            label_item = self.addSimpleText(edge['label'], self.font)
+            center = QPointF(*edge['label_pos'])
+            self.edge_labels[edge_id] = (label_item, center)
+            self.center_label(label_item, center)
+            items.append(label_item)
+
+        self.edge_items[edge_id] = items
+        if self.has_dynamic_state and DYNAMIC_STATE in (edge['tail'], edge['head']):
+            self.dynamic_items.extend(items)
+
+    def center_label(self, label_item, center):
+        bounds = label_item.boundingRect()
+        label_item.setPos(center.x() - bounds.width() / 2, center.y() - bounds.height() / 2)
+
+    def set_edge_label(self, edge_id, label):
+        # Changes a transition condition in place; False when the edge has no label to change
+        if edge_id not in self.edge_labels:
+            return False
+        label_item, center = self.edge_labels[edge_id]
+        if label_item.text() != label:
+            label_item.setText(label)
+            self.center_label(label_item, center)
+        return True
+
+    def center_text(self, rect_item, text_item):
+        rect = rect_item.rect()
+        bounds = text_item.boundingRect()
+        # Grow the box when the label no longer fits (e.g. the DynamicState label)
+        width = max(rect.width(), bounds.width() + 2 * NODE_PADDING)
+        if width != rect.width():
+            rect = QRectF(rect.center().x() - width / 2, rect.y(), width, rect.height())
+            rect_item.setRect(rect)
+        text_item.setPos(rect.center().x() - bounds.width() / 2, rect.center().y() - bounds.height() / 2)
+
+    def set_dynamic_visible(self, visible):
+        self.dynamic_visible = visible
+        for item in self.dynamic_items:
+            item.setVisible(visible)
+
+    def set_dynamic_label(self, label):
+        if not self.has_dynamic_state:
+            return
+        rect_item, text_item = self.node_items[DYNAMIC_STATE]
+        if text_item.text() != label:
+            text_item.setText(label)
+            self.center_text(rect_item, text_item)
+
+    def set_active_node(self, name):
+        # Only the previously active node and the newly active node are restyled
+        if name == self.active_node:
+            return
+        if self.active_node in self.node_items:
+            self.node_items[self.active_node][0].setBrush(Qt.NoBrush)
+        if name in self.node_items:
+            self.node_items[name][0].setBrush(self.highlight_brush)
+        self.active_node = name
@@ -0,0 +1,93 @@
+# mission_view.py
+
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QPainter
+from PySide6.QtWidgets import QGraphicsView
+
+ZOOM_STEP = 1.25  # Zoom factor per wheel notch
+MIN_ZOOM = 0.25  # Zoom limits, relative to the fitted view
+MAX_ZOOM = 16.0
+
+
+class MissionGraphView(QGraphicsView):
+    # Shows a MissionGraphScene scaled to the widget. Resizing, zooming and panning only change
+    # the view transform; the scene items are vector paths and text, so nothing is laid out or
+    # rasterized again.
+    #
+    # Ctrl+wheel zooms under the cursor, dragging pans, double-click goes back to the fitted view.
+    # Without Ctrl the wheel scrolls the fleet grid unless the graph is zoomed in.
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setRenderHints(QPainter.Antialiasing | QPainter.TextAntialiasing)
+        self.setDragMode(QGraphicsView.ScrollHandDrag)
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        self.setResizeAnchor(QGraphicsView.AnchorViewCenter)
+        self.zoom = 1.0  # Zoom relative to the fitted view
+        self.zoomable = True  # False for placeholder scenes, which are shown unscaled
+        self.fit_to_view = True  # Refit on resize until the user zooms
+
+    def setScene(self, scene, fit=True):
+        # fit=False shows the scene unscaled, e.g. for a placeholder message
+        super().setScene(scene)
+        self.zoomable = fit
+        if fit:
+            self.reset_view()
+        else:
+            self.zoom = 1.0
+            self.set_fit_to_view(False)
+            self.resetTransform()
+
+    def reset_view(self):
+        self.zoom = 1.0
+        self.set_fit_to_view(True)
+        self.fit()
+
+    def set_fit_to_view(self, fit_to_view):
+        # The fitted graph never needs scrollbars; they would shrink the viewport it is fitted to
+        self.fit_to_view = fit_to_view
+        policy = Qt.ScrollBarAlwaysOff if fit_to_view else Qt.ScrollBarAsNeeded
+        self.setHorizontalScrollBarPolicy(policy)
+        self.setVerticalScrollBarPolicy(policy)
+
+    def fit(self):
+        scene = self.scene()
+        if scene is None or scene.sceneRect().isEmpty():
+            return
+        self.fitInView(scene.sceneRect(), Qt.KeepAspectRatio)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.fit_to_view:
+            self.fit()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        # The scene may have been set before the widget got its final size
+        if self.fit_to_view:
+            self.fit()
+
+    def wheelEvent(self, event):
+        if not self.zoomable:
+            event.ignore()
+            return
+        if not event.modifiers() & Qt.ControlModifier:
+            if self.fit_to_view:
+                event.ignore()  # Let the fleet grid scroll
+            else:
+                super().wheelEvent(event)
+            return
+
+        notches = event.angleDelta().y() / 120
+        zoom = min(max(self.zoom * ZOOM_STEP ** notches, MIN_ZOOM), MAX_ZOOM)
+        if zoom != self.zoom:
+            factor = zoom / self.zoom
+            self.zoom = zoom
+            self.set_fit_to_view(False)
+            self.scale(factor, factor)
+        event.accept()
+
+    def mouseDoubleClickEvent(self, event):
+        if self.zoomable:
+            self.reset_view()
+        event.accept()
@@ -1,14 +1,20 @@
 # mission_visualizer.py
 
-from PySide6.QtCore import Qt, Signal, Slot
-from PySide6.QtGui import QColor, QPixmap, QFont
+from PySide6.QtCore import Qt, QTimer, Signal, Slot
+from PySide6.QtGui import QFont
 from PySide6.QtWidgets import (
-    QWidget, QGraphicsView, QVBoxLayout, QGraphicsScene, QLabel, QPushButton, QHBoxLayout
+    QWidget, QVBoxLayout, QGraphicsScene, QLabel, QPushButton, QHBoxLayout
 )
-import paho.mqtt.client as mqtt
 import json
-from graphviz import Digraph
-import re
+import time
+from drone_colors import get_drone_color
+from graph_layout import DYNAMIC_STATE
+from layout_worker import LayoutWorker
+from mission_diff import MissionDiff
+from perf_monitor import perf
+from mission_scene import MissionGraphScene
+from mission_view import MissionGraphView
+from state_index import StateIndex
 '''
 def get_mqtt_config():
     settings = {'mqtt_broker_address': "localhost", 'mqtt_port': 1883}
@@ -21,14 +27,39 @@ class MissionVisualizer(QWidget):
     mission_spec_received = Signal(dict)
     update_drone_received = Signal(dict)
 
-    def __init__(self, drone_id):
+    def __init__(self, drone_id, layout_worker=None):
         super().__init__()
         self.drone_id = drone_id
+        # Layouts are computed off the GUI thread, shared between drones flying the same mission
+        self.layout_worker = layout_worker if layout_worker is not None else LayoutWorker(parent=self)
+        self.layout_generation = None  # Generation of the latest layout request
         self.mission_spec = None
         self.current_state = None
+        self.mode = None
+        self.button_state = None  # (mode, human control) the buttons currently show
+        self.scene = None  # MissionGraphScene for the current mission spec
+        self.scene_spec = None  # Mission spec the scene shows
+        # How new mission specs were applied: unchanged, conditions edited in place, or laid out again
+        self.spec_updates = {'identical': 0, 'relabeled': 0, 'laid_out': 0}
+        self.state_index = None  # StateIndex for the current mission spec
+
+        self.layout_started = None  # time.monotonic() of the layout the placeholder waits for
+
+        # While the panel is not visible, only the latest spec/state is stored
+        self.render_enabled = True
+        self.needs_graph = False
+        self.needs_state = False
 
         self.initUI()
 
+        # Only this drone's layout results are delivered here
+        self.layout_worker.register(self.drone_id, self)
+
+        # Counts up the placeholder while a first layout is computed
+        self.placeholder_timer = QTimer(self)
+        self.placeholder_timer.setInterval(1000)
+        self.placeholder_timer.timeout.connect(self.update_layout_placeholder)
+
         # Connect signals to slots
         # self.mission_spec_received.connect(self.handle_mission_spec)
         # self.update_drone_received.connect(self.handle_update_drone)
@@ -39,17 +70,17 @@ class MissionVisualizer(QWidget):
         self.layout = QVBoxLayout()
         self.setLayout(self.layout)
 
-        # Create the QGraphicsView for displaying the mission graph
-        self.graph_view = QGraphicsView(self)
-        # Create empty scene with placeholder text
-        empty_scene = QGraphicsScene()
-        empty_label = QLabel("No mission data")
-        empty_label.setAlignment(Qt.AlignCenter)
+        # Create the view for displaying the mission graph; it refits on resize and zooms without re-layout
+        self.graph_view = MissionGraphView(self)
+        # Create empty scene with placeholder text, shown until the first mission graph is built
+        self.placeholder_scene = QGraphicsScene()
+        self.placeholder_label = QLabel("No mission data")
+        self.placeholder_label.setAlignment(Qt.AlignCenter)
         font = QFont()
         font.setPointSize(12)
-        empty_label.setFont(font)
-        empty_scene.addWidget(empty_label)
-        self.graph_view.setScene(empty_scene)
+        self.placeholder_label.setFont(font)
+        self.placeholder_scene.addWidget(self.placeholder_label)
+        self.graph_view.setScene(self.placeholder_scene, fit=False)
         self.layout.addWidget(self.graph_view)
 
         # Create the buttons in a horizontal layout
@@ -68,25 +99,61 @@ class MissionVisualizer(QWidget):
         self.button_layout.addWidget(self.human_control_button)
         self.layout.addLayout(self.button_layout)
     
-    @Slot(dict)
+    @Slot(str, dict)
     def handle_mission_spec(self, drone_id, mission_spec):
         if drone_id != self.drone_id:
             return
 
         self.mission_spec = mission_spec
+        if not self.render_enabled:
+            # Offscreen: only keep the latest spec, it is displayed once the panel is visible
+            self.needs_graph = True
+            return
         # Buttons remain disabled
         self.display_mission_graph()
 
-    @Slot(dict)
-    def handle_update_drone(self, drone_id, update):
+    @Slot(str, object)
+    def handle_update_drone(self, drone_id, sample):
         if drone_id != self.drone_id:
             return
-        self.current_state = update.get('status', {}).get('onboard_pilot', 'N/A')
-        mode = update.get('status', {}).get('mode', 'N/A')
-        # Update the mission graph
-        self.display_mission_graph()
+        self.current_state = sample.onboard_pilot
+        self.mode = sample.mode
+        if not self.render_enabled:
+            self.needs_state = True
+            return
+        if perf.enabled:
+            start = time.perf_counter()
+            self.display_current_state()
+            perf.record('mission.update', self.drone_id, time.perf_counter() - start)
+        else:
+            self.display_current_state()
+
+    def set_render_enabled(self, enabled):
+        # Called when the panel scrolls into or out of view, or the window is minimized
+        if enabled == self.render_enabled:
+            return
+        self.render_enabled = enabled
+        if not enabled:
+            return
+        # Render the latest state once
+        if self.needs_graph:
+            self.needs_graph = False
+            self.display_mission_graph()
+        if self.needs_state:
+            self.needs_state = False
+            self.display_current_state()
+
+    def display_current_state(self):
+        # Highlight the current state in the mission graph
+        self.update_current_state()
 
         # Update the buttons
+        mode_upper = self.mode.upper()
+        human_control = 'humancontrol' in self.current_state.lower()
+        if (mode_upper, human_control) == self.button_state:
+            return
+        self.button_state = (mode_upper, human_control)
+
         # Reset button styles
         for button in [self.rtl_button, self.land_button, self.loiter_button, self.human_control_button]:
             if button:
@@ -95,12 +162,11 @@ class MissionVisualizer(QWidget):
         drone_color = self.get_drone_color(self.drone_id)
 
         # Update 'HumanControl' button if onboard_pilot contains 'HumanControl'
-        if 'humancontrol' in self.current_state.lower():
+        if human_control:
             if self.human_control_button:
                 self.human_control_button.setStyleSheet(f"background-color: {drone_color}")
 
         # Update mode buttons
-        mode_upper = mode.upper()
         if mode_upper == 'LAND':
             if self.land_button:
                 self.land_button.setStyleSheet(f"background-color: {drone_color}")
@@ -112,137 +178,106 @@ class MissionVisualizer(QWidget):
                 self.rtl_button.setStyleSheet(f"background-color: {drone_color}")
 
     def get_drone_color(self, drone_id):
-        # Map drone IDs to colors
-        UAV_COLOR_MAP = {
-            "Orange": "#FFA500",
-            "Blue": "#0000FF",
-            "Red": "#FF0000",
-            "Lime": "#00FF00",
-            "Aqua": "#00FFFF",
-            "Violet": "#EE82EE",
-            "Fuchsia": "#FF00FF",
-            "Gold": "#FFD700",
-            "DodgerBlue": "#1E90FF",
-            "Black": "#000000"
-        }
-        return UAV_COLOR_MAP.get(drone_id, "#000000")
+        # Map drone IDs to colors, assigning one to unknown IDs
+        return get_drone_color(drone_id)
     
-    def normalize_state(self, state_name):
-        # Remove known suffixes and prefixes
-        state_name = state_name.lower()
-        # Remove known suffixes
-        known_suffixes = ['px4', 'ardupilot']
-        for suffix in known_suffixes:
-            if state_name.endswith(suffix):
-                state_name = state_name[:-len(suffix)]
-        # Remove any non-alphanumeric characters
-        state_name = re.sub(r'\W+', '', state_name)
-        return state_name.strip()
-
     def display_mission_graph(self):
         if not self.mission_spec:
             return
 
-        mission_spec = self.mission_spec
-        current_state = self.current_state
-
-        # Create a new directed graph with 'png' format
-        dot = Digraph('StateMachine', format='png')
-        dot.attr('graph', ranksep='0.3 equally', dpi='150', bgcolor='transparent', nodesep='1 equally')  # Transparent background
-        dot.attr('node', shape='rectangle', style='filled', fillcolor='transparent', color='black', fontcolor='black')
-        dot.attr('edge', color='black', fontcolor='black')
-        dot.attr(splines='lines') # lines or otho to straight edges
-        dot.attr(rankdir='TB')  # Top to bottom layout
-
-        nodes = set()
-
-        # Store normalized state names for matching
-        state_name_mapping = {}  # Maps normalized state names to actual state names
-
-        for state in mission_spec.get('states', []):
-            state_name = state['name']
-            nodes.add(state_name)
-            # Normalize state name for matching
-            normalized_state_name = self.normalize_state(state_name)
-            state_name_mapping[normalized_state_name] = state_name
-            if 'transitions' in state:
-                for transition in state['transitions']:
-                    target = transition['target']
-                    condition = transition.get('condition', '')
-                    dot.edge(state_name, target, label=condition)
-                    nodes.add(target)
-                    # Normalize target state name
-                    normalized_target_name = self.normalize_state(target)
-                    state_name_mapping[normalized_target_name] = target
-
-        # Normalize current_state for matching
-        current_state_normalized = self.normalize_state(current_state) if current_state else ''
-
-        # **START OF MODIFICATIONS**
-
-        # Check if current_state is not already a node in the graph
-        if current_state and current_state_normalized not in state_name_mapping:
-            # Check if 'RunTasks' is in nodes to connect DynamicState
-            if 'RunTasks' in nodes:
-                # Add a dynamic state node called 'DynamicState' with label as current_state
-                dynamic_state_name = 'DynamicState'
-                nodes.add(dynamic_state_name)
-                # Add edges between 'RunTasks' and 'DynamicState'
-                dot.edge('RunTasks', dynamic_state_name)
-                dot.edge(dynamic_state_name, 'RunTasks')
-                # Map normalized dynamic state name to 'DynamicState'
-                state_name_mapping[current_state_normalized] = dynamic_state_name
-            else:
-                # If 'RunTasks' is not in nodes, just add the dynamic state without connections
-                dynamic_state_name = current_state
-                nodes.add(dynamic_state_name)
-                # Map normalized dynamic state name to current_state
-                state_name_mapping[current_state_normalized] = dynamic_state_name
-
-        # **END OF MODIFICATIONS**
-
-        # Find matching state(s)
-        matched_state = None
-        # current_state_normalized = self.current_state.lower() if self.current_state else ''
-        for normalized_state_name, actual_state_name in state_name_mapping.items():
-            if normalized_state_name in current_state_normalized or current_state_normalized in normalized_state_name:
-                matched_state = actual_state_name
-                break
-
-        # Apply styling to nodes
-        drone_color = self.get_drone_color(self.drone_id)
-        for node in nodes:
-            node_attrs = {}
-            # Default label is node name
-            node_label = node
-            # **MODIFICATION: For DynamicState, set the label to current_state**
-            if node == 'DynamicState':
-                node_label = current_state if current_state else ''
-            node_attrs['label'] = node_label
-            # Check if this node is the matched_state
-            if node == matched_state:
-                node_attrs['style'] = 'filled'
-                node_attrs['fillcolor'] = drone_color
-                node_attrs['fontcolor'] = 'black'
-            # Add the node with attributes
-            dot.node(node, **node_attrs)
-        
-        # Render the graph to an in-memory image
-        png_data = dot.pipe(format='png')
-
-        # Load the image into a QPixmap
-        pixmap = QPixmap()
-        pixmap.loadFromData(png_data)
-
-        if pixmap.isNull():
+        if self.scene is not None:
+            # Re-published or lightly edited missions do not need Graphviz
+            diff = MissionDiff(self.scene_spec, self.mission_spec)
+            if diff.is_identical():
+                self.spec_updates['identical'] += 1
+                self.layout_generation = None  # A layout still pending is for a superseded spec
+                self.scene_spec = self.mission_spec
+                return
+            if diff.labels_only() and all(self.scene.set_edge_label(edge_id, condition)
+                                          for edge_id, (_, condition) in diff.relabeled_edges.items()):
+                self.spec_updates['relabeled'] += 1
+                self.layout_generation = None
+                self.scene_spec = self.mission_spec
+                return
+
+        # Lay out the graph once per distinct mission spec, off the GUI thread unless it is cached
+        self.layout_generation, layout = self.layout_worker.request_layout(self.drone_id, self.mission_spec)
+        if layout is not None:
+            self.build_mission_scene(layout)
+        elif self.scene is None:
+            # A changed mission keeps showing the previous graph until the new one is ready
+            self.layout_started = time.monotonic()
+            self.update_layout_placeholder()
+            self.placeholder_timer.start()
+
+    def update_layout_placeholder(self):
+        states = len(self.mission_spec.get('states', []))
+        elapsed = time.monotonic() - self.layout_started
+        self.show_placeholder(f"Laying out {states} states…" + (f" {elapsed:.0f} s" if elapsed >= 1 else ""))
+
+    def show_placeholder(self, text):
+        self.placeholder_label.setText(text)
+        self.placeholder_label.adjustSize()
+        if self.graph_view.scene() is not self.placeholder_scene:
+            self.graph_view.setScene(self.placeholder_scene, fit=False)
+
+    @Slot(str, int, object)
+    def handle_layout_ready(self, drone_id, generation, layout):
+        # Ignore layouts of superseded mission specs
+        if generation != self.layout_generation:
             return
+        self.placeholder_timer.stop()
+        if not self.render_enabled:
+            # Now cached; the scene is built once the panel is visible
+            self.needs_graph = True
+            return
+        self.build_mission_scene(layout)
 
-        # Display the pixmap in the QGraphicsView
-        scene = QGraphicsScene()
-        # Do not set background to black; keep it transparent
-        scene.addPixmap(pixmap)
-        self.graph_view.setScene(scene)
-        self.graph_view.fitInView(scene.itemsBoundingRect(), Qt.KeepAspectRatio)
+    @Slot(str, int, str)
+    def handle_layout_failed(self, drone_id, generation, error):
+        if generation != self.layout_generation:
+            return
+        self.placeholder_timer.stop()
+        print(f"Failed to lay out mission graph for {self.drone_id}: {error}")
+        if self.scene is None:
+            reason = error.splitlines()[0] if error else "unknown error"
+            self.show_placeholder(f"Could not lay out the mission:\n{reason}")
+
+    def build_mission_scene(self, layout):
+        # Normalized state names and their lookup structures, built once per mission spec
+        self.state_index = StateIndex(self.mission_spec)
+        self.scene_spec = self.mission_spec
+        self.spec_updates['laid_out'] += 1
+
+        # Build native graphics items; later state changes only restyle them
+        start = time.perf_counter() if perf.enabled else 0.0
+        if self.scene is None:
+            self.scene = MissionGraphScene(layout, self.get_drone_color(self.drone_id))
+            self.graph_view.setScene(self.scene)
+        else:
+            # Changed mission: move the surviving nodes, keeping the view's zoom and pan
+            self.scene.apply_layout(layout)
+            if self.graph_view.fit_to_view:
+                self.graph_view.fit()
+        if perf.enabled:
+            perf.record('scene.build', self.drone_id, time.perf_counter() - start)
+        self.update_current_state()
+
+    def update_current_state(self):
+        if self.scene is None:
+            return
+
+        matched_state = self.state_index.resolve(self.current_state)
+        if matched_state == DYNAMIC_STATE and self.scene.has_dynamic_state:
+            self.scene.set_dynamic_label(self.current_state)
+            self.scene.set_dynamic_visible(True)
+        else:
+            self.scene.set_dynamic_visible(False)
+        self.scene.set_active_node(matched_state)
+
+    def closeEvent(self, event):
+        self.layout_worker.unregister(self.drone_id, self)
+        super().closeEvent(event)
 
     '''
     def setup_mqtt(self):
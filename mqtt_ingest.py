@@ -0,0 +1,419 @@
+# mqtt_ingest.py
+
+import asyncio
+import random
+import threading
+from collections import OrderedDict, deque
+
+import paho.mqtt.client as mqtt
+
+from telemetry_recorder import ReplayMessage
+
+# Queue policies when a topic's queue is full
+DROP_OLDEST = 'drop_oldest'  # Discard the oldest message (telemetry: newer is better)
+DROP_NEWEST = 'drop_newest'  # Discard the incoming message
+COALESCE = 'coalesce'  # Keep only the latest message per topic; drop the oldest topic when full
+
+BATCH_SIZE = 256  # Messages handled before yielding to the event loop
+
+
+def connect_failed(reason_code):
+    # paho 2 passes a ReasonCode, paho 1 and InProcessClient an int
+    if hasattr(reason_code, 'is_failure'):
+        return reason_code.is_failure
+    return reason_code != 0
+
+
+class IngestQueue:
+    # Bounded queue of (topic, payload) for one route. Only used from the event loop thread.
+    def __init__(self, maxsize, policy):
+        self.maxsize = maxsize
+        self.policy = policy
+        self.items = OrderedDict() if policy == COALESCE else deque()
+        self.ready = asyncio.Event()
+
+        self.received = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+
+    def put(self, topic, payload):
+        self.received += 1
+        if self.policy == COALESCE:
+            if topic in self.items:
+                self.coalesced += 1
+            elif len(self.items) >= self.maxsize:
+                self.items.popitem(last=False)
+                self.dropped += 1
+            self.items[topic] = payload
+        elif len(self.items) >= self.maxsize:
+            self.dropped += 1
+            if self.policy == DROP_NEWEST:
+                return
+            self.items.popleft()
+            self.items.append((topic, payload))
+        else:
+            self.items.append((topic, payload))
+        self.max_depth = max(self.max_depth, len(self.items))
+        self.ready.set()
+
+    async def get_batch(self, limit=BATCH_SIZE):
+        while not self.items:
+            self.ready.clear()
+            await self.ready.wait()
+        batch = []
+        while self.items and len(batch) < limit:
+            batch.append(self.items.popitem(last=False) if self.policy == COALESCE else self.items.popleft())
+        return batch
+
+    def stats(self):
+        return {
+            'depth': len(self.items),
+            'max_depth': self.max_depth,
+            'received': self.received,
+            'dropped': self.dropped,
+            'coalesced': self.coalesced,
+        }
+
+
+class IngestRoute:
+    # Messages matching topic_filter (MQTT wildcards allowed) go through a bounded queue to handler(topic, payload)
+    def __init__(self, topic_filter, handler, maxsize=1000, policy=DROP_OLDEST):
+        self.topic_filter = topic_filter
+        self.handler = handler
+        self.maxsize = maxsize
+        self.policy = policy
+        self.queue = None  # Created on the event loop
+        self.handled = 0
+        self.errors = 0
+
+
+class SocketLoop:
+    # Drives a paho client's socket from an asyncio loop instead of paho's own network thread
+    def __init__(self, loop, client):
+        self.loop = loop
+        self.client = client
+        self.misc = None
+        client.on_socket_open = self.on_socket_open
+        client.on_socket_close = self.on_socket_close
+        client.on_socket_register_write = self.on_socket_register_write
+        client.on_socket_unregister_write = self.on_socket_unregister_write
+
+    def call(self, fn, *args):
+        # paho calls back on the loop thread, except during connect(), which runs on its own thread
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            fn(*args)
+        elif not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(fn, *args)
+
+    def on_socket_open(self, client, userdata, sock):
+        self.call(self.watch, sock)
+
+    def watch(self, sock):
+        self.loop.add_reader(sock, self.client.loop_read)
+        self.misc = self.loop.create_task(self.misc_loop())
+
+    def on_socket_close(self, client, userdata, sock):
+        self.call(self.unwatch, sock)
+
+    def unwatch(self, sock):
+        self.loop.remove_reader(sock)
+        if self.misc is not None:
+            self.misc.cancel()
+
+    def on_socket_register_write(self, client, userdata, sock):
+        self.call(self.loop.add_writer, sock, client.loop_write)
+
+    def on_socket_unregister_write(self, client, userdata, sock):
+        self.call(self.loop.remove_writer, sock)
+
+    async def misc_loop(self):
+        # Keepalive pings and timeout detection
+        while self.client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            await asyncio.sleep(1)
+
+
+def make_paho_client(loop):
+    if hasattr(mqtt, 'CallbackAPIVersion'):
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    else:
+        client = mqtt.Client()
+    client.socket_loop = SocketLoop(loop, client)
+    return client
+
+
+class MqttIngest:
+    # MQTT ingestion on a dedicated asyncio loop thread. Each route has a bounded queue with an
+    # explicit policy, so a slow consumer drops or coalesces messages instead of growing memory.
+    # The connection is retried with exponential backoff (with jitter) after a refused connect,
+    # a failed CONNACK or a lost connection.
+    #
+    # client_factory(loop) returns a paho-compatible client; InProcessBroker.client_factory
+    # gives one that needs no network. on_connection_change(connected, last_error) is called on
+    # the loop thread after every connect, refusal, failed attempt and lost connection.
+    # recorder.record(topic, payload) is called for every message as it arrives, before it is
+    # queued, so messages that are later dropped or coalesced are recorded too.
+    def __init__(self, broker, port, routes, client_factory=make_paho_client, backoff_min=1.0, backoff_max=30.0,
+                 on_connection_change=None, recorder=None):
+        self.broker = broker
+        self.port = port
+        self.routes = routes
+        self.client_factory = client_factory
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.on_connection_change = on_connection_change
+        self.recorder = recorder
+
+        self.loop = None
+        self.thread = None
+        self.client = None
+        self.stopping = None
+        self.disconnected = None
+
+        self.connected = False
+        self.session_ok = False  # The current connection attempt got a successful CONNACK
+        self.connects = 0
+        self.reconnects = 0  # Connection attempts after the first one
+        self.last_error = None
+        self.unrouted = 0
+
+    def start(self):
+        self.loop = asyncio.SelectorEventLoop()  # add_reader is not available on the Windows proactor loop
+        self.stopping = asyncio.Event()
+        self.disconnected = asyncio.Event()
+        self.thread = threading.Thread(target=self.run, name='mqtt-ingest', daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=2.0):
+        if self.thread is None:
+            return
+        self.loop.call_soon_threadsafe(self.request_stop)
+        self.thread.join(timeout)
+        self.thread = None
+
+    def request_stop(self):
+        self.stopping.set()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.main())
+        finally:
+            self.loop.close()
+
+    async def main(self):
+        for route in self.routes:
+            route.queue = IngestQueue(route.maxsize, route.policy)
+
+        self.client = self.client_factory(self.loop)
+        self.client.on_connect = self.on_connect
+        self.client.on_disconnect = self.on_disconnect
+        self.client.on_message = self.on_message
+
+        tasks = [self.loop.create_task(self.consume(route)) for route in self.routes]
+        tasks.append(self.loop.create_task(self.maintain_connection()))
+        await self.stopping.wait()
+
+        if self.connected:
+            self.client.disconnect()
+            await asyncio.sleep(0.05)  # Let the DISCONNECT packet go out
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def maintain_connection(self):
+        delay = self.backoff_min
+        while not self.stopping.is_set():
+            self.disconnected.clear()
+            self.session_ok = False
+            try:
+                await self.connect()
+            except Exception as e:  # Not only OSError: paho also raises e.g. ValueError for a bad host or port
+                self.last_error = str(e) or type(e).__name__
+                self.notify()
+            else:
+                await self.disconnected.wait()  # Until the CONNACK is refused or the connection drops
+            if self.stopping.is_set():
+                return
+            if self.session_ok:
+                delay = self.backoff_min  # Start over after a working session
+
+            wait = delay * random.uniform(0.5, 1.0)
+            delay = min(delay * 2, self.backoff_max)
+            try:
+                await asyncio.wait_for(self.stopping.wait(), wait)
+                return
+            except asyncio.TimeoutError:
+                self.reconnects += 1
+
+    async def connect(self):
+        # The name lookup and TCP connect of client.connect() block, for seconds when the broker is
+        # unreachable. They run on a daemon thread (like paho's connect_async() and loop_start()), so
+        # the queued messages are still handled meanwhile and a stop never waits for the connect.
+        done = self.loop.create_future()
+
+        def settle(error):
+            if done.done():
+                return
+            if error is None:
+                done.set_result(None)
+            else:
+                done.set_exception(error)
+
+        def run():
+            try:
+                self.client.connect(self.broker, self.port)
+                error = None
+            except Exception as e:  # Any failure settles the attempt, so it is retried instead of awaited forever
+                error = e
+            try:
+                self.loop.call_soon_threadsafe(settle, error)
+            except RuntimeError:
+                pass  # Stopped while connecting
+
+        threading.Thread(target=run, name='mqtt-connect', daemon=True).start()
+        await done
+
+    def notify(self):
+        if self.on_connection_change is not None:
+            self.on_connection_change(self.connected, self.last_error)
+
+    def on_connect(self, client, userdata, flags, reason_code, properties=None):
+        if connect_failed(reason_code):
+            self.last_error = f"connection refused: {reason_code}"
+            client.disconnect()
+            self.disconnected.set()
+            self.notify()
+            return
+        self.connected = True
+        self.connects += 1
+        self.session_ok = True
+        self.last_error = None
+        for route in self.routes:
+            client.subscribe(route.topic_filter)
+        self.notify()
+
+    def on_disconnect(self, client, userdata, *args):
+        # paho 2: (flags, reason_code, properties), paho 1: (rc)
+        was_connected = self.connected
+        self.connected = False
+        self.disconnected.set()
+        if was_connected:
+            self.notify()
+
+    def on_message(self, client, userdata, message):
+        # Runs on the event loop thread; only records and enqueues
+        topic = message.topic
+        if self.recorder is not None:
+            self.recorder.record(topic, message.payload)
+        for route in self.routes:
+            if mqtt.topic_matches_sub(route.topic_filter, topic):
+                route.queue.put(topic, message.payload)
+                return
+        self.unrouted += 1
+
+    async def consume(self, route):
+        while True:
+            for topic, payload in await route.queue.get_batch():
+                try:
+                    route.handler(topic, payload)
+                    route.handled += 1
+                except Exception as e:
+                    route.errors += 1
+                    self.last_error = f"{route.topic_filter}: {e}"
+            await asyncio.sleep(0)  # Let the socket and the other routes run between batches
+
+    def depth(self):
+        return sum(len(route.queue.items) for route in self.routes if route.queue is not None)
+
+    def stats(self):
+        routes = {}
+        for route in self.routes:
+            stats = route.queue.stats() if route.queue is not None else {}
+            stats.update(handled=route.handled, errors=route.errors, policy=route.policy)
+            routes[route.topic_filter] = stats
+        return {
+            'connected': self.connected,
+            'connects': self.connects,
+            'reconnects': self.reconnects,
+            'last_error': self.last_error,
+            'unrouted': self.unrouted,
+            'routes': routes,
+        }
+
+
+class InProcessBroker:
+    # Broker stand-in for running MqttIngest without a network: publish() delivers to every
+    # connected client whose subscriptions match. available=False refuses connections,
+    # drop_connections() simulates a lost connection.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clients = []
+        self.available = True
+        self.refuse_code = 0  # Non-zero: accept the TCP connection but refuse the CONNACK
+
+    def client_factory(self, loop):
+        return InProcessClient(self, loop)
+
+    def publish(self, topic, payload):
+        # Safe to call from any thread
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        with self.lock:
+            clients = list(self.clients)
+        for client in clients:
+            client.loop.call_soon_threadsafe(client.receive, topic, payload)
+
+    def drop_connections(self):
+        with self.lock:
+            clients, self.clients = self.clients, []
+        for client in clients:
+            client.loop.call_soon_threadsafe(client.lose_connection)
+
+
+class InProcessClient:
+    # The part of the paho client interface that MqttIngest uses
+    def __init__(self, broker, loop):
+        self.broker = broker
+        self.loop = loop
+        self.subscriptions = []
+        self.is_connected = False
+        self.on_connect = None
+        self.on_disconnect = None
+        self.on_message = None
+
+    def connect(self, host, port):
+        if not self.broker.available:
+            raise ConnectionRefusedError(f"in-process broker at {host}:{port} is unavailable")
+        self.subscriptions = []
+        reason_code = self.broker.refuse_code
+        if reason_code == 0:
+            self.is_connected = True
+            with self.broker.lock:
+                self.broker.clients.append(self)
+        self.loop.call_soon_threadsafe(self.on_connect, self, None, {}, reason_code, None)
+
+    def subscribe(self, topic_filter):
+        self.subscriptions.append(topic_filter)
+
+    def disconnect(self):
+        if not self.is_connected:
+            return
+        with self.broker.lock:
+            if self in self.broker.clients:
+                self.broker.clients.remove(self)
+        self.lose_connection()
+
+    def receive(self, topic, payload):
+        if self.is_connected and any(mqtt.topic_matches_sub(sub, topic) for sub in self.subscriptions):
+            self.on_message(self, None, ReplayMessage(topic, payload))
+
+    def lose_connection(self):
+        if not self.is_connected:
+            return
+        self.is_connected = False
+        self.on_disconnect(self, None, {}, 1, None)
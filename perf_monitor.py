@@ -0,0 +1,134 @@
+# perf_monitor.py
+
+import bisect
+import json
+import threading
+import time
+
+# Upper bounds of the histogram buckets, in seconds (1 us .. 10 s, roughly 1-2-5 steps)
+BUCKET_BOUNDS = [scale * 10 ** exponent for exponent in range(-6, 1) for scale in (1, 2, 5)] + [10.0]
+
+
+class LatencyHistogram:
+    # Fixed-size histogram; recording is O(log buckets) and never allocates
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)  # Last bucket counts values above 10 s
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other):
+        for i, value in enumerate(other.buckets):
+            self.buckets[i] += value
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, fraction):
+        # Upper bound of the bucket holding the given fraction of the values, never above the largest value
+        if not self.count:
+            return 0.0
+        threshold = fraction * self.count
+        seen = 0
+        for i, value in enumerate(self.buckets):
+            seen += value
+            if seen >= threshold:
+                return min(BUCKET_BOUNDS[i], self.max) if i < len(BUCKET_BOUNDS) else self.max
+        return self.max
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1e3 if self.count else 0.0,
+            'p50_ms': self.percentile(0.50) * 1e3,
+            'p99_ms': self.percentile(0.99) * 1e3,
+            'max_ms': self.max * 1e3,
+            'buckets': self.buckets,
+        }
+
+
+class PerfMonitor:
+    # Per-stage, per-drone latency histograms of the hot paths. Call sites check `enabled`
+    # before reading the clock, so the hooks cost one attribute lookup when turned off.
+    #
+    # Stages: on_message, handoff (parse to GUI delivery), end_to_end (payload timestamp to
+    # GUI delivery), layout.build, layout.pipe, layout.decode, scene.build, mission.update,
+    # status.update
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.histograms = {}  # Map from (stage, drone_id) to LatencyHistogram
+        self.messages = 0
+        self.started_at = time.time()
+
+    def record(self, stage, drone_id, seconds):
+        key = (stage, drone_id)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def count_message(self):
+        with self.lock:
+            self.messages += 1
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+            self.messages = 0
+            self.started_at = time.time()
+
+    def stage(self, stage):
+        # Histogram of a stage over all drones
+        combined = LatencyHistogram()
+        with self.lock:
+            for (name, _), histogram in self.histograms.items():
+                if name == stage:
+                    combined.merge(histogram)
+        return combined
+
+    def snapshot(self):
+        with self.lock:
+            stages = {}
+            for (stage, drone_id), histogram in sorted(self.histograms.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+                stages.setdefault(stage, {})[str(drone_id)] = histogram.as_dict()
+            return {
+                'started_at': self.started_at,
+                'exported_at': time.time(),
+                'messages': self.messages,
+                'stages': stages,
+            }
+
+    def export(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+
+class StartupProfile:
+    # Milestones of one launch, in seconds since `started` (a perf_counter() reading taken when
+    # main.py starts loading): imports, window, first_frame, restored, connected, first_telemetry
+    def __init__(self, started):
+        self.started = started
+        self.milestones = {}
+
+    def mark(self, milestone):
+        # Only the first time counts; returns the elapsed seconds then, None afterwards
+        if milestone in self.milestones:
+            return None
+        elapsed = self.milestones[milestone] = time.perf_counter() - self.started
+        return elapsed
+
+    def report(self):
+        return {milestone: round(seconds * 1e3, 1) for milestone, seconds in self.milestones.items()}
+
+
+# Shared by all modules; enabled with --perf or the View menu
+perf = PerfMonitor()
@@ -0,0 +1,150 @@
+# state_index.py
+
+import bisect
+import re
+from collections import deque
+
+from graph_layout import DYNAMIC_STATE
+
+KNOWN_SUFFIXES = ['px4', 'ardupilot']
+NON_WORD = re.compile(r'\W+')
+
+# Distinct onboard_pilot strings remembered per mission before the memo is reset
+MAX_RESOLVED = 1024
+
+
+def normalize_state(state_name):
+    # Remove known suffixes and prefixes
+    state_name = state_name.lower()
+    # Remove known suffixes
+    for suffix in KNOWN_SUFFIXES:
+        if state_name.endswith(suffix):
+            state_name = state_name[:-len(suffix)]
+    # Remove any non-alphanumeric characters
+    state_name = NON_WORD.sub('', state_name)
+    return state_name.strip()
+
+
+class SubstringMatcher:
+    # Aho-Corasick automaton: finds every pattern contained in a text in one pass over the text
+    def __init__(self, patterns):
+        self.goto = [{}]  # Per automaton state: map from character to next state
+        self.fail = [0]
+        self.output = [[]]  # Per automaton state: indices of the patterns ending there
+
+        for index, pattern in enumerate(patterns):
+            node = 0
+            for char in pattern:
+                next_node = self.goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self.goto)
+                    self.goto[node][char] = next_node
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                node = next_node
+            self.output[node].append(index)
+
+        # Breadth-first pass to link each state to its longest proper suffix in the trie
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, next_node in self.goto[node].items():
+                queue.append(next_node)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_node] = self.goto[fallback].get(char, 0)
+                self.output[next_node] = self.output[next_node] + self.output[self.fail[next_node]]
+
+    def find_all(self, text):
+        # Indices of the patterns that occur in text
+        found = set()
+        node = 0
+        for char in text:
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            found.update(self.output[node])
+        return found
+
+
+class StateIndex:
+    # Maps onboard_pilot strings to mission graph nodes. Built once per mission spec;
+    # resolve() is a dictionary lookup for every onboard_pilot string seen before.
+    #
+    # Matching order for a normalized onboard_pilot string:
+    # 1. a state with exactly that normalized name
+    # 2. the longest state name contained in it (earliest in the mission on ties)
+    # 3. the earliest state name containing it
+    # 4. DYNAMIC_STATE; an empty onboard_pilot highlights the first state
+    def __init__(self, mission_spec):
+        # Normalized name -> node name, in mission order (first occurrence keeps its
+        # position, the last spelling wins, as transitions may repeat a state)
+        mapping = {}
+        for state in mission_spec.get('states', []):
+            mapping[normalize_state(state['name'])] = state['name']
+            for transition in state.get('transitions', []):
+                mapping[normalize_state(transition['target'])] = transition['target']
+
+        self.exact = mapping
+        self.names = list(mapping)
+        self.nodes = list(mapping.values())
+        self.first_node = self.nodes[0] if self.nodes else None
+
+        # An empty name would be contained in every string, so it is left out of the substring index
+        patterns = [name for name in self.names if name]
+        self.pattern_positions = [i for i, name in enumerate(self.names) if name]
+        self.matcher = SubstringMatcher(patterns)
+        # Separator cannot occur in a normalized name, so a hit never spans two names
+        self.joined = '\0'.join(self.names)
+        self.offsets = []
+        offset = 0
+        for name in self.names:
+            self.offsets.append(offset)
+            offset += len(name) + 1
+
+        self.resolved = {}  # Memo: onboard_pilot -> node
+        self.lookups = 0
+        self.misses = 0
+
+    def resolve(self, current_state):
+        # Returns the node to highlight for current_state
+        self.lookups += 1
+        node = self.resolved.get(current_state, self)
+        if node is not self:
+            return node
+        self.misses += 1
+        node = self.match(current_state)
+        if len(self.resolved) >= MAX_RESOLVED:
+            self.resolved.clear()
+        self.resolved[current_state] = node
+        return node
+
+    def match(self, current_state):
+        if not current_state:
+            return self.first_node
+        normalized = normalize_state(current_state)
+        if not normalized:
+            return self.first_node if self.nodes else DYNAMIC_STATE
+
+        node = self.exact.get(normalized)
+        if node is not None:
+            return node
+
+        contained = self.matcher.find_all(normalized)
+        if contained:
+            best = min((self.pattern_positions[i] for i in contained),
+                       key=lambda position: (-len(self.names[position]), position))
+            return self.nodes[best]
+
+        hit = self.joined.find(normalized)
+        if hit >= 0:
+            # The name holding the hit is the last one starting at or before it
+            return self.nodes[bisect.bisect_right(self.offsets, hit) - 1]
+
+        # current_state is not part of the mission, show it as the dynamic state
+        return DYNAMIC_STATE
+
+    def stats(self):
+        return {'states': len(self.names), 'resolved': len(self.resolved), 'lookups': self.lookups, 'misses': self.misses}
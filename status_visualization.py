@@ -2,13 +2,17 @@
 
 import sys
 import math
+import time
 import json
-import paho.mqtt.client as mqtt
 
-from PySide6.QtWidgets import QWidget, QTextEdit, QVBoxLayout
-from PySide6.QtCore import Signal, Slot
+from PySide6.QtWidgets import QWidget, QLabel, QHBoxLayout, QVBoxLayout, QSizePolicy
+from PySide6.QtCore import Qt, Signal, Slot
 from PySide6.QtGui import QFont
 
+from drone_colors import get_drone_color
+from perf_monitor import perf
+from telemetry import TelemetrySample
+
 '''
 def get_mqtt_config():
     settings = {'mqtt_broker_address': "localhost", 'mqtt_port': 1883}
@@ -17,12 +21,104 @@ def get_mqtt_config():
     return {"broker": broker, "port": port}
 '''
 
+# Rows of the status panel; each row holds one or two (field, label) pairs, empty rows are spacers
+STATUS_ROWS = [
+    [('status', 'Status')],
+    [('mode', 'Mode')],
+    [('onboard_pilot', 'Onboard Pilot')],
+    [],
+    [('armed', 'Armed')],
+    [('geofence', 'Geofence')],
+    [],
+    [('latitude', 'LAT'), ('longitude', 'LON')],
+    [('altitude', 'ALT')],
+    [],
+    [('speed', 'Speed')],
+    [('heading', 'Drone Heading')],
+    [],
+    [('battery_voltage', 'Battery Voltage'), ('battery_current', 'Current')],
+    [('battery_level', 'Battery Level')],
+]
+
+HEADING_DIRECTIONS = ["North", "Northeast", "East", "Southeast", "South", "Southwest", "West", "Northwest"]
+
+
+def format_text(value):
+    return str(value)
+
+
+def format_number(value, digits, unit=''):
+    # None means the value was malformed
+    text = f"{value:.{digits}f}" if value is not None else "N/A"
+    return f"{text} {unit}" if unit else text
+
+
+def format_speed(speed):
+    return format_number(speed * 2.237 if speed is not None else None, 3, 'mph')  # converts m/s to mph
+
+
+def format_heading(heading):
+    # Converts radians to a compass direction
+    try:
+        radians = heading % (2 * math.pi)  # Normalize radians between 0 and 2π
+        sector_size = 2 * math.pi / len(HEADING_DIRECTIONS)  # Divide 360 degrees into 8 sectors
+        dir_index = int((radians + sector_size / 2) // sector_size) % len(HEADING_DIRECTIONS)
+        return HEADING_DIRECTIONS[dir_index]
+    except (TypeError, ValueError):
+        return "N/A"
+
+
+def format_battery_level(level):
+    try:
+        return f"{int(level * 100)}%"
+    except (TypeError, ValueError, OverflowError):
+        return "N/A%"
+
+
+def format_current(current):
+    return f"{current if current is not None else 'N/A'} A"
+
+
+def format_age(seconds):
+    # Age of a sample restored from the fleet snapshot, in its largest whole unit
+    seconds = max(seconds, 0)
+    if seconds < 60:
+        return f"{int(seconds)} s"
+    if seconds < 3600:
+        return f"{int(seconds // 60)} min"
+    if seconds < 86400:
+        return f"{int(seconds // 3600)} h"
+    return f"{int(seconds // 86400)} d"
+
+
+# Formatter of each TelemetrySample field shown in the panel
+FIELD_FORMATTERS = [
+    ('status', format_text),
+    ('mode', format_text),
+    ('onboard_pilot', format_text),
+    ('armed', format_text),
+    ('geofence', format_text),
+    ('latitude', lambda value: format_number(value, 5)),
+    ('longitude', lambda value: format_number(value, 5)),
+    ('altitude', lambda value: format_number(value, 3)),
+    ('speed', format_speed),
+    ('heading', format_heading),
+    ('battery_voltage', lambda value: format_number(value, 2, 'V')),
+    ('battery_current', format_current),
+    ('battery_level', format_battery_level),
+]
+
+
 class StatusVisualization(QWidget):
     update_drone_received = Signal(dict)
 
     def __init__(self, drone_id):
         super().__init__()
         self.drone_id = drone_id
+        self.field_values = {}  # Map from field to the raw value currently displayed
+        # While the panel is not visible, only the latest sample is stored
+        self.render_enabled = True
+        self.pending_sample = None
 
         self.initUI()
 
@@ -35,93 +131,105 @@ class StatusVisualization(QWidget):
         self.layout = QVBoxLayout()
         self.setLayout(self.layout)
 
-        # Create the QTextEdit for displaying status
-        self.text_widget = QTextEdit(self)
-        self.text_widget.setReadOnly(True)
-        # Make the font smaller
-        self.text_widget.setFont(QFont('Arial', 8))
-        self.text_widget.setHtml("<p style='text-align:center; font-size:14px;'>Waiting for data</p>")
-        self.layout.addWidget(self.text_widget)
+        # Placeholder shown until the first status arrives
+        self.placeholder_label = QLabel("Waiting for data", self)
+        self.placeholder_label.setAlignment(Qt.AlignCenter)
+        placeholder_font = QFont('Arial')
+        placeholder_font.setPixelSize(14)
+        self.placeholder_label.setFont(placeholder_font)
+        self.layout.addWidget(self.placeholder_label)
+
+        # Fixed label/value fields, created once; updates only change the values' text
+        self.fields_widget = QWidget(self)
+        fields_layout = QVBoxLayout(self.fields_widget)
+        fields_layout.setSpacing(2)
+
+        self.title_label = QLabel(self.drone_id, self.fields_widget)
+        self.title_label.setAlignment(Qt.AlignCenter)
+        self.title_label.setStyleSheet(f"color: {self.get_drone_color(self.drone_id)}; font-size: 28px; font-weight: bold;")
+        fields_layout.addWidget(self.title_label)
+
+        font = QFont('Arial')
+        font.setPixelSize(14)
+        bold_font = QFont(font)
+        bold_font.setBold(True)
+        self.value_labels = {}  # Map from field to its value QLabel
+        for fields in STATUS_ROWS:
+            if not fields:
+                fields_layout.addSpacing(10)
+                continue
+            row_layout = QHBoxLayout()
+            row_layout.setSpacing(6)
+            for field, label in fields:
+                name_label = QLabel(f"{label}:", self.fields_widget)
+                name_label.setFont(bold_font)
+                name_label.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Preferred)
+                value_label = QLabel("N/A", self.fields_widget)
+                value_label.setFont(font)
+                value_label.setTextFormat(Qt.PlainText)
+                row_layout.addWidget(name_label)
+                row_layout.addWidget(value_label)
+                row_layout.addSpacing(16)
+                self.value_labels[field] = value_label
+            row_layout.addStretch(1)
+            fields_layout.addLayout(row_layout)
+        fields_layout.addStretch(1)
+
+        self.fields_widget.hide()
+        self.layout.addWidget(self.fields_widget)
 
-    @Slot(dict)
+    @Slot(str, object)
     def update_status_received(self, drone_id, data):
         if drone_id != self.drone_id:
             return
 
-        formatted_data = self.formatData(data)
-        self.text_widget.setHtml(formatted_data)
+        if isinstance(data, dict):
+            data = TelemetrySample.from_update(data)
+        if not self.render_enabled:
+            # Offscreen: only keep the latest sample, it is displayed once the panel is visible
+            self.pending_sample = data
+            return
+        if perf.enabled:
+            start = time.perf_counter()
+            self.display_status(data)
+            perf.record('status.update', self.drone_id, time.perf_counter() - start)
+        else:
+            self.display_status(data)
+
+    def set_render_enabled(self, enabled):
+        # Called when the panel scrolls into or out of view, or the window is minimized
+        self.render_enabled = enabled
+        if enabled and self.pending_sample is not None:
+            sample, self.pending_sample = self.pending_sample, None
+            self.display_status(sample)
+
+    def display_status(self, data):
+        if not data.has_status:
+            self.fields_widget.hide()
+            return
+        if self.fields_widget.isHidden():
+            self.placeholder_label.hide()
+            self.fields_widget.show()
+
+        # Only fields whose value changed since the last sample are formatted and updated
+        for field, text in self.formatData(data).items():
+            self.value_labels[field].setText(text)
 
     def get_drone_color(self, drone_id):
-        # Map drone IDs to colors
-        UAV_COLOR_MAP = {
-            "Orange": "#FFA500",
-            "Blue": "#0000FF",
-            "Red": "#FF0000",
-            "Lime": "#00FF00",
-            "Aqua": "#00FFFF",
-            "Violet": "#EE82EE",
-            "Fuchsia": "#FF00FF",
-            "Gold": "#FFD700",
-            "DodgerBlue": "#1E90FF",
-            "Black": "#000000"
-        }
-        return UAV_COLOR_MAP.get(drone_id, "#000000")
+        # Map drone IDs to colors, assigning one to unknown IDs
+        return get_drone_color(drone_id)
 
     def formatData(self, data):
-        # Format the data into HTML
-        uavid = data.get('uavid', 'N/A')
-        color = self.get_drone_color(uavid)
-        status = data.get('status', {})
-        if not status:
-            return ''
-        # Formatting latitude, longitude, and altitude with 3 decimal places
-        try:
-            speed = f"{(float(status.get('speed', '0'))*2.237):.3f}"  # converts m/s to mph
-        except (TypeError, ValueError):
-            speed = "N/A"
-        try:
-            latitude = f"{float(status.get('location', {}).get('latitude', 0)):.5f}"
-            longitude = f"{float(status.get('location', {}).get('longitude', 0)):.5f}"
-            altitude = f"{float(status.get('location', {}).get('altitude', 0)):.3f}"
-        except (TypeError, ValueError):
-            latitude = longitude = altitude = "N/A"
-        # Drone Heading
-        try:
-            radians = float(status.get('drone_heading', '0')) % (2 * math.pi)  # Normalize radians between 0 and 2π
-            directions = ["North", "Northeast", "East", "Southeast", "South", "Southwest", "West", "Northwest"]
-            sector_size = 2 * math.pi / len(directions)  # Divide 360 degrees into 8 sectors
-            dir_index = int((radians + sector_size / 2) // sector_size) % len(directions)
-            drone_heading = directions[dir_index]
-        except (TypeError, ValueError):
-            drone_heading = "N/A"
-
-        try:
-            battery_voltage = f"{float(status.get('battery', {}).get('voltage', 0)):.2f}"
-        except (TypeError, ValueError):
-            battery_voltage = "N/A"
-        try:
-            battery_level = int(float(status.get('battery', {}).get('level', '0'))*100)
-        except (TypeError, ValueError):
-            battery_level = "N/A"
-
-        formatted_text = f"""
-            <h1 style="text-align: center; color: {color}; margin: 0;">{uavid}</h1>
-            <p style="font-size: 20px; line-height: 20px;"><b>Status:</b> {status.get('status', 'N/A')}<br>
-            <b>Mode:</b> {status.get('mode', 'N/A')}<br>
-            <b>Onboard Pilot:</b> {status.get('onboard_pilot', 'N/A')}<br><br>
-            <b>Armed:</b> {status.get('armed', 'N/A')}<br>
-            <b>Geofence:</b> {status.get('geofence', 'N/A')}<br><br>
-            <b>LAT:</b> {latitude}
-            &nbsp;&nbsp;&nbsp;&nbsp;<b>LON:</b> {longitude}<br>
-            <b>ALT:</b> {altitude}<br><br>
-            <b>Speed:</b> {speed} mph<br>
-            <b>Drone Heading:</b> {drone_heading}<br><br>
-            <b>Battery Voltage:</b> {battery_voltage} V
-            &nbsp;&nbsp;&nbsp;&nbsp;<b>Current:</b> {status.get('battery', {}).get('current', 'N/A')} A<br>
-            <b>Battery Level:</b> {battery_level}%</p>
-            """
-
-        return formatted_text
+        # Returns the formatted text of every field whose value changed since the last call
+        changed = {}
+        for field, formatter in FIELD_FORMATTERS:
+            value = getattr(data, field)
+            if field in self.field_values and self.field_values[field] == value:
+                continue
+            self.field_values[field] = value
+            changed[field] = formatter(value)
+        return changed
+
     '''
     def setup_mqtt(self):
         # Create MQTT client and set up callbacks
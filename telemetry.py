@@ -0,0 +1,146 @@
+# telemetry.py
+
+import json
+import threading
+import time
+
+# Use the fastest JSON backend that is installed; json_dumps returns compact UTF-8 bytes
+try:
+    import orjson
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+    JSON_BACKEND = 'orjson'
+except ImportError:
+    try:
+        import ujson
+        json_loads = ujson.loads
+        json_dumps = lambda value: ujson.dumps(value).encode('utf-8')
+        JSON_BACKEND = 'ujson'
+    except ImportError:
+        json_loads = json.loads
+        json_dumps = lambda value: json.dumps(value, separators=(',', ':')).encode('utf-8')
+        JSON_BACKEND = 'json'
+
+
+def to_float(value, default=0.0):
+    # Missing values fall back to default, malformed values become None (shown as N/A)
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class TelemetrySample:
+    # One update_drone message, parsed once on the MQTT network thread
+    __slots__ = (
+        'uavid', 'timestamp', 'received_at', 'has_status',
+        'status', 'mode', 'onboard_pilot', 'armed', 'geofence',
+        'latitude', 'longitude', 'altitude', 'speed', 'heading',
+        'battery_level', 'battery_voltage', 'battery_current',
+    )
+
+    def __init__(self, uavid, timestamp=None, received_at=None, has_status=False,
+                 status='N/A', mode='N/A', onboard_pilot='N/A', armed='N/A', geofence='N/A',
+                 latitude=None, longitude=None, altitude=None, speed=0.0, heading=0.0,
+                 battery_level=0.0, battery_voltage=0.0, battery_current=None):
+        self.uavid = uavid
+        self.timestamp = timestamp  # Timestamp from the payload, if any
+        self.received_at = received_at if received_at is not None else time.time()
+        self.has_status = has_status
+        self.status = status
+        self.mode = mode
+        self.onboard_pilot = onboard_pilot
+        self.armed = armed
+        self.geofence = geofence
+        self.latitude = latitude
+        self.longitude = longitude
+        self.altitude = altitude
+        self.speed = speed  # m/s
+        self.heading = heading  # radians
+        self.battery_level = battery_level  # 0..1
+        self.battery_voltage = battery_voltage
+        self.battery_current = battery_current
+
+    @classmethod
+    def from_update(cls, update, received_at=None):
+        status = update.get('status') or {}
+        location = status.get('location') or {}
+        battery = status.get('battery') or {}
+        return cls(
+            update.get('uavid'),
+            timestamp=to_float(update.get('timestamp'), None),
+            received_at=received_at,
+            has_status=bool(status),
+            status=str(status.get('status', 'N/A')),
+            mode=str(status.get('mode', 'N/A')),
+            onboard_pilot=str(status.get('onboard_pilot', 'N/A')),
+            armed=str(status.get('armed', 'N/A')),
+            geofence=str(status.get('geofence', 'N/A')),
+            # Without a position fix there is no location: N/A, not a drone at 0,0
+            latitude=to_float(location.get('latitude'), None),
+            longitude=to_float(location.get('longitude'), None),
+            altitude=to_float(location.get('altitude'), None),
+            speed=to_float(status.get('speed')),
+            heading=to_float(status.get('drone_heading')),
+            battery_level=to_float(battery.get('level')),
+            battery_voltage=to_float(battery.get('voltage')),
+            battery_current=to_float(battery.get('current'), None),
+        )
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class TelemetryParser:
+    # Decodes MQTT payloads and keeps parse-time counters
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.parsed = 0
+        self.errors = 0
+        self.parse_seconds = 0.0
+
+    def loads(self, payload):
+        # Returns the decoded JSON document, or None if the payload is malformed
+        start = time.perf_counter()
+        try:
+            data = json_loads(payload)
+        except ValueError:
+            data = None
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.parse_seconds += elapsed
+            if data is None:
+                self.errors += 1
+            else:
+                self.parsed += 1
+        return data
+
+    def parse_update(self, payload):
+        # Returns a TelemetrySample, or None if the payload is not a valid update_drone message
+        start = time.perf_counter()
+        try:
+            update = json_loads(payload)
+            sample = TelemetrySample.from_update(update) if isinstance(update, dict) else None
+        except (ValueError, AttributeError):
+            sample = None
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.parse_seconds += elapsed
+            if sample is None:
+                self.errors += 1
+            else:
+                self.parsed += 1
+        return sample
+
+    def stats(self):
+        with self.lock:
+            parsed = self.parsed
+            return {
+                'backend': JSON_BACKEND,
+                'parsed': parsed,
+                'errors': self.errors,
+                'parse_seconds': self.parse_seconds,
+                'mean_parse_us': self.parse_seconds / parsed * 1e6 if parsed else 0.0,
+            }
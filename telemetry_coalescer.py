@@ -0,0 +1,164 @@
+# telemetry_coalescer.py
+
+import threading
+import time
+
+from PySide6.QtCore import QCoreApplication, QEvent, QObject, Qt, QTimer, Signal, Slot
+
+from perf_monitor import LatencyHistogram
+
+# Priority classes, most urgent first
+MISSION = 'mission'  # Mission specs
+CRITICAL = 'critical'  # Samples whose mode, armed or onboard_pilot differs from the drone's previous sample
+ROUTINE = 'routine'  # All other samples
+CRITICAL_FIELDS = ('mode', 'armed', 'onboard_pilot')
+
+# Posted to the coalescer when mission specs or critical samples are waiting
+URGENT_EVENT = QEvent.Type(QEvent.registerEventType())
+
+
+class TelemetryCoalescer(QObject):
+    # Hands update_drone samples and mission specs to the GUI thread in priority classes.
+    # Routine samples are coalesced: only the latest per drone is kept, and the dirty drones are
+    # delivered on a fixed timer, so the UI repaints at flush_hz instead of once per MQTT message.
+    # Mission specs and critical samples are delivered right away: they wake the GUI thread with
+    # a high-priority event, which Qt handles before queued signals and timers, and a routine
+    # flush in progress hands over to them between drones. The latency of each class (receipt to
+    # delivery to the widgets) is recorded; mission and critical deliveries over budget_ms are counted.
+    drone_updated = Signal(str, object)  # (drone_id, TelemetrySample)
+    mission_spec_updated = Signal(str, dict)  # (drone_id, mission spec)
+
+    def __init__(self, flush_hz=20, budget_ms=100, parent=None):
+        super().__init__(parent)
+        self.lock = threading.Lock()
+        self.pending = {}  # Map from drone_id to its latest routine update not yet delivered
+        self.urgent = {}  # Map from drone_id to its latest critical update not yet delivered
+        self.missions = {}  # Map from drone_id to (mission spec, pushed at) not yet delivered
+        self.critical_values = {}  # Map from drone_id to the CRITICAL_FIELDS of its latest update
+        self.wake_posted = False  # An URGENT_EVENT is on its way to the GUI thread
+
+        self.received = 0  # Messages pushed
+        self.merged = 0  # Messages replaced by a newer one before they were delivered
+        self.flushed = 0  # Messages delivered
+        self.critical = 0  # Updates classified as critical
+
+        # Only used on the GUI thread
+        self.budget = budget_ms / 1e3
+        self.latency = {MISSION: LatencyHistogram(), CRITICAL: LatencyHistogram(), ROUTINE: LatencyHistogram()}
+        self.over_budget = {MISSION: 0, CRITICAL: 0}
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.flush)
+        self.set_flush_rate(flush_hz)
+        self.timer.start()
+
+    def set_flush_rate(self, flush_hz):
+        self.timer.setInterval(max(1, int(1000 / flush_hz)))
+
+    def push(self, drone_id, sample):
+        # Safe to call from the MQTT network thread
+        values = tuple(getattr(sample, name) for name in CRITICAL_FIELDS)
+        with self.lock:
+            self.received += 1
+            previous = self.critical_values.get(drone_id)
+            self.critical_values[drone_id] = values
+            changed = previous is not None and previous != values
+            if changed or drone_id in self.urgent:
+                # A newer sample also supersedes a waiting critical one, so it is delivered in its place
+                if changed:
+                    self.critical += 1
+                if drone_id in self.urgent or self.pending.pop(drone_id, None) is not None:
+                    self.merged += 1
+                self.urgent[drone_id] = sample
+                self.wake()
+                return
+            if drone_id in self.pending:
+                self.merged += 1
+            self.pending[drone_id] = sample
+
+    def push_mission_spec(self, drone_id, mission_spec):
+        # Safe to call from the MQTT network thread
+        with self.lock:
+            self.received += 1
+            if drone_id in self.missions:
+                self.merged += 1
+            self.missions[drone_id] = (mission_spec, time.time())
+            self.wake()
+
+    def wake(self):
+        # Must be called with the lock held
+        if not self.wake_posted:
+            self.wake_posted = True
+            QCoreApplication.postEvent(self, QEvent(URGENT_EVENT), Qt.HighEventPriority.value)
+
+    def customEvent(self, event):
+        if event.type() == URGENT_EVENT:
+            self.flush_urgent()
+
+    def flush_urgent(self):
+        # Delivers the waiting mission specs, then the critical updates; returns the drones updated
+        with self.lock:
+            self.wake_posted = False
+            missions, self.missions = self.missions, {}
+            urgent, self.urgent = self.urgent, {}
+            self.flushed += len(missions) + len(urgent)
+
+        for drone_id, (mission_spec, pushed_at) in missions.items():
+            self.mission_spec_updated.emit(drone_id, mission_spec)
+            self.record(MISSION, pushed_at)
+        for drone_id, sample in urgent.items():
+            self.drone_updated.emit(drone_id, sample)
+            self.record(CRITICAL, sample.received_at)
+        return urgent.keys()
+
+    @Slot()
+    def flush(self):
+        with self.lock:
+            if not self.pending:
+                return
+            pending, self.pending = self.pending, {}
+            self.flushed += len(pending)
+
+        delivered_urgently = set()
+        for drone_id, sample in pending.items():
+            if self.wake_posted:  # Read without the lock; a late wake-up is caught by the posted event
+                delivered_urgently.update(self.flush_urgent())
+            if drone_id in delivered_urgently:
+                with self.lock:  # A newer critical sample of the drone is already shown
+                    self.flushed -= 1
+                    self.merged += 1
+                continue
+            self.drone_updated.emit(drone_id, sample)
+            self.record(ROUTINE, sample.received_at)
+
+    def record(self, priority, since):
+        latency = time.time() - since
+        self.latency[priority].record(latency)
+        if latency > self.budget and priority in self.over_budget:
+            self.over_budget[priority] += 1
+
+    def stop(self):
+        self.timer.stop()
+
+    def latency_stats(self):
+        stats = {}
+        for priority, histogram in self.latency.items():
+            stats[priority] = {
+                'count': histogram.count,
+                'p50_ms': histogram.percentile(0.50) * 1e3,
+                'p99_ms': histogram.percentile(0.99) * 1e3,
+                'max_ms': histogram.max * 1e3,
+            }
+            if priority in self.over_budget:
+                stats[priority]['over_budget'] = self.over_budget[priority]
+        return stats
+
+    def stats(self):
+        with self.lock:
+            return {
+                'received': self.received,
+                'merged': self.merged,
+                'flushed': self.flushed,
+                'critical': self.critical,
+                'pending': len(self.pending) + len(self.urgent) + len(self.missions),
+            }
@@ -0,0 +1,95 @@
+# telemetry_history.py
+
+import math
+from array import array
+
+from telemetry import TelemetrySample
+
+# Numeric TelemetrySample fields, stored as doubles (None is stored as NaN)
+NUMERIC_FIELDS = (
+    'received_at', 'timestamp', 'latitude', 'longitude', 'altitude', 'speed', 'heading',
+    'battery_level', 'battery_voltage', 'battery_current',
+)
+# Text fields, stored as codes into a StringTable
+TEXT_FIELDS = ('status', 'mode', 'onboard_pilot', 'armed', 'geofence')
+
+NAN = float('nan')
+
+
+class StringTable:
+    # Interns the few distinct mode/state strings so each sample stores small integer codes
+    def __init__(self):
+        self.codes = {}  # Map from string to code
+        self.strings = []  # Map from code to string
+
+    def code(self, text):
+        code = self.codes.get(text)
+        if code is None:
+            code = self.codes[text] = len(self.strings)
+            self.strings.append(text)
+        return code
+
+    def string(self, code):
+        return self.strings[code]
+
+
+# Shared by every drone's history; flight modes and states repeat across the fleet
+string_table = StringTable()
+
+
+class TelemetryHistory:
+    # Fixed-capacity columnar ring buffer of one drone's samples. Memory is allocated once
+    # (capacity x fields) and never grows; the oldest sample is overwritten when full.
+    #
+    # Samples are addressed by sequence number: the n-th sample ever appended has sequence n,
+    # so a position stays valid while newer samples arrive, until it is overwritten.
+    def __init__(self, drone_id, capacity):
+        self.drone_id = drone_id
+        self.capacity = capacity
+        self.numeric = {field: array('d', [NAN]) * capacity for field in NUMERIC_FIELDS}
+        self.text = {field: array('I', [0]) * capacity for field in TEXT_FIELDS}
+        self.has_status = array('b', [0]) * capacity
+        self.total = 0  # Samples appended so far
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def first_sequence(self):
+        # Sequence number of the oldest sample still stored
+        return self.total - len(self)
+
+    def last_sequence(self):
+        return self.total - 1
+
+    def append(self, sample):
+        slot = self.total % self.capacity
+        for field, column in self.numeric.items():
+            value = getattr(sample, field)
+            column[slot] = NAN if value is None else value
+        for field, column in self.text.items():
+            column[slot] = string_table.code(getattr(sample, field))
+        self.has_status[slot] = sample.has_status
+        self.total += 1
+
+    def contains(self, sequence):
+        return self.first_sequence() <= sequence < self.total
+
+    def sample_at(self, sequence):
+        # Rebuilds the TelemetrySample stored under a sequence number
+        if not self.contains(sequence):
+            raise IndexError(f"sample {sequence} is not in the history of {self.drone_id}")
+        slot = sequence % self.capacity
+        values = {}
+        for field, column in self.numeric.items():
+            value = column[slot]
+            values[field] = None if math.isnan(value) else value
+        for field, column in self.text.items():
+            values[field] = string_table.string(column[slot])
+        return TelemetrySample(self.drone_id, has_status=bool(self.has_status[slot]), **values)
+
+    def time_at(self, sequence):
+        return self.numeric['received_at'][sequence % self.capacity]
+
+    def nbytes(self):
+        columns = list(self.numeric.values()) + list(self.text.values()) + [self.has_status]
+        return sum(column.itemsize * len(column) for column in columns)
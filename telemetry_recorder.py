@@ -0,0 +1,105 @@
+# telemetry_recorder.py
+
+import gzip
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+
+# Log layout: MAGIC, then one record per message:
+# RECORD_HEADER (receive time, topic length, payload length), topic bytes, payload bytes
+MAGIC = b'DMVLOG1\n'
+RECORD_HEADER = struct.Struct('<dHI')
+
+# Same attributes as the paho message that MainWindow.on_message reads
+ReplayMessage = namedtuple('ReplayMessage', ['topic', 'payload'])
+
+
+def open_log(path, mode):
+    # Logs ending in .gz are gzip-compressed
+    if path.endswith('.gz'):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+class TelemetryRecorder:
+    # Appends every MQTT message to a compact binary log
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.records = 0
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open_log(path, 'ab')
+        if is_new:
+            self.file.write(MAGIC)
+
+    def record(self, topic, payload, timestamp=None):
+        # Called from the MQTT network thread
+        topic_bytes = topic.encode('utf-8')
+        payload = bytes(payload)
+        header = RECORD_HEADER.pack(timestamp if timestamp is not None else time.time(), len(topic_bytes), len(payload))
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(header + topic_bytes + payload)
+            self.records += 1
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+def read_log(path):
+    # Yields (timestamp, topic, payload) for every record of a log
+    with open_log(path, 'rb') as f:
+        magic = f.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a telemetry log")
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return  # End of log, or a record cut short by a crash
+            timestamp, topic_length, payload_length = RECORD_HEADER.unpack(header)
+            topic = f.read(topic_length)
+            payload = f.read(payload_length)
+            if len(payload) < payload_length:
+                return
+            yield timestamp, topic.decode('utf-8'), payload
+
+
+class TelemetryReplayer(threading.Thread):
+    # Replays a log into a message callback (e.g. MainWindow.on_message) without a broker.
+    # speed is a multiple of real time; 0 replays as fast as possible.
+    def __init__(self, path, on_message, speed=1.0, on_finished=None):
+        super().__init__(daemon=True)
+        self.path = path
+        self.on_message = on_message
+        self.speed = speed
+        self.on_finished = on_finished
+        self.stop_event = threading.Event()
+        self.replayed = 0
+
+    def run(self):
+        start = None
+        first_timestamp = None
+        for timestamp, topic, payload in read_log(self.path):
+            if self.stop_event.is_set():
+                break
+            if self.speed > 0:
+                # Schedule against the start of the replay so delays do not accumulate
+                if start is None:
+                    start = time.perf_counter()
+                    first_timestamp = timestamp
+                delay = start + (timestamp - first_timestamp) / self.speed - time.perf_counter()
+                if delay > 0 and self.stop_event.wait(delay):
+                    break
+            self.on_message(None, None, ReplayMessage(topic, payload))
+            self.replayed += 1
+        if self.on_finished is not None:
+            self.on_finished(self.replayed)
+
+    def stop(self):
+        self.stop_event.set()
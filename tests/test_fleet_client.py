@@ -0,0 +1,65 @@
+# tests/test_fleet_client.py
+
+import json
+import socket
+import threading
+import time
+import unittest
+
+from fleet_server import FleetClient
+
+SNAPSHOT = {'type': 'snapshot', 'drones': {'Red': {'uavid': 'Red', 'mode': 'GUIDED'}}, 'missions': {}, 'layouts': {}}
+
+
+class TruncatingServer(threading.Thread):
+    # Sends each viewer a full snapshot line, then `tail`, then closes the connection
+    def __init__(self, tail):
+        super().__init__(daemon=True)
+        self.tail = tail
+        self.sock = socket.create_server(('127.0.0.1', 0))
+        self.port = self.sock.getsockname()[1]
+        self.accepted = 0
+
+    def run(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            self.accepted += 1
+            with conn:
+                conn.sendall(json.dumps(SNAPSHOT).encode() + b'\n' + self.tail)
+
+
+class FleetClientTest(unittest.TestCase):
+    def run_client(self, tail):
+        server = TruncatingServer(tail)
+        server.start()
+        samples = []
+        changes = []
+        client = FleetClient('127.0.0.1', server.port, lambda drone_id, sample: samples.append(drone_id),
+                             lambda *args: None, backoff_min=0.05, backoff_max=0.05,
+                             on_connection_change=lambda connected, error: changes.append((connected, error)))
+        client.start()
+        deadline = time.time() + 5
+        while client.connects < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        client.stop()
+        client.join(2)
+        server.sock.close()
+        return client, samples, changes
+
+    def test_truncated_final_line_reconnects(self):
+        client, samples, changes = self.run_client(b'{"type":"upd')
+        self.assertGreaterEqual(client.connects, 2)
+        self.assertIn('Red', samples)
+        self.assertTrue(any(not connected and 'malformed message' in error for connected, error in changes))
+
+    def test_unknown_field_reconnects(self):
+        client, _, changes = self.run_client(b'{"type":"update","drone":"Red","fields":{"warp_speed":9}}\n')
+        self.assertGreaterEqual(client.connects, 2)
+        self.assertTrue(any(not connected and 'malformed message' in error for connected, error in changes))
+
+
+if __name__ == '__main__':
+    unittest.main()
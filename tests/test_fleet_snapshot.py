@@ -0,0 +1,58 @@
+# tests/test_fleet_snapshot.py
+
+import os
+import tempfile
+import unittest
+
+from fleet_snapshot import FleetSnapshot, read_snapshot
+from layout_cache import mission_spec_key
+from telemetry import TelemetrySample
+
+MISSION = {'states': [{'name': 'Takeoff', 'transitions': [{'target': 'Land', 'condition': 'done'}]}, {'name': 'Land'}]}
+MALFORMED = {'states': [{'transitions': []}]}  # A state without a name
+
+
+class FleetSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'fleet.snapshot')
+        self.snapshot = FleetSnapshot(self.path, mission_spec_key, lambda key: None)
+        self.addCleanup(self.snapshot.file.close)
+
+    def test_malformed_mission_is_dropped(self):
+        self.snapshot.update_sample('Red', TelemetrySample('Red', mode='LAND'))
+        self.snapshot.update_mission('Red', MALFORMED)
+        self.snapshot.update_sample('Blue', TelemetrySample('Blue'))
+        self.snapshot.update_mission('Blue', MISSION)
+        self.snapshot.write_if_dirty()
+
+        self.assertEqual(self.snapshot.errors, 1)
+        self.assertIn('Red', self.snapshot.last_error)
+        self.assertNotIn('Red', self.snapshot.missions)
+        saved = read_snapshot(self.path)
+        self.assertIsNone(saved['drones']['Red']['mission'])
+        self.assertEqual(saved['drones']['Red']['sample']['mode'], 'LAND')
+        self.assertEqual(saved['missions'][saved['drones']['Blue']['mission']], MISSION)
+
+        # The writer keeps going: later changes are still saved without new errors
+        self.snapshot.update_sample('Red', TelemetrySample('Red', mode='RTL'))
+        self.snapshot.write_if_dirty()
+        self.assertEqual(self.snapshot.errors, 1)
+        self.assertEqual(read_snapshot(self.path)['drones']['Red']['sample']['mode'], 'RTL')
+
+    def test_newer_mission_is_kept(self):
+        self.snapshot.update_sample('Red', TelemetrySample('Red'))
+        self.snapshot.update_mission('Red', MALFORMED)
+        self.snapshot.mission_key = lambda drone_id, mission_spec: self.replace_mission(drone_id)
+        self.snapshot.write_if_dirty()
+        self.assertIs(self.snapshot.missions['Red'], MISSION)
+
+    def replace_mission(self, drone_id):
+        # A valid spec arrives on the GUI thread while the malformed one is being written
+        self.snapshot.update_mission(drone_id, MISSION)
+        raise KeyError('name')
+
+
+if __name__ == '__main__':
+    unittest.main()
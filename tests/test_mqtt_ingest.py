@@ -0,0 +1,134 @@
+# tests/test_mqtt_ingest.py
+
+import time
+import unittest
+
+from mqtt_ingest import (
+    COALESCE, DROP_NEWEST, DROP_OLDEST, InProcessBroker, InProcessClient, IngestQueue, IngestRoute, MqttIngest
+)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class BadHostBroker(InProcessBroker):
+    # Its clients raise ValueError, like paho for an invalid host, until `failures` connects have failed
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def client_factory(self, loop):
+        broker = self
+
+        class BadHostClient(InProcessClient):
+            def connect(self, host, port):
+                if broker.failures:
+                    broker.failures -= 1
+                    raise ValueError("Invalid host.")
+                super().connect(host, port)
+
+        return BadHostClient(self, loop)
+
+
+class IngestQueueTest(unittest.TestCase):
+    def fill(self, policy, messages):
+        queue = IngestQueue(3, policy)
+        for topic, payload in messages:
+            queue.put(topic, payload)
+        return queue
+
+    def test_drop_oldest_keeps_the_latest_messages(self):
+        queue = self.fill(DROP_OLDEST, [('t', i) for i in range(5)])
+        self.assertEqual(list(queue.items), [('t', 2), ('t', 3), ('t', 4)])
+        self.assertEqual(queue.stats(), {'depth': 3, 'max_depth': 3, 'received': 5, 'dropped': 2, 'coalesced': 0})
+
+    def test_drop_newest_keeps_the_first_messages(self):
+        queue = self.fill(DROP_NEWEST, [('t', i) for i in range(5)])
+        self.assertEqual(list(queue.items), [('t', 0), ('t', 1), ('t', 2)])
+        self.assertEqual(queue.stats()['dropped'], 2)
+
+    def test_coalesce_keeps_the_latest_message_per_topic(self):
+        queue = self.fill(COALESCE, [('a', 1), ('b', 1), ('a', 2), ('c', 1), ('a', 3)])
+        self.assertEqual(list(queue.items.items()), [('a', 3), ('b', 1), ('c', 1)])
+        self.assertEqual(queue.stats()['coalesced'], 2)
+        self.assertEqual(queue.stats()['dropped'], 0)
+
+    def test_coalesce_drops_the_oldest_topic_when_full(self):
+        queue = self.fill(COALESCE, [('a', 1), ('b', 1), ('c', 1), ('d', 1)])
+        self.assertEqual(list(queue.items), ['b', 'c', 'd'])
+        self.assertEqual(queue.stats()['dropped'], 1)
+
+
+class MqttIngestTest(unittest.TestCase):
+    def start_ingest(self, broker, backoff_min=0.02, backoff_max=0.05):
+        self.received = []
+        self.changes = []
+
+        def on_connection_change(connected, error):
+            self.changes.append((time.monotonic(), connected, error))
+
+        ingest = MqttIngest('broker', 1883, [IngestRoute('update_drone', lambda topic, payload: self.received.append(payload))],
+                            client_factory=broker.client_factory, backoff_min=backoff_min, backoff_max=backoff_max,
+                            on_connection_change=on_connection_change)
+        ingest.start()
+        self.addCleanup(ingest.stop)
+        return ingest
+
+    def test_reconnects_once_the_broker_is_available(self):
+        broker = InProcessBroker()
+        broker.available = False
+        ingest = self.start_ingest(broker)
+        self.assertTrue(wait_for(lambda: ingest.reconnects >= 2))
+        self.assertFalse(ingest.connected)
+        self.assertIn('unavailable', ingest.last_error)
+
+        broker.available = True
+        self.assertTrue(wait_for(lambda: ingest.connected))
+        self.assertIsNone(ingest.last_error)
+        broker.publish('update_drone', b'1')
+        self.assertTrue(wait_for(lambda: self.received == [b'1']))
+
+    def test_reconnects_after_a_lost_connection(self):
+        broker = InProcessBroker()
+        ingest = self.start_ingest(broker)
+        self.assertTrue(wait_for(lambda: ingest.connected))
+        broker.drop_connections()
+        self.assertTrue(wait_for(lambda: ingest.connects == 2 and ingest.connected))
+        self.assertEqual([connected for _, connected, _ in self.changes], [True, False, True])
+        broker.publish('update_drone', b'2')
+        self.assertTrue(wait_for(lambda: self.received == [b'2']))
+
+    def test_refused_connack_is_retried(self):
+        broker = InProcessBroker()
+        broker.refuse_code = 5
+        ingest = self.start_ingest(broker)
+        self.assertTrue(wait_for(lambda: ingest.reconnects >= 1))
+        self.assertEqual(ingest.last_error, "connection refused: 5")
+        broker.refuse_code = 0
+        self.assertTrue(wait_for(lambda: ingest.connected))
+
+    def test_any_connect_error_is_retried(self):
+        ingest = self.start_ingest(BadHostBroker(2))
+        self.assertTrue(wait_for(lambda: ingest.connected))
+        self.assertEqual(ingest.reconnects, 2)
+        self.assertEqual([error for _, _, error in self.changes], ["Invalid host.", "Invalid host.", None])
+
+    def test_backoff_doubles_up_to_the_maximum(self):
+        broker = InProcessBroker()
+        broker.available = False
+        self.start_ingest(broker, backoff_min=0.02, backoff_max=0.16)
+        self.assertTrue(wait_for(lambda: len(self.changes) >= 7))
+        times = [at for at, _, _ in self.changes[:7]]
+        gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+        # Waits are jittered between half and all of 0.02, 0.04, 0.08, then 0.16 s
+        self.assertLess(gaps[0], 0.1)
+        self.assertTrue(all(gap >= 0.08 for gap in gaps[3:]), gaps)
+        self.assertTrue(all(gap < 0.5 for gap in gaps), gaps)
+
+
+if __name__ == '__main__':
+    unittest.main()